@@ -1,5 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+
+from alumni_forum.paginators import EstimatedCountPaginator
+from . import deletion, search
 from .models import User
 
 
@@ -9,6 +12,8 @@ class UserAdmin(BaseUserAdmin):
     list_filter = ['role', 'is_staff', 'is_active', 'graduation_year']
     search_fields = ['username', 'email', 'first_name', 'last_name', 'department']
     ordering = ['-date_joined']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     # Add custom fields to the admin form
     fieldsets = BaseUserAdmin.fieldsets + (
@@ -22,4 +27,18 @@ class UserAdmin(BaseUserAdmin):
         ('Additional Info', {
             'fields': ('email', 'role', 'graduation_year', 'department', 'bio')
         }),
-    )
\ No newline at end of file
+    )
+
+    def delete_model(self, request, obj):
+        # Hidden now, purged in chunks by a worker (see accounts.deletion)
+        deletion.delete_account(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            deletion.delete_account(user)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Indexed prefix search instead of icontains scans (also used by autocomplete)
+        if not search_term:
+            return queryset, False
+        return search.search(queryset, search_term), False
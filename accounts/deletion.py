@@ -0,0 +1,78 @@
+"""
+Account deletion.
+
+``delete_account()`` only does what has to happen at once, in a few
+statements: the user is deactivated and marked deleted (their comments
+stop showing, see ``CommentQuerySet.visible``), their tokens are dropped
+and their posts are tombstoned with one UPDATE (see posts.deletion).
+
+The ``purge_user`` job removes the rest in chunks of ``DELETION_BATCH_SIZE``
+rows: the user's posts with their comments and likes, the user's comments
+and likes on other posts, their notifications, and finally the user row.
+Like ``purge_post`` it re-enqueues itself after ``DELETION_BATCHES_PER_JOB``
+chunks.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from notifications.models import Notification
+from posts import deletion as post_deletion, rendered
+from posts.models import Comment, Like, Post
+from .models import User
+
+
+def delete_account(user):
+    """Hide the account and its content now and enqueue the purge"""
+    from . import tasks
+
+    with transaction.atomic():
+        # An UPDATE, not save(): nothing about the search terms changes
+        User.objects.filter(pk=user.pk).update(is_active=False, deleted_at=timezone.now())
+        Token.objects.filter(user=user).delete()
+        post_deletion.delete_posts(Post.objects.filter(user=user), purge=False)
+        # Their comments disappear from other posts' stored feed JSON as well
+        rendered.refresh(
+            Comment.objects.filter(user=user).exclude(post__user=user).values_list('post_id', flat=True)
+        )
+        tasks.purge_user.delay(user_id=user.pk)
+
+
+def _delete_notifications(notification_ids):
+    Notification.objects.filter(pk__in=notification_ids).delete()
+
+
+def _clear_actor(notification_ids):
+    Notification.objects.filter(pk__in=notification_ids).update(actor=None)
+
+
+def purge_user(user_id):
+    """
+    Remove a deleted account a chunk at a time.
+
+    Returns False when the chunk budget ran out first (call again to go on).
+    """
+    budget = getattr(settings, 'DELETION_BATCHES_PER_JOB', 20)
+    size = getattr(settings, 'DELETION_BATCH_SIZE', 500)
+    posts = Post.objects.filter(user_id=user_id, deleted_at__isnull=False).order_by('pk')
+    while True:
+        post_ids = list(posts.values_list('pk', flat=True)[:size])
+        if not post_ids:
+            break
+        for post_id in post_ids:
+            budget = post_deletion.purge_post(post_id, budget)
+            if budget is None:
+                return False
+
+    for queryset, delete in (
+        (Comment.objects.filter(user_id=user_id), post_deletion.delete_comments),
+        (Like.objects.filter(user_id=user_id), post_deletion.delete_likes),
+        (Notification.objects.filter(recipient_id=user_id), _delete_notifications),
+        (Notification.objects.filter(actor_id=user_id), _clear_actor),
+    ):
+        budget = post_deletion.purge_chunks(queryset, delete, budget)
+        if budget is None:
+            return False
+    User.objects.filter(pk=user_id, deleted_at__isnull=False).delete()
+    return True
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:17
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# A frozen copy of accounts.search.terms_for as of this migration, so later
+# changes to the search module cannot change or break it
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def terms_for(user):
+    terms = set()
+    for value in (user.username, user.first_name, user.last_name, (user.email or '').split('@')[0]):
+        terms.update(WORD_RE.findall(normalize(value)))
+    if user.email:
+        terms.add(normalize(user.email))
+    return {term[:64] for term in terms}
+
+
+def index_existing_users(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserSearchTerm = apps.get_model('accounts', 'UserSearchTerm')
+    users = User.objects.only('pk', 'username', 'first_name', 'last_name', 'email').order_by('pk')
+    terms = []
+    for user in users.iterator(chunk_size=2000):
+        terms += [UserSearchTerm(user_id=user.pk, term=term) for term in terms_for(user)]
+        if len(terms) >= 10000:
+            UserSearchTerm.objects.bulk_create(terms)
+            terms = []
+    UserSearchTerm.objects.bulk_create(terms)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-date_joined', '-id'], name='user_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', '-date_joined', '-id'], name='user_role_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['graduation_year', '-date_joined', '-id'], name='user_year_joined_idx'),
+        ),
+        migrations.AddField(
+            model_name='usersearchterm',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='usersearchterm',
+            index=models.Index(fields=['term', 'user'], name='user_search_term_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='usersearchterm',
+            constraint=models.UniqueConstraint(fields=('user', 'term'), name='user_search_term_unique'),
+        ),
+        migrations.RunPython(index_existing_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_deleted_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='usersearchterm',
+            name='user_search_term_idx',
+        ),
+        migrations.AddIndex(
+            model_name='usersearchterm',
+            index=models.Index(fields=['term', 'user'], name='user_search_term_idx', opclasses=['varchar_pattern_ops', 'int8_ops']),
+        ),
+    ]
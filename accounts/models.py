@@ -13,6 +13,38 @@ class User(AbstractUser):
     graduation_year = models.IntegerField(null=True, blank=True)
     department = models.CharField(max_length=200, null=True, blank=True)
     bio = models.TextField(null=True, blank=True)
+    # Set when the account is deleted; its content is purged in the background
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta(AbstractUser.Meta):
+        # The user directory pages newest-first, optionally within a role or year
+        indexes = [
+            models.Index(fields=['-date_joined', '-id'], name='user_joined_idx'),
+            models.Index(fields=['role', '-date_joined', '-id'], name='user_role_joined_idx'),
+            models.Index(fields=['graduation_year', '-date_joined', '-id'], name='user_year_joined_idx'),
+        ]
     
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
+
+
+class UserSearchTerm(models.Model):
+    """One normalized word of a user's name, username or email (see accounts.search)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'term'], name='user_search_term_unique'),
+        ]
+        # Prefix lookups are range scans on this index; the operator class (PostgreSQL
+        # only) orders it by code point so LIKE 'pri%' can use it under any collation
+        indexes = [
+            models.Index(
+                fields=['term', 'user'], name='user_search_term_idx',
+                opclasses=['varchar_pattern_ops', 'int8_ops']
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.user_id}"
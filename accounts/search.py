@@ -0,0 +1,125 @@
+"""
+User directory search.
+
+Every user is indexed as a set of normalized terms (lowercase, accents
+stripped): the words of their username, first and last name and email
+local part, plus the full email address. A query matches users that have,
+for each of its words, some term starting with that word. Prefix matches
+are index range scans: on SQLite, whose default collation compares code
+points, ``term >= 'pri' AND term < 'prj'``; elsewhere ``LIKE 'pri%'``,
+which PostgreSQL serves from the ``varchar_pattern_ops`` term index
+whatever the database collation. Rare prefixes are
+resolved to their few users up front; common ones ('a', a shared surname)
+are checked per user while walking the directory in page order, so both
+stay fast on large tables.
+"""
+import re
+import sys
+import unicodedata
+
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef
+
+from .models import User, UserSearchTerm
+
+TERM_LENGTH = UserSearchTerm._meta.get_field('term').max_length
+MAX_QUERY_TERMS = 5
+# Above this many matching terms a word is matched per user rather than up front
+BROAD_TERM_MATCHES = 1000
+INDEXED_FIELDS = ('username', 'first_name', 'last_name', 'email')
+
+_word_re = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    """Lowercase and strip accents so 'Zoë' and 'zoe' match"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def terms_for(user):
+    terms = set()
+    for value in (user.username, user.first_name, user.last_name, (user.email or '').split('@')[0]):
+        terms.update(_word_re.findall(normalize(value)))
+    if user.email:
+        terms.add(normalize(user.email))
+    return {term[:TERM_LENGTH] for term in terms}
+
+
+def query_terms(query):
+    """Words of a search query; an email address is kept whole"""
+    query = normalize(query).strip()
+    if '@' in query:
+        words = [query]
+    else:
+        words = _word_re.findall(query)
+    # Longest words first, they are the most selective
+    return sorted({word[:TERM_LENGTH] for word in words}, key=len, reverse=True)[:MAX_QUERY_TERMS]
+
+
+def prefix_end(prefix):
+    """The smallest string above every string starting with ``prefix`` in code point order, or None"""
+    chars = [ord(char) for char in prefix]
+    while chars and chars[-1] == sys.maxunicode:
+        chars.pop()
+    if not chars:
+        return None
+    # Surrogates cannot be encoded, and nothing stored starts with one
+    chars[-1] = 0xE000 if chars[-1] + 1 == 0xD800 else chars[-1] + 1
+    return ''.join(map(chr, chars))
+
+
+def terms_starting_with(word):
+    """UserSearchTerm rows whose term starts with ``word``, as an index range scan"""
+    terms = UserSearchTerm.objects.all()
+    if connections[terms.db].vendor != 'sqlite':
+        return terms.filter(term__startswith=word)
+    end = prefix_end(word)
+    terms = terms.filter(term__gte=word)
+    return terms if end is None else terms.filter(term__lt=end)
+
+
+def index_user(user, created=False):
+    """Bring the stored terms of one user up to date, writing only what changed"""
+    terms = terms_for(user)
+    existing = set() if created else set(user.search_terms.values_list('term', flat=True))
+    if terms == existing:
+        return
+    with transaction.atomic():
+        if existing - terms:
+            user.search_terms.filter(term__in=existing - terms).delete()
+        UserSearchTerm.objects.bulk_create(
+            UserSearchTerm(user=user, term=term) for term in terms - existing
+        )
+
+
+def index_users(users=None, batch_size=2000):
+    """(Re)build the terms of many users, e.g. after bulk_create"""
+    users = User.objects.all() if users is None else users
+    users = users.only('pk', *INDEXED_FIELDS).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(users.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        with transaction.atomic():
+            UserSearchTerm.objects.filter(user__in=batch).delete()
+            UserSearchTerm.objects.bulk_create(
+                [UserSearchTerm(user_id=user.pk, term=term) for user in batch for term in terms_for(user)],
+                batch_size=batch_size,
+            )
+        last_pk = batch[-1].pk
+
+
+def search(queryset, query):
+    """Narrow a User queryset to users matching every word of ``query``"""
+    for word in query_terms(query):
+        matching = terms_starting_with(word)
+        if matching[:BROAD_TERM_MATCHES].count() < BROAD_TERM_MATCHES:
+            # Few matches: collect them from the term index, then sort that handful
+            queryset = queryset.filter(pk__in=matching.values('user_id'))
+        else:
+            # Common prefix: walk users in page order and probe each one's terms,
+            # a page fills long before the scan gets far
+            queryset = queryset.filter(Exists(matching.filter(user=OuterRef('pk'))))
+    return queryset
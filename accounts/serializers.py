@@ -1,11 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from alumni_forum.projection import ProjectedFieldsMixin
 from .models import User
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(ProjectedFieldsMixin, serializers.ModelSerializer):
     """Serializer for user data - used for responses"""
+    field_columns = {'role_display': ['role']}
     role_display = serializers.CharField(source='get_role_display', read_only=True)
     
     class Meta:
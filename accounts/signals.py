@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import search
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def index_search_terms(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the directory search terms in step with names and emails"""
+    if update_fields is not None and not set(update_fields) & set(search.INDEXED_FIELDS):
+        # e.g. login only touching last_login
+        return
+    search.index_user(instance, created=created)
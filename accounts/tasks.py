@@ -0,0 +1,11 @@
+from jobs.queue import task
+
+from . import deletion
+
+
+@task(max_attempts=5, retry_delay=60)
+def purge_user(user_id):
+    """Delete a deleted account's content and row, a chunk at a time"""
+    if not deletion.purge_user(user_id):
+        # Chunk budget used up; continue in a fresh job so others get a turn
+        purge_user.delay(user_id=user_id)
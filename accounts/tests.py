@@ -1,8 +1,21 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
+from alumni_forum.testing import QueryBudgetMixin
+from notifications.models import Notification
+from posts import stats
+from posts.models import Comment, Like, Post
+from . import urls as accounts_urls
 from .models import User
+from . import search
 
 
 class AuthenticationTestCase(TestCase):
@@ -75,3 +88,201 @@ class AuthenticationTestCase(TestCase):
         self.client.force_authenticate(user=self.test_user)
         response = self.client.post(self.logout_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    query_budgets = {
+        ('register', 'POST'): 10,
+        ('login', 'POST'): 13,
+        ('logout', 'POST'): 4,
+        ('profile', 'GET'): 2,
+        ('profile', 'PATCH'): 4,
+        ('profile', 'DELETE'): 32,
+        ('change-password', 'POST'): 7,
+        ('check-auth', 'GET'): 2,
+        ('user-list', 'GET'): 1,
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123'
+        )
+
+    def test_every_url_has_a_budget(self):
+        self.assertBudgetsCover(accounts_urls)
+
+    def test_auth_endpoints(self):
+        self.assertQueryBudget('register', 'POST', lambda: self.client.post(reverse('register'), {
+            'username': 'newuser', 'email': 'newuser@example.com', 'role': 'alumni',
+            'password': 'Newpass-12345', 'password2': 'Newpass-12345',
+        }, format='json'))
+        self.assertQueryBudget('login', 'POST', lambda: self.client.post(
+            reverse('login'), {'username': 'testuser', 'password': 'testpass123'}, format='json'
+        ))
+        self.assertQueryBudget('check-auth', 'GET', lambda: self.client.get(reverse('check-auth')))
+        self.assertQueryBudget('profile', 'GET', lambda: self.client.get(reverse('profile')))
+        self.assertQueryBudget('profile', 'PATCH', lambda: self.client.patch(
+            reverse('profile'), {'bio': 'Updated'}, format='json'
+        ))
+        self.assertQueryBudget('change-password', 'POST', lambda: self.client.post(reverse('change-password'), {
+            'old_password': 'testpass123', 'new_password': 'Changed-12345', 'new_password2': 'Changed-12345',
+        }, format='json'))
+
+        # Changing the password ends the session, so log out with the new token
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        self.assertQueryBudget('logout', 'POST', lambda: self.client.post(reverse('logout')))
+
+    def test_account_deletion(self):
+        """Deleting an account costs the same however much the user wrote"""
+        alumni = User.objects.create_user(username='writer', email='writer@example.com', role='alumni')
+        for index in range(3):
+            post = Post.objects.create(user=self.user, name='Me', role='Engineer', experience=f'Journey {index}')
+            Comment.objects.create(post=post, user=alumni, content='Thanks')
+            Comment.objects.create(post=post, user=self.user, content='Reply')
+        self.client.force_authenticate(user=self.user)
+        self.assertQueryBudget('profile', 'DELETE', lambda: self.client.delete(reverse('profile')))
+
+    def test_user_list_does_not_scale(self):
+        """Listing users is one query however many users exist"""
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+
+        def grow():
+            for index in range(5):
+                User.objects.create_user(
+                    username=f'user{index}', email=f'user{index}@example.com', password='testpass123'
+                )
+        self.assertQueriesDoNotScale('user-list', 'GET', lambda: self.client.get(reverse('user-list')), grow)
+
+
+class UserDirectoryTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('user-list')
+        self.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', is_staff=True
+        )
+        self.zoe = User.objects.create_user(
+            username='zoe_k', email='zoe.kulkarni@example.com', password='testpass123',
+            first_name='Zoë', last_name='Kulkarni', role='alumni', graduation_year=2019
+        )
+        self.priya = User.objects.create_user(
+            username='priya', email='priya@college.edu', password='testpass123',
+            first_name='Priya', last_name='Sharma', role='student', graduation_year=2026
+        )
+        self.client.force_authenticate(user=self.staff)
+
+    def usernames(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [user['username'] for user in response.data['results']]
+
+    def test_prefix_search(self):
+        """Words match name, username and email prefixes, accents ignored"""
+        self.assertEqual(self.usernames(search='zoe'), ['zoe_k'])
+        self.assertEqual(self.usernames(search='KULK zo'), ['zoe_k'])
+        self.assertEqual(self.usernames(search='sharma'), ['priya'])
+        self.assertEqual(self.usernames(search='priya@coll'), ['priya'])
+        self.assertEqual(self.usernames(search='zoe sharma'), [])
+
+    def test_filters(self):
+        self.assertEqual(self.usernames(role='alumni'), ['zoe_k'])
+        self.assertEqual(self.usernames(graduation_year='2026'), ['priya'])
+        response = self.client.get(self.url, {'graduation_year': 'soon'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_pagination(self):
+        """Pages follow newest-first order through opaque cursors"""
+        first = self.client.get(self.url, {'page_size': 2}).data
+        self.assertEqual([user['username'] for user in first['results']], ['priya', 'zoe_k'])
+        second = self.client.get(first['next']).data
+        self.assertEqual([user['username'] for user in second['results']], ['staff'])
+        self.assertIsNone(second['next'])
+
+    def test_sparse_fieldsets(self):
+        """?fields= and ?exclude= prune the users and the columns read"""
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get(self.url, {'fields': 'username,role_display', 'page_size': 2}).data
+        self.assertEqual(first['results'][0], {'id': self.priya.pk, 'username': 'priya', 'role_display': 'Student'})
+        self.assertNotIn('bio', queries.captured_queries[-1]['sql'])
+        second = self.client.get(first['next']).data
+        self.assertEqual([user['username'] for user in second['results']], ['staff'])
+
+        self.client.force_authenticate(user=self.priya)
+        profile = self.client.get(reverse('profile'), {'exclude': 'bio,email,is_staff'}).data
+        self.assertNotIn('email', profile)
+        self.assertEqual(profile['department'], self.priya.department)
+
+    def test_prefix_followed_by_any_character(self):
+        """Prefixes match terms continuing with characters beyond U+FFFF"""
+        self.priya.last_name = 'Ab\U00010400'
+        self.priya.save()
+        self.assertEqual(self.usernames(search='ab'), ['priya'])
+        self.assertEqual(search.prefix_end('ab'), 'ac')
+        self.assertEqual(search.prefix_end('a\U0010ffff'), 'b')
+        self.assertEqual(search.prefix_end('\ud7ff'), '\ue000')
+        self.assertIsNone(search.prefix_end('\U0010ffff'))
+
+    def test_terms_follow_profile_changes(self):
+        self.priya.last_name = 'Iyer'
+        self.priya.save()
+        self.assertEqual(self.usernames(search='iyer'), ['priya'])
+        self.assertEqual(self.usernames(search='sharma'), [])
+
+    def test_common_prefix(self):
+        """Prefixes shared by many users are matched per user"""
+        with mock.patch.object(search, 'BROAD_TERM_MATCHES', 1):
+            self.assertEqual(self.usernames(search='s'), ['priya', 'staff'])
+
+    def test_non_staff_forbidden(self):
+        self.client.force_authenticate(user=self.priya)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AccountDeletionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.leaver = User.objects.create_user(
+            username='leaver', email='leaver@example.com', password='testpass123', role='alumni'
+        )
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password='testpass123', role='alumni'
+        )
+        self.own_post = Post.objects.create(user=self.leaver, name='Leaver', role='Engineer', experience='Mine')
+        self.other_post = Post.objects.create(user=self.other, name='Other', role='Engineer', experience='Theirs')
+        Comment.objects.create(post=self.own_post, user=self.other, content='Great')
+        self.comment = Comment.objects.create(post=self.other_post, user=self.leaver, content='Agreed')
+        Like.objects.create(post=self.other_post, user=self.leaver)
+        Notification.objects.create(recipient=self.other, actor=self.leaver, verb='reply', post=self.other_post)
+        self.client.force_authenticate(user=self.leaver)
+
+    def test_account_is_hidden_at_once(self):
+        response = self.client.delete(reverse('profile'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.client.force_authenticate(user=None)
+        response = self.client.post(reverse('login'), {'username': 'leaver', 'password': 'testpass123'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        feed = self.client.get(reverse('post-list-create')).json()
+        self.assertEqual([post['id'] for post in feed], [self.other_post.pk])
+        self.assertEqual(feed[0]['comments'], [])
+        comments = self.client.get(reverse('comment-list-create', args=[self.other_post.pk])).data
+        self.assertEqual(comments, [])
+        # Nothing has been deleted yet
+        self.assertTrue(User.objects.filter(pk=self.leaver.pk).exists())
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_purge_removes_everything(self):
+        self.client.delete(reverse('profile'))
+        call_command('run_worker', once=True, concurrency=1, stdout=StringIO())
+
+        self.assertFalse(User.objects.filter(pk=self.leaver.pk).exists())
+        self.assertEqual(list(Post.objects.values_list('pk', flat=True)), [self.other_post.pk])
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Like.objects.exists())
+        self.assertIsNone(Notification.objects.get().actor_id)
+        self.assertEqual(stats.get_stats()['totals'], {'posts': 1, 'comments': 0, 'likes': 0, 'views': 0})
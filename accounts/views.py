@@ -1,4 +1,5 @@
 from rest_framework import status
+from rest_framework.pagination import CursorPagination
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -6,6 +7,7 @@ from rest_framework.authtoken.models import Token
 from django.contrib.auth import login, logout
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from alumni_forum.projection import requested_fields
 from .serializers import (
     UserSerializer,
     RegisterSerializer,
@@ -14,6 +16,8 @@ from .serializers import (
     ChangePasswordSerializer
 )
 from .models import User
+from . import deletion as user_deletion
+from . import search as user_search
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -79,7 +83,7 @@ class ProfileView(APIView):
     
     def get(self, request):
         """Get current user's profile"""
-        serializer = UserSerializer(request.user)
+        serializer = UserSerializer(request.user, projection=requested_fields(request, UserSerializer))
         return Response(serializer.data, status=status.HTTP_200_OK)
     
     def put(self, request):
@@ -102,6 +106,12 @@ class ProfileView(APIView):
         """Partial update - same as PUT"""
         return self.put(request)
 
+    def delete(self, request):
+        """Delete the account; its posts and comments disappear at once and are purged later"""
+        user_deletion.delete_account(request.user)
+        logout(request)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 @method_decorator(csrf_exempt, name='dispatch')
 class ChangePasswordView(APIView):
@@ -141,7 +151,9 @@ class CheckAuthView(APIView):
         if request.user.is_authenticated:
             return Response({
                 'isAuthenticated': True,
-                'user': UserSerializer(request.user).data
+                'user': UserSerializer(
+                    request.user, projection=requested_fields(request, UserSerializer)
+                ).data
             }, status=status.HTTP_200_OK)
         return Response({
             'isAuthenticated': False,
@@ -149,9 +161,17 @@ class CheckAuthView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class UserDirectoryPagination(CursorPagination):
+    """Newest members first; cursors stay stable while users sign up"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-date_joined', '-id')
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class UserListView(APIView):
-    """List users (admin only) or search users"""
+    """List and search users (admin only), paginated by cursor"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
@@ -161,22 +181,32 @@ class UserListView(APIView):
                 'error': 'Permission denied'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        users = User.objects.all().order_by('-date_joined')
+        users = User.objects.all()
         
         # Filter by role if provided
         role = request.query_params.get('role')
         if role:
             users = users.filter(role=role)
+
+        graduation_year = request.query_params.get('graduation_year')
+        if graduation_year:
+            if not graduation_year.isdigit():
+                return Response({
+                    'error': 'graduation_year must be a year'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            users = users.filter(graduation_year=int(graduation_year))
         
-        # Search by username or email
-        search = request.query_params.get('search')
-        if search:
-            users = users.filter(
-                models.Q(username__icontains=search) |
-                models.Q(email__icontains=search) |
-                models.Q(first_name__icontains=search) |
-                models.Q(last_name__icontains=search)
-            )
+        # Prefix search over username, names and email
+        query = request.query_params.get('search')
+        if query:
+            users = user_search.search(users, query)
         
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        projection = requested_fields(request, UserSerializer)
+        if projection is not None:
+            # The cursor reads the ordering columns
+            ordering = [column.lstrip('-') for column in UserDirectoryPagination.ordering]
+            users = UserSerializer.load_only(users, projection, *ordering)
+        paginator = UserDirectoryPagination()
+        page = paginator.paginate_queryset(users, request, view=self)
+        serializer = UserSerializer(page, many=True, projection=projection)
+        return paginator.get_paginated_response(serializer.data)
@@ -0,0 +1,203 @@
+"""
+Static asset pipeline for the frontend.
+
+``collectstatic`` gathers ``frontend/`` (and the admin/DRF assets) into
+``STATIC_ROOT`` through :class:`CompressedManifestStaticFilesStorage`,
+which fingerprints every file (``header.js`` -> ``header.3f2a9c1b7d4e.js``)
+and writes ``.gz`` / ``.br`` copies next to each compressible one.
+
+:class:`AssetsMiddleware` serves ``STATIC_ROOT`` from the app process,
+WhiteNoise style: fingerprinted files get a one-year ``immutable``
+Cache-Control so browsers never revalidate them, and the precompressed
+copy matching ``Accept-Encoding`` is sent without compressing per request.
+Files in ``ASSETS_ROOT`` are also served at the site root (for URLs the
+frontend builds relative to the page, such as ``images/``).
+
+:func:`frontend_page` serves the HTML pages themselves with their
+``<script src>`` and ``<link href>`` references pointing at the
+fingerprinted files. Pages are always revalidated (cheaply, by ETag), so a
+deploy is picked up on the next visit.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+
+from .compression import CODECS, COMPRESSIBLE_TYPES, choose_codec
+
+# Precompressed copies and the coding they carry, in preference order
+VARIANTS = {'br': '.br', 'gzip': '.gz'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+_asset_re = re.compile(
+    r"""(?P<prefix><(?:script|link)\b[^>]*?\s(?:src|href)=)(?P<quote>["'])(?P<url>[^"'#?]+)(?P=quote)""",
+    re.IGNORECASE,
+)
+
+
+def _is_compressible(name):
+    content_type, _ = mimetypes.guess_type(name)
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes .gz and .br copies of text files"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in {*paths, *self.hashed_files.values()}:
+            if _is_compressible(name):
+                self.write_variants(name)
+
+    def write_variants(self, name):
+        with self.open(name) as handle:
+            content = handle.read()
+        for coding, suffix in VARIANTS.items():
+            codec = CODECS.get(coding)
+            if codec is None:
+                continue
+            compressed = codec.compress(content)
+            # Not worth a separate file unless it saves at least 5%
+            if len(compressed) < len(content) * 0.95:
+                with open(self.path(name + suffix), 'wb') as handle:
+                    handle.write(compressed)
+
+
+class StaticFile:
+    """A servable file with its headers and precompressed variants"""
+
+    def __init__(self, path, cache_control):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.cache_control = cache_control
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.last_modified = http_date(stat.st_mtime)
+        self.etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+        self.variants = {
+            coding: path + suffix for coding, suffix in VARIANTS.items() if os.path.exists(path + suffix)
+        }
+
+
+def _scan(directory, url_prefix, cache_control_for, include=lambda name: True):
+    files = {}
+    if not directory or not os.path.isdir(directory):
+        return files
+    for root, _, names in os.walk(directory):
+        for filename in names:
+            if filename.endswith(tuple(VARIANTS.values())):
+                continue
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, directory).replace(os.sep, '/')
+            if include(name):
+                files[url_prefix + name] = StaticFile(path, cache_control_for(name))
+    return files
+
+
+class AssetsMiddleware:
+    """Serve collected static files with far-future caching for fingerprinted names"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'ASSETS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.files = self.build_index()
+
+    def build_index(self):
+        max_age = f"public, max-age={getattr(settings, 'ASSETS_MAX_AGE', 60)}"
+        hashed = set()
+        if isinstance(staticfiles_storage, ManifestStaticFilesStorage):
+            hashed = set(staticfiles_storage.hashed_files.values())
+
+        static_url = '/' + settings.STATIC_URL.lstrip('/')
+        files = _scan(settings.STATIC_ROOT, static_url, lambda name: IMMUTABLE if name in hashed else max_age)
+        root_files = _scan(
+            getattr(settings, 'ASSETS_ROOT', None), '/', lambda name: max_age,
+            include=lambda name: not name.endswith('.html'),
+        )
+        return {**root_files, **files}
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD'):
+            static_file = self.files.get(request.path_info)
+            if static_file is not None:
+                return self.serve(request, static_file)
+        return self.get_response(request)
+
+    def serve(self, request, static_file):
+        if request.META.get('HTTP_IF_NONE_MATCH') == static_file.etag:
+            response = HttpResponseNotModified()
+        else:
+            path, coding = static_file.path, None
+            if static_file.variants:
+                codec = choose_codec(request.META.get('HTTP_ACCEPT_ENCODING', ''), list(static_file.variants))
+                if codec is not None:
+                    path, coding = static_file.variants[codec.name], codec.name
+            response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+            if coding:
+                response['Content-Encoding'] = coding
+            if request.method == 'HEAD':
+                response.streaming_content = []
+        if static_file.variants:
+            response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = static_file.cache_control
+        response['ETag'] = static_file.etag
+        response['Last-Modified'] = static_file.last_modified
+        return response
+
+
+def _read_page(page):
+    if staticfiles_storage.exists(page):
+        with staticfiles_storage.open(page) as handle:
+            return handle.read().decode('utf-8')
+    path = finders.find(page)
+    if not path:
+        raise Http404('No such page')
+    with open(path, encoding='utf-8') as handle:
+        return handle.read()
+
+
+def _static_url(match):
+    url = match.group('url')
+    if re.match(r'^[a-z]+:', url) or url.startswith(('/', '//')):
+        return match.group(0)
+    try:
+        url = staticfiles_storage.url(url)
+    except ValueError:
+        # Not collected (missing manifest entry), keep the relative reference
+        return match.group(0)
+    return f"{match.group('prefix')}{match.group('quote')}{url}{match.group('quote')}"
+
+
+def render_page(page):
+    """Page HTML with asset references rewritten to their fingerprinted URLs"""
+    html = _asset_re.sub(_static_url, _read_page(page))
+    return html, '"%s"' % hashlib.md5(html.encode(), usedforsecurity=False).hexdigest()
+
+
+_cached_page = lru_cache(maxsize=None)(render_page)
+
+
+def frontend_page(request, page='index.html'):
+    """Serve a frontend HTML page; always revalidated, never stale"""
+    if '/' in page or not page.endswith('.html'):
+        raise Http404('No such page')
+    # Pages only change on deploy, except while developing
+    html, etag = render_page(page) if settings.DEBUG else _cached_page(page)
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(html, content_type='text/html; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    response['ETag'] = etag
+    return response
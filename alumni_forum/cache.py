@@ -0,0 +1,165 @@
+"""
+Read-through caching for expensive reads.
+
+``cached(key, compute, timeout)`` returns the cached value of ``key`` or
+computes and stores it, and keeps an expiring hot key from turning into a
+stampede of identical recomputations:
+
+- Single flight: one caller per key recomputes. Other threads of the
+  process wait for its result; other processes find the key's lock taken
+  in the cache (``cache.add``, with ``CACHE_LOCK_ENABLED``) and wait for
+  the value to appear.
+- Probabilistic early expiration (XFetch): every hit recomputes early with
+  a probability that rises as the expiry nears, scaled by how long the
+  value took to compute (and ``CACHE_EARLY_EXPIRATION_BETA``), so a busy
+  key is usually refreshed by a single request before it expires at all.
+- Stale while revalidate: values are kept ``CACHE_STALE_TIMEOUT`` seconds
+  past their expiry and served while the one caller recomputes.
+
+``invalidate(key)`` expires a value but keeps it for stale reads, so the
+next read recomputes while concurrent ones still get the previous value.
+``evict(key)`` deletes it outright, for values that must not be served
+again at all (e.g. content that was just taken down).
+"""
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import record_cache
+
+_MISSING = object()
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class _Flight:
+    """One in-process recomputation of a key that other threads can wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = _MISSING
+
+
+def _join(key):
+    """Return (flight, leader): the running flight for ``key``, or a new one led by the caller"""
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is not None:
+            return flight, False
+        flight = _flights[key] = _Flight()
+        return flight, True
+
+
+def _land(key, flight, value):
+    flight.value = value
+    with _flights_lock:
+        _flights.pop(key, None)
+    flight.done.set()
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _acquire(key):
+    if not _setting('CACHE_LOCK_ENABLED', True):
+        return True
+    return cache.add(_lock_key(key), 1, _setting('CACHE_LOCK_TIMEOUT', 10))
+
+
+def _release(key):
+    if _setting('CACHE_LOCK_ENABLED', True):
+        cache.delete(_lock_key(key))
+
+
+def _store(key, compute, timeout):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    cache.set(key, (value, time.time() + timeout, delta), timeout + _setting('CACHE_STALE_TIMEOUT', 300))
+    return value
+
+
+def _wait_for(key, deadline):
+    """Poll the cache for a value another process is computing"""
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return _MISSING
+
+
+def _fresh(expires_at, delta):
+    beta = _setting('CACHE_EARLY_EXPIRATION_BETA', 1.0)
+    # -log(u) for u in (0, 1] is exponentially distributed: usually small, rarely large
+    return time.time() - delta * beta * math.log(1.0 - random.random()) < expires_at
+
+
+def cached(key, compute, timeout, name=None):
+    """
+    The value of ``key``, computed with ``compute()`` and kept ``timeout`` seconds.
+
+    ``name`` labels the lookups in the cache hit-ratio metrics.
+    """
+    entry = cache.get(key)
+    record_cache(name or key, entry is not None)
+    if entry is not None:
+        value, expires_at, delta = entry
+        if _fresh(expires_at, delta):
+            return value
+        # Expired, or picked to refresh early: one caller recomputes, the others keep this value
+        flight, leader = _join(key)
+        if not leader:
+            return value
+        if not _acquire(key):
+            _land(key, flight, value)
+            return value
+        try:
+            value = _store(key, compute, timeout)
+            return value
+        finally:
+            _release(key)
+            _land(key, flight, value)
+
+    wait = _setting('CACHE_LOCK_TIMEOUT', 10)
+    flight, leader = _join(key)
+    if not leader:
+        if flight.done.wait(wait) and flight.value is not _MISSING:
+            return flight.value
+        # The leader failed or is too slow: compute without coordination
+        return compute()
+
+    value = _MISSING
+    locked = _acquire(key)
+    try:
+        if not locked:
+            value = _wait_for(key, time.monotonic() + wait)
+        if value is _MISSING:
+            value = _store(key, compute, timeout)
+        return value
+    finally:
+        if locked:
+            _release(key)
+        _land(key, flight, value)
+
+
+def invalidate(*keys):
+    """Expire the values of ``keys``; they are still served while being recomputed"""
+    stale = _setting('CACHE_STALE_TIMEOUT', 300)
+    for key, entry in cache.get_many(keys).items():
+        cache.set(key, (entry[0], 0, entry[2]), stale)
+
+
+def evict(*keys):
+    """Delete the values of ``keys``; unlike ``invalidate`` nobody is served them again"""
+    cache.delete_many(keys)
@@ -0,0 +1,208 @@
+"""
+Response compression negotiated by ``Accept-Encoding``.
+
+gzip is always available; brotli (``pip install brotli``) and zstd
+(``pip install zstandard``) are offered when installed, in the order of
+``COMPRESSION_ENCODINGS``. Responses smaller than ``COMPRESSION_MIN_SIZE``,
+already encoded, or not compressible text are sent as they are. Streaming
+responses are compressed chunk by chunk.
+
+Responses of the views named in ``COMPRESSION_CACHE_VIEWS`` keep their
+compressed body in the cache, keyed by encoding and a hash of the raw
+body, so a hot payload such as the feed is compressed once rather than
+once per request.
+"""
+import gzip
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from .metrics import record_cache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+CACHE_PREFIX = 'compression'
+
+_accept_re = _lazy_re_compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*')
+
+
+class Codec:
+    """One content coding: one-shot compression plus a streaming compressor"""
+
+    def __init__(self, name, compress, compressobj):
+        self.name = name
+        self.compress = compress
+        self.compressobj = compressobj
+
+
+class _GzipStream:
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=5)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _ZstdStream:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+def _available_codecs():
+    codecs = {'gzip': Codec('gzip', lambda data: gzip.compress(data, 6, mtime=0), _GzipStream)}
+    if brotli is not None:
+        codecs['br'] = Codec('br', lambda data: brotli.compress(data, quality=5), _BrotliStream)
+    if zstandard is not None:
+        codecs['zstd'] = Codec('zstd', zstandard.ZstdCompressor(level=3).compress, _ZstdStream)
+    return codecs
+
+
+CODECS = _available_codecs()
+
+
+def choose_codec(accept_encoding, preferred=None):
+    """Pick the first preferred coding the client accepts with q > 0, or None"""
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        match = _accept_re.fullmatch(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        accepted[match.group(1)] = quality
+
+    preferred = preferred or getattr(settings, 'COMPRESSION_ENCODINGS', ('br', 'zstd', 'gzip'))
+    wildcard = accepted.get('*', 0)
+    for name in preferred:
+        if name in CODECS and accepted.get(name, wildcard) > 0:
+            return CODECS[name]
+    return None
+
+
+def _is_compressible(response):
+    content_type = response.get('Content-Type', '').lower()
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+def _stream(codec, chunks):
+    compressor = codec.compressobj()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        # Flush every chunk so clients see data as soon as the view yields it
+        data += compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _astream(codec, chunks):
+    compressor = codec.compressobj()
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """Compress responses with the best coding the client accepts"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'COMPRESSION_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.cache_views = set(getattr(settings, 'COMPRESSION_CACHE_VIEWS', ()))
+        self.cache_timeout = getattr(settings, 'COMPRESSION_CACHE_TIMEOUT', 300)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding') or not _is_compressible(response):
+            return response
+        # Vary before deciding, so caches never serve one client's coding to another
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        codec = choose_codec(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if codec is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _astream(codec, response.streaming_content)
+            else:
+                response.streaming_content = _stream(codec, response.streaming_content)
+            del response['Content-Length']
+        else:
+            if len(response.content) < self.min_size:
+                return response
+            compressed = self.compress(request, codec, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # The entity changed, so a strong validator no longer applies
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = codec.name
+        return response
+
+    def compress(self, request, codec, content):
+        match = getattr(request, 'resolver_match', None)
+        if not match or match.url_name not in self.cache_views:
+            return codec.compress(content)
+
+        digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+        key = f'{CACHE_PREFIX}:{codec.name}:{digest}'
+        compressed = cache.get(key)
+        record_cache('compression', compressed is not None)
+        if compressed is None:
+            compressed = codec.compress(content)
+            cache.set(key, compressed, self.cache_timeout)
+        return compressed
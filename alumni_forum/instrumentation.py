@@ -0,0 +1,167 @@
+"""
+Opt-in per-request instrumentation.
+
+With ``INSTRUMENTATION_ENABLED = True`` every request records its query
+count, total SQL time, time spent building serializer data and wall time.
+The numbers are returned in a ``Server-Timing`` header (visible in the
+browser dev tools) and written as one structured log line per request.
+Requests slower than ``INSTRUMENTATION_SLOW_REQUEST_MS`` additionally log
+their slowest queries.
+
+When disabled the middleware removes itself from the stack at startup, so
+there is no per-request overhead at all.
+"""
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('alumni_forum.instrumentation')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Timings collected for a single request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.sql_time = 0.0
+        self.spans = {}
+        self.active_spans = set()
+
+    def record_query(self, sql, duration):
+        self.queries.append((duration, sql))
+        self.sql_time += duration
+
+    def add_span(self, name, duration):
+        self.spans[name] = self.spans.get(name, 0.0) + duration
+
+    @property
+    def wall_time(self):
+        return time.perf_counter() - self.started
+
+    def slowest_queries(self, count):
+        return sorted(self.queries, key=lambda query: query[0], reverse=True)[:count]
+
+
+def current_metrics():
+    """Return the metrics of the request being handled, if instrumented"""
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """
+    Time a block of code and add it to the current request's Server-Timing.
+
+    Nested spans with the same name (e.g. a serializer rendering a nested
+    serializer) are only counted once. A no-op outside instrumented requests.
+    """
+    metrics = _current.get()
+    if metrics is None or name in metrics.active_spans:
+        yield
+        return
+
+    metrics.active_spans.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.active_spans.discard(name)
+        metrics.add_span(name, time.perf_counter() - started)
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - started)
+
+
+def _install_serializer_timer():
+    """Wrap ``BaseSerializer.data`` so serializer work shows up as a span"""
+    from rest_framework.serializers import BaseSerializer
+
+    if getattr(BaseSerializer, '_instrumented', False):
+        return
+    original = BaseSerializer.data.fget
+
+    def data(self):
+        with span('serializer'):
+            return original(self)
+
+    BaseSerializer.data = property(data)
+    BaseSerializer._instrumented = True
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class InstrumentationMiddleware:
+    """Attach query and timing metrics to every request"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'INSTRUMENTATION_SLOW_REQUEST_MS', 500)
+        self.slow_query_count = getattr(settings, 'INSTRUMENTATION_SLOW_QUERY_COUNT', 5)
+        _install_serializer_timer()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        wall_time = metrics.wall_time
+        timings = [f'db;dur={_ms(metrics.sql_time)};desc="{len(metrics.queries)} queries"']
+        timings += [f'{name};dur={_ms(duration)}' for name, duration in metrics.spans.items()]
+        timings.append(f'total;dur={_ms(wall_time)}')
+        response['Server-Timing'] = ', '.join(timings)
+
+        self.log(request, response, metrics, wall_time)
+        return response
+
+    def log(self, request, response, metrics, wall_time):
+        match = getattr(request, 'resolver_match', None)
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.url_name if match else None,
+            'status': response.status_code,
+            'queries': len(metrics.queries),
+            'sql_ms': _ms(metrics.sql_time),
+            'serializer_ms': _ms(metrics.spans.get('serializer', 0.0)),
+            'total_ms': _ms(wall_time),
+        }
+        message = ' '.join(f'{key}={value}' for key, value in fields.items())
+        logger.info('request %s', message, extra={'instrumentation': fields})
+
+        if fields['total_ms'] >= self.slow_request_ms:
+            worst = [
+                {'ms': _ms(duration), 'sql': sql[:500]}
+                for duration, sql in metrics.slowest_queries(self.slow_query_count)
+            ]
+            logger.warning(
+                'slow request %s\n%s', message,
+                '\n'.join(f"  {query['ms']}ms {query['sql']}" for query in worst),
+                extra={'instrumentation': dict(fields, slow_queries=worst)},
+            )
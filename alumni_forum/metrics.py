@@ -0,0 +1,380 @@
+"""
+In-process metrics registry with a Prometheus text endpoint.
+
+Counters and histograms are sharded per thread: every thread only ever
+writes to its own dict, so recording a sample takes no lock. Shards are
+merged when ``/metrics`` is scraped.
+
+Under gunicorn each worker has its own registry. Set
+``METRICS_MULTIPROCESS_DIR`` to a directory shared by the workers of one
+host (e.g. a tmpfs mount) and each worker periodically writes its samples
+to ``metrics-<pid>.json`` there; the scrape then sums the files of all
+workers and deletes those of workers that have exited.
+
+``/metrics`` is served to staff users, clients in ``METRICS_ALLOWED_IPS``
+and requests carrying ``Authorization: Bearer <METRICS_TOKEN>``.
+"""
+import bisect
+import hmac
+import json
+import os
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, JsonResponse
+
+from .profiling import is_staff_request
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0
+)
+LABEL_SEPARATOR = '\x1f'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _labels(self, labels):
+        return LABEL_SEPARATOR.join(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self):
+        """Merge the per-thread shards into {label key: value}"""
+        merged = {}
+        for shard in list(self._shards):
+            for key, value in list(shard.items()):
+                merged[key] = self._merge(merged.get(key), value)
+        return merged
+
+    def export(self):
+        return {
+            'type': self.kind,
+            'help': self.documentation,
+            'labelnames': list(self.labelnames),
+            'samples': self.samples(),
+        }
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._labels(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    @staticmethod
+    def _merge(current, value):
+        return (current or 0) + value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._labels(labels)
+        # Layout: one (non-cumulative) count per bucket plus +Inf, then sum
+        state = shard.get(key)
+        if state is None:
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @staticmethod
+    def _merge(current, value):
+        if current is None:
+            return list(value)
+        return [a + b for a, b in zip(current, value)]
+
+    def export(self):
+        data = super().export()
+        data['buckets'] = list(self.buckets)
+        return data
+
+
+class Gauge:
+    """A gauge whose value is computed by a callback at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def export(self):
+        return {
+            'type': self.kind,
+            'help': self.documentation,
+            'labelnames': [],
+            'samples': {'': self.callback()},
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._last_flush = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def export(self):
+        return {name: metric.export() for name, metric in self.metrics.items()}
+
+    def collect(self):
+        """Return the samples of this process, or of every worker in multiprocess mode"""
+        directory = getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+        if not directory:
+            return self.export()
+
+        self.flush(force=True)
+        combined = {}
+        for filename in sorted(os.listdir(directory)):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            path = os.path.join(directory, filename)
+            pid = filename[len('metrics-'):-len('.json')]
+            if pid.isdigit() and not _process_alive(int(pid)):
+                # An exited worker; a restart must not keep adding its samples
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as handle:
+                    exported = json.load(handle)
+            except (OSError, ValueError):
+                continue
+            for name, data in exported.items():
+                target = combined.setdefault(name, dict(data, samples={}))
+                merge = Histogram._merge if data['type'] == 'histogram' else Counter._merge
+                for key, value in data['samples'].items():
+                    target['samples'][key] = merge(target['samples'].get(key), value)
+        return combined
+
+    def flush(self, force=False):
+        """Write this worker's samples to the multiprocess directory"""
+        directory = getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+            return
+        self._last_flush = now
+
+        path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as handle:
+            json.dump(self.export(), handle)
+        os.replace(temporary, path)
+
+
+def _process_alive(pid):
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to another user
+        return True
+    return True
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by URL name',
+    labelnames=('view', 'method'),
+))
+REQUESTS = REGISTRY.register(Counter(
+    'http_requests_total', 'Requests by URL name and status code',
+    labelnames=('view', 'method', 'status'),
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'cache_requests_total', 'Application cache lookups by result',
+    labelnames=('cache', 'result'),
+))
+DB_CONNECTIONS_OPENED = REGISTRY.register(Counter(
+    'db_connections_opened_total', 'Database connections opened',
+    labelnames=('alias',),
+))
+
+_connections = weakref.WeakSet()
+
+
+def _open_connections():
+    return sum(1 for wrapper in list(_connections) if wrapper.connection is not None)
+
+
+REGISTRY.register(Gauge(
+    'db_connections_open', 'Database connections currently open', _open_connections
+))
+
+
+def _track_connection(sender, connection, **kwargs):
+    _connections.add(connection)
+    DB_CONNECTIONS_OPENED.inc(alias=connection.alias)
+
+
+connection_created.connect(_track_connection)
+
+
+def record_cache(cache_name, hit):
+    """Count an application cache lookup (used for hit-ratio reporting)"""
+    CACHE_REQUESTS.inc(cache=cache_name, result='hit' if hit else 'miss')
+
+
+def quantile(buckets, counts, q):
+    """Estimate a quantile from histogram buckets by linear interpolation"""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    lower = 0.0
+    for upper, count in zip(list(buckets) + [float('inf')], counts):
+        if count and seen + count >= rank:
+            if upper == float('inf'):
+                return lower
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+        lower = upper
+    return lower
+
+
+def _format_labels(labelnames, key, extra=None):
+    values = key.split(LABEL_SEPARATOR) if labelnames else []
+    pairs = list(zip(labelnames, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    escaped = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in pairs
+    ]
+    return '{' + ','.join(escaped) + '}'
+
+
+def render_prometheus(collected):
+    lines = []
+    for name, data in sorted(collected.items()):
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['type']}")
+        labelnames = data['labelnames']
+        for key, value in sorted(data['samples'].items()):
+            if data['type'] != 'histogram':
+                lines.append(f'{name}{_format_labels(labelnames, key)} {value}')
+                continue
+            cumulative = 0
+            bounds = [str(bound) for bound in data['buckets']] + ['+Inf']
+            for bound, count in zip(bounds, value[:-1]):
+                cumulative += count
+                labels = _format_labels(labelnames, key, [('le', bound)])
+                lines.append(f'{name}_bucket{labels} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labelnames, key)} {value[-1]}')
+            lines.append(f'{name}_count{_format_labels(labelnames, key)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def summarize(collected):
+    """Per-view request counts and latency percentiles (in milliseconds)"""
+    latency = collected.get(REQUEST_LATENCY.name)
+    views = {}
+    if latency:
+        for key, value in latency['samples'].items():
+            view, method = key.split(LABEL_SEPARATOR)
+            counts = value[:-1]
+            views[f'{method} {view}'] = {
+                'count': sum(counts),
+                'mean_ms': round(value[-1] / sum(counts) * 1000, 2) if sum(counts) else None,
+                **{
+                    f'p{int(q * 100)}_ms': round(quantile(latency['buckets'], counts, q) * 1000, 2)
+                    for q in (0.5, 0.95, 0.99)
+                },
+            }
+
+    caches = {}
+    cache_requests = collected.get(CACHE_REQUESTS.name)
+    if cache_requests:
+        for key, value in cache_requests['samples'].items():
+            cache_name, result = key.split(LABEL_SEPARATOR)
+            caches.setdefault(cache_name, {'hit': 0, 'miss': 0})[result] = value
+        for counts in caches.values():
+            lookups = counts['hit'] + counts['miss']
+            counts['hit_ratio'] = round(counts['hit'] / lookups, 4) if lookups else None
+    return {'views': views, 'caches': caches}
+
+
+def _scrape_allowed(request):
+    if request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ()):
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and hmac.compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', '').encode(), f'Bearer {token}'.encode()
+    ):
+        return True
+    return is_staff_request(request)
+
+
+def metrics_view(request):
+    """Prometheus text exposition (or ?format=json for a percentile summary)"""
+    if not getattr(settings, 'METRICS_ENABLED', False):
+        raise Http404
+    if not _scrape_allowed(request):
+        raise PermissionDenied
+    collected = REGISTRY.collect()
+    if request.GET.get('format') == 'json':
+        return JsonResponse(summarize(collected))
+    return HttpResponse(
+        render_prometheus(collected),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+class MetricsMiddleware:
+    """Record latency and throughput for every request, keyed by URL name"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        REQUEST_LATENCY.observe(duration, view=view, method=request.method)
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        REGISTRY.flush()
+        return response
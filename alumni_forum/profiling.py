@@ -0,0 +1,144 @@
+"""
+On-demand profiling of a single request.
+
+Staff can profile any request by sending the ``X-Profile`` header or the
+``_profile`` query parameter:
+
+* ``X-Profile: 1`` (or ``?_profile=1``) runs the request under cProfile,
+  writes the profile to ``PROFILING_OUTPUT_DIR`` and returns the normal
+  response with an ``X-Profile-File`` header naming the file. Open it with
+  ``python -m pstats`` or snakeviz.
+* ``X-Profile: collapsed`` returns a collapsed-stack summary
+  (``frame;frame;frame microseconds`` per line) instead of the response,
+  ready for flamegraph.pl or speedscope.
+
+With ``PROFILING_BACKEND = 'pyinstrument'`` and pyinstrument installed, the
+sampling profiler is used instead and writes an HTML report.
+
+Requests that don't ask for a profile only pay for a header lookup.
+"""
+import cProfile
+import os
+import pstats
+import re
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:  # pragma: no cover - optional dependency
+    SamplingProfiler = None
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+
+
+def is_staff_request(request):
+    """Whether the request comes from a staff user, by session or API token"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+
+    # Token-authenticated API clients are only identified inside DRF views
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.exceptions import AuthenticationFailed
+    try:
+        result = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return bool(result and result[0].is_staff)
+
+
+def _frame_label(func):
+    filename, lineno, name = func
+    if filename == '~':
+        return name
+    return f'{os.path.basename(filename)}:{lineno}({name})'
+
+
+def collapsed_stacks(profile):
+    """
+    Approximate collapsed stacks from a cProfile run.
+
+    cProfile only records caller/callee edges, so each function's own time
+    is attributed to the chain of its heaviest callers.
+    """
+    stats = pstats.Stats(profile).stats
+    lines = []
+    for func, (_, _, own_time, _, callers) in stats.items():
+        if own_time <= 0:
+            continue
+        stack = [func]
+        seen = {func}
+        current = callers
+        while current:
+            caller = max(current, key=lambda candidate: current[candidate][3])
+            if caller in seen:
+                break
+            stack.append(caller)
+            seen.add(caller)
+            current = stats.get(caller, (0, 0, 0, 0, {}))[4]
+        frames = ';'.join(_frame_label(frame) for frame in reversed(stack))
+        lines.append((frames, int(own_time * 1_000_000)))
+    lines.sort(key=lambda line: line[1], reverse=True)
+    return '\n'.join(f'{frames} {micros}' for frames, micros in lines if micros) + '\n'
+
+
+def _output_path(request, extension):
+    directory = getattr(settings, 'PROFILING_OUTPUT_DIR', None) or settings.BASE_DIR / 'profiles'
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+    filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{slug}-{os.getpid()}.{extension}"
+    return os.path.join(directory, filename)
+
+
+class ProfilingMiddleware:
+    """Profile single requests on demand (staff only)"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+        if not mode or not is_staff_request(request):
+            return self.get_response(request)
+
+        backend = getattr(settings, 'PROFILING_BACKEND', 'cprofile')
+        if backend == 'pyinstrument' and SamplingProfiler and mode != 'collapsed':
+            return self.sample(request)
+        return self.profile(request, mode)
+
+    def profile(self, request, mode):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+
+        if mode == 'collapsed':
+            return HttpResponse(collapsed_stacks(profile), content_type='text/plain; charset=utf-8')
+
+        path = _output_path(request, 'prof')
+        profile.dump_stats(path)
+        response['X-Profile-File'] = os.path.basename(path)
+        return response
+
+    def sample(self, request):
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+
+        path = _output_path(request, 'html')
+        with open(path, 'w') as handle:
+            handle.write(profiler.output_html())
+        response['X-Profile-File'] = os.path.basename(path)
+        return response
@@ -0,0 +1,59 @@
+"""
+Sparse fieldsets for read endpoints.
+
+``?fields=id,role,likes`` keeps only the listed fields of each object and
+``?exclude=comments,email`` drops fields (comma-separated, unknown names
+are ignored, ``id`` is always kept). Serializers opt in with
+``ProjectedFieldsMixin``; views pass the result of ``requested_fields()``
+to the serializer as ``projection`` and narrow their queryset with
+``Serializer.load_only()``, so the ORM reads only the columns behind the
+remaining fields and joins only the relations they reach through.
+Prefetches and annotations that back a field (nested comments, counts) are
+left to each view to skip when the field is not requested.
+"""
+
+
+def _names(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def requested_fields(request, serializer_class, extra=()):
+    """
+    The field names of ``serializer_class`` (plus ``extra`` ones a view adds) to render.
+
+    Returns None when the request asks for every field.
+    """
+    fields = _names(request.query_params.get('fields'))
+    exclude = _names(request.query_params.get('exclude'))
+    if not fields and not exclude:
+        return None
+    available = [*serializer_class.Meta.fields, *extra]
+    return {
+        name for name in available
+        if name == 'id' or ((not fields or name in fields) and name not in exclude)
+    }
+
+
+class ProjectedFieldsMixin:
+    """Renders only the fields in the ``projection`` keyword argument (all of them when None)"""
+
+    # Model columns behind fields that are not a model field of the same name;
+    # 'user__username' joins the user, an empty list needs no column at all
+    field_columns = {}
+
+    def __init__(self, *args, projection=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if projection is not None:
+            for name in set(self.fields) - set(projection):
+                self.fields.pop(name)
+
+    @classmethod
+    def load_only(cls, queryset, projection, *columns):
+        """Narrow ``queryset`` to the columns ``projection`` (and ``columns``) read"""
+        columns = {queryset.model._meta.pk.name, *columns}
+        for name in set(projection) & set(cls.Meta.fields):
+            columns.update(cls.field_columns.get(name, [name]))
+        joins = {column.rsplit('__', 1)[0] for column in columns if '__' in column}
+        if joins:
+            queryset = queryset.select_related(*joins)
+        return queryset.only(*columns)
@@ -42,15 +42,22 @@ INSTALLED_APPS = [
     'corsheaders',
     'posts',
     'accounts',
+    'jobs',
+    'notifications',
 ]
 
 MIDDLEWARE = [
+    'alumni_forum.instrumentation.InstrumentationMiddleware',
+    'alumni_forum.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'alumni_forum.assets.AssetsMiddleware',
+    'alumni_forum.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'alumni_forum.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -122,6 +129,20 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STATICFILES_DIRS = [BASE_DIR / 'frontend']
+
+# `collectstatic` fingerprints files and writes .gz/.br copies (alumni_forum.assets)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'alumni_forum.assets.CompressedManifestStaticFilesStorage'},
+}
+
+# Serve STATIC_ROOT from the app process; fingerprinted files are cached for a year
+ASSETS_ENABLED = True
+ASSETS_MAX_AGE = 60
+# Served at the site root too, for paths the frontend builds relative to the page
+ASSETS_ROOT = BASE_DIR / 'frontend'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -145,6 +166,7 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'x-profile',
 ]
 
 SESSION_COOKIE_SAMESITE = 'Lax'
@@ -169,5 +191,147 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+    # orjson-backed JSON when installed (alumni_forum.renderers), stdlib otherwise
+    'DEFAULT_RENDERER_CLASSES': [
+        'alumni_forum.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'alumni_forum.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+
+# Admin changelists count exactly up to this many rows, then estimate (alumni_forum.paginators)
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Trending feed (posts.ranking)
+# Score = (likes + TRENDING_COMMENT_WEIGHT * comments + 1) / (age_hours + 2) ** TRENDING_GRAVITY
+# Keep `python manage.py update_trending --loop 300` running to let scores decay
+TRENDING_GRAVITY = 1.5
+TRENDING_COMMENT_WEIGHT = 2
+TRENDING_WINDOW_DAYS = 30
+
+# Forum statistics (posts.stats)
+# Aggregates are maintained incrementally; rebuild with `python manage.py rebuild_forum_stats`
+STATS_CACHE_TIMEOUT = 60
+STATS_TOP_LIMIT = 10
+
+# Read-through caching (alumni_forum.cache): one request per key recomputes
+# (CACHE_LOCK_ENABLED extends this across processes through a cache lock,
+# held for CACHE_LOCK_TIMEOUT seconds at most), hot keys are refreshed early
+# with a probability scaled by CACHE_EARLY_EXPIRATION_BETA, and expired
+# values are served for CACHE_STALE_TIMEOUT seconds while being recomputed
+CACHE_LOCK_ENABLED = True
+CACHE_LOCK_TIMEOUT = 10
+CACHE_EARLY_EXPIRATION_BETA = 1.0
+CACHE_STALE_TIMEOUT = 300
+
+# Anonymous feed and post detail responses (posts.caching)
+FEED_CACHE_TIMEOUT = 10
+DETAIL_CACHE_TIMEOUT = 30
+
+# Moderation (posts.moderation)
+# When True, posts by non-staff users wait in /api/posts/moderation/pending/ until approved
+POSTS_REQUIRE_APPROVAL = False
+MODERATION_MAX_BATCH = 5000
+
+# Batch reads (/api/posts/batch/): most post ids per request
+POSTS_BATCH_MAX_IDS = 100
+
+# Request instrumentation (alumni_forum.instrumentation)
+# Adds a Server-Timing header and one log line per request; off by default
+INSTRUMENTATION_ENABLED = False
+INSTRUMENTATION_SLOW_REQUEST_MS = 500
+INSTRUMENTATION_SLOW_QUERY_COUNT = 5
+
+# Metrics (alumni_forum.metrics), scraped from /metrics in Prometheus text format
+# Under gunicorn point METRICS_MULTIPROCESS_DIR at a directory shared by the workers.
+# Scrapes are allowed from staff, METRICS_ALLOWED_IPS and `Authorization: Bearer <METRICS_TOKEN>`
+METRICS_ENABLED = False
+METRICS_MULTIPROCESS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_TOKEN = None
+
+# On-demand profiling (alumni_forum.profiling)
+# Staff send `X-Profile: 1` (or ?_profile=1) to profile one request, `collapsed` for stacks
+PROFILING_ENABLED = True
+PROFILING_BACKEND = 'cprofile'  # or 'pyinstrument' when installed
+PROFILING_OUTPUT_DIR = BASE_DIR / 'profiles'
+
+# Response compression (alumni_forum.compression)
+# br and zstd are used only when the brotli / zstandard packages are installed
+COMPRESSION_ENABLED = True
+COMPRESSION_ENCODINGS = ['br', 'zstd', 'gzip']
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CACHE_VIEWS = ['post-list-create', 'forum-stats']
+COMPRESSION_CACHE_TIMEOUT = 300
+
+# Background jobs (jobs.queue), run by `manage.py run_worker`
+# With JOBS_ALWAYS_EAGER tasks run inline when enqueued (no worker needed)
+JOBS_ALWAYS_EAGER = False
+JOBS_CONCURRENCY = 4
+JOBS_POLL_INTERVAL = 1
+JOBS_LOCK_TIMEOUT = 300
+# Running jobs renew their lock this often, so only dead workers' jobs go stale
+JOBS_HEARTBEAT_INTERVAL = 60
+JOBS_KEEP_DONE_DAYS = 7
+
+# Recommendations (posts.recommend), refreshed by `manage.py update_recommendations`
+# NumPy is optional; without it /api/posts/recommended/ serves the trending feed
+RECOMMENDER_INDEX_DIR = BASE_DIR / 'recommender'
+RECOMMENDER_MAX_SEGMENTS = 8
+# Seconds re-read before the index watermark, to catch posts whose transaction committed late
+RECOMMENDER_WATERMARK_OVERLAP = 60
+RECOMMENDER_OVERFETCH = 3
+
+# Related journeys (posts.related): neighbours kept per post, candidates scored
+# per refresh, and the share of the score that comes from skill overlap
+RELATED_POSTS_COUNT = 5
+RELATED_CANDIDATES = 200
+RELATED_SKILL_WEIGHT = 0.6
+
+# Duplicate detection (posts.dedupe): estimated Jaccard similarity of the
+# experience text above which a submission counts as a near-duplicate
+DUPLICATE_THRESHOLD = 0.8
+
+# Notifications (notifications.inbox): rows inserted per fan-out batch
+NOTIFICATIONS_BATCH_SIZE = 500
+
+# Deleted posts and accounts (posts.deletion, accounts.deletion) are hidden at
+# once and purged by a job: rows deleted per chunk, chunks per job run
+DELETION_BATCH_SIZE = 500
+DELETION_BATCHES_PER_JOB = 20
+
+# Post views (posts.viewcounts) are buffered per process and written in one
+# batch every VIEWS_FLUSH_INTERVAL seconds or once VIEWS_BUFFER_MAX_POSTS posts
+# are pending; unique viewers are estimated over the last VIEWS_UNIQUE_DAYS days
+VIEWS_FLUSH_INTERVAL = 10
+VIEWS_BUFFER_MAX_POSTS = 1000
+VIEWS_UNIQUE_DAYS = 30
+
+# Stored feed JSON (posts.rendered), re-rendered by jobs after writes and by
+# `manage.py rebuild_rendered_posts`: posts per re-render job. View counts
+# only re-render fragments older than RENDERED_COUNTS_MAX_AGE seconds
+RENDERED_POSTS_PER_JOB = 100
+RENDERED_COUNTS_MAX_AGE = 300
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'alumni_forum': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,53 @@
+"""
+Query-budget helpers for the API test suites.
+
+Each app's tests declare ``query_budgets``, the maximum number of SQL
+queries every URL name (and HTTP method) may run. The helpers fail with
+the offending SQL when an endpoint goes over budget, or when its query
+count grows with the amount of data (the usual sign of an N+1).
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def _format_queries(captured):
+    return '\n'.join(
+        f"  {index}. {query['sql']}" for index, query in enumerate(captured.captured_queries, 1)
+    )
+
+
+class QueryBudgetMixin:
+    """TestCase mixin enforcing ``query_budgets = {(url name, method): max queries}``"""
+    query_budgets = {}
+
+    def assertQueryBudget(self, url_name, method, request):
+        """Run ``request()`` and fail if it exceeds the declared budget"""
+        budget = self.query_budgets[(url_name, method)]
+        with CaptureQueriesContext(connection) as captured:
+            response = request()
+        self.assertLess(response.status_code, 400, f'{method} {url_name} failed: {response.status_code}')
+        if len(captured) > budget:
+            self.fail(
+                f'{method} {url_name} ran {len(captured)} queries, budget is {budget}:\n'
+                f'{_format_queries(captured)}'
+            )
+        return response, len(captured)
+
+    def assertQueriesDoNotScale(self, url_name, method, request, grow):
+        """Fail if the query count changes after ``grow()`` adds more data"""
+        _, before = self.assertQueryBudget(url_name, method, request)
+        grow()
+        with CaptureQueriesContext(connection) as captured:
+            request()
+        if len(captured) != before:
+            self.fail(
+                f'{method} {url_name} went from {before} to {len(captured)} queries '
+                f'as the data grew:\n{_format_queries(captured)}'
+            )
+
+    def assertBudgetsCover(self, urlconf):
+        """Every named URL in ``urlconf`` must have at least one budget"""
+        names = {pattern.name for pattern in urlconf.urlpatterns if pattern.name}
+        budgeted = {name for name, _ in self.query_budgets}
+        missing = sorted(names - budgeted)
+        self.assertFalse(missing, f'URL names without a query budget: {", ".join(missing)}')
@@ -0,0 +1,404 @@
+import datetime
+import decimal
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework import status
+from accounts.models import User
+from posts.models import Post
+from . import assets, compression, metrics, renderers
+from . import cache as read_cache
+from .hyperloglog import HyperLogLog
+
+
+class InstrumentationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.list_url = reverse('post-list-create')
+        Post.objects.create(name='A', role='Engineer', experience='Journey')
+
+    def test_disabled_by_default(self):
+        """No header is added when instrumentation is off"""
+        response = self.client.get(self.list_url)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(INSTRUMENTATION_ENABLED=True, INSTRUMENTATION_SLOW_REQUEST_MS=100000)
+    def test_server_timing_and_log_line(self):
+        """Query count, serializer and total timings are reported"""
+        with self.assertLogs('alumni_forum.instrumentation', level='INFO') as logs:
+            response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('serializer;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertEqual(len(logs.records), 1)
+        fields = logs.records[0].instrumentation
+        self.assertEqual(fields['view'], 'post-list-create')
+        self.assertGreater(fields['queries'], 0)
+
+    @override_settings(INSTRUMENTATION_ENABLED=True, INSTRUMENTATION_SLOW_REQUEST_MS=0)
+    def test_slow_request_logs_worst_queries(self):
+        """Requests over the threshold log their slowest SQL"""
+        with self.assertLogs('alumni_forum.instrumentation', level='WARNING') as logs:
+            self.client.get(self.list_url)
+        slow = logs.records[0].instrumentation['slow_queries']
+        self.assertTrue(slow)
+        self.assertIn('SELECT', slow[0]['sql'])
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        Post.objects.create(name='A', role='Engineer', experience='Journey')
+
+    def test_metrics_disabled(self):
+        """The endpoint is hidden unless METRICS_ENABLED is set"""
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_prometheus_exposition(self):
+        """Requests are recorded per URL name"""
+        self.client.get(reverse('post-list-create'))
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="post-list-create",method="GET",le="+Inf"}', body)
+        self.assertIn('db_connections_open', body)
+
+        summary = self.client.get('/metrics', {'format': 'json'}).json()
+        self.assertIn('p99_ms', summary['views']['GET post-list-create'])
+
+    @override_settings(METRICS_ENABLED=True, METRICS_ALLOWED_IPS=[], METRICS_TOKEN='s3cret')
+    def test_scrapes_need_staff_address_or_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, status.HTTP_403_FORBIDDEN
+        )
+        self.assertEqual(
+            self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret').status_code, status.HTTP_200_OK
+        )
+        with self.settings(METRICS_ALLOWED_IPS=['10.1.2.3']):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, status.HTTP_200_OK)
+        staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', is_staff=True
+        )
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/metrics', {'format': 'json'}).status_code, status.HTTP_200_OK)
+
+    def test_multiprocess_aggregation(self):
+        """Worker files in the shared directory are summed on scrape"""
+        with tempfile.TemporaryDirectory() as directory:
+            histogram = metrics.Histogram('latency', 'Latency', labelnames=('view',), buckets=(0.1, 1))
+            histogram.observe(0.05, view='feed')
+            other_worker = {'latency': dict(histogram.export())}
+            with open(os.path.join(directory, 'metrics-1.json'), 'w') as handle:
+                json.dump(other_worker, handle)
+
+            registry = metrics.Registry()
+            registry.register(histogram)
+            histogram.observe(0.5, view='feed')
+            with self.settings(METRICS_MULTIPROCESS_DIR=directory):
+                collected = registry.collect()
+        self.assertEqual(collected['latency']['samples']['feed'][:3], [2, 1, 0])
+
+    def test_exited_workers_are_pruned(self):
+        """Files of workers that no longer run are deleted instead of summed"""
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        with tempfile.TemporaryDirectory() as directory:
+            counter = metrics.Counter('jobs', 'Jobs')
+            counter.inc(5)
+            path = os.path.join(directory, f'metrics-{exited.pid}.json')
+            with open(path, 'w') as handle:
+                json.dump({'jobs': counter.export()}, handle)
+
+            registry = metrics.Registry()
+            registry.register(metrics.Counter('jobs', 'Jobs')).inc(1)
+            with self.settings(METRICS_MULTIPROCESS_DIR=directory):
+                collected = registry.collect()
+            self.assertFalse(os.path.exists(path))
+        self.assertEqual(collected['jobs']['samples'], {'': 1})
+
+    def test_quantile_estimate(self):
+        """Percentiles interpolate inside the matching bucket"""
+        self.assertEqual(metrics.quantile([1, 2], [0, 10, 0], 0.5), 1.5)
+
+
+class HyperLogLogTestCase(TestCase):
+    def test_estimates_within_error(self):
+        for distinct in (10, 1000, 50000):
+            sketch = HyperLogLog()
+            for value in range(distinct):
+                sketch.add(f'viewer-{value}')
+                sketch.add(f'viewer-{value}')
+            with self.subTest(distinct=distinct):
+                self.assertLess(abs(sketch.count() - distinct), distinct * 0.1 + 1)
+
+    def test_merge_is_union(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        for value in range(2000):
+            first.add(str(value))
+            second.add(str(value + 1000))
+        merged = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+        self.assertLess(abs(merged.count() - 3000), 300)
+        self.assertEqual(len(merged.to_bytes()), 1024)
+
+
+class ReadCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='fresh', delay=0):
+        def compute():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def test_single_flight(self):
+        """Concurrent misses of a key run the computation once"""
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(
+                lambda _: read_cache.cached('key', self.compute(delay=0.2), 60), range(8)
+            ))
+        self.assertEqual(results, ['fresh'] * 8)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_while_revalidate(self):
+        """An expired value is served while one caller recomputes it"""
+        read_cache.cached('key', self.compute('old'), 60)
+        read_cache.invalidate('key')
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            leader = pool.submit(read_cache.cached, 'key', self.compute('new', delay=0.3), 60)
+            time.sleep(0.1)
+            self.assertEqual(read_cache.cached('key', self.compute('other'), 60), 'old')
+            self.assertEqual(leader.result(), 'new')
+        self.assertEqual(read_cache.cached('key', self.compute('other'), 60), 'new')
+        self.assertEqual(self.calls, 2)
+
+    @override_settings(CACHE_LOCK_TIMEOUT=2)
+    def test_waits_for_other_process(self):
+        """A miss whose lock is held elsewhere waits for that value instead of computing"""
+        cache.add('key:lock', 1)
+        threading.Timer(0.1, lambda: cache.set('key', ('theirs', time.time() + 60, 0.1))).start()
+        self.assertEqual(read_cache.cached('key', self.compute(), 60), 'theirs')
+        self.assertEqual(self.calls, 0)
+
+    def test_early_expiration(self):
+        """Values that took long to compute are refreshed before they expire"""
+        cache.set('key', ('old', time.time() + 5, 1.0))
+        with mock.patch('alumni_forum.cache.random.random', return_value=0.0):
+            self.assertEqual(read_cache.cached('key', self.compute(), 60), 'old')
+        with mock.patch('alumni_forum.cache.random.random', return_value=0.999999):
+            self.assertEqual(read_cache.cached('key', self.compute(), 60), 'fresh')
+
+
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.list_url = reverse('post-list-create')
+        self.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', is_staff=True
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password='testpass123'
+        )
+        Post.objects.create(name='A', role='Engineer', experience='Journey')
+
+    def test_profile_written_for_staff(self):
+        """Staff requests with the header are profiled to a file"""
+        self.client.force_login(self.staff)
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(PROFILING_OUTPUT_DIR=directory):
+                response = self.client.get(self.list_url, HTTP_X_PROFILE='1')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(os.listdir(directory), [response['X-Profile-File']])
+
+    def test_collapsed_stacks(self):
+        """collapsed mode returns flame graph input instead of the response"""
+        self.client.force_login(self.staff)
+        response = self.client.get(self.list_url, {'_profile': 'collapsed'})
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn('views.py', response.content.decode())
+
+    def test_ignored_for_non_staff(self):
+        """Other users get the normal, unprofiled response"""
+        self.client.force_login(self.student)
+        response = self.client.get(self.list_url, HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-File', response)
+
+
+class FastJSONTestCase(TestCase):
+    data = {
+        'price': decimal.Decimal('12.50'),
+        'created_at': datetime.datetime(2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc),
+        'name': 'Zoë',
+        'tags': ['a', 'b'],
+    }
+
+    def test_matches_stock_renderer(self):
+        """Output decodes to the same document as DRF's renderer"""
+        fast = renderers.FastJSONRenderer().render(self.data)
+        stock = JSONRenderer().render(self.data)
+        self.assertEqual(json.loads(fast)['price'], json.loads(stock)['price'])
+        self.assertEqual(json.loads(fast)['created_at'], '2024-05-01T10:30:00Z')
+        self.assertIn('Zoë'.encode(), fast)
+
+    def test_indent_fallback(self):
+        """Indents orjson can't produce use the stdlib renderer"""
+        body = renderers.FastJSONRenderer().render(self.data, renderer_context={'indent': 4})
+        self.assertIn(b'\n    "name"', body)
+
+    def test_parser(self):
+        parser = renderers.FastJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO(b'{"a": [1, 2]}')), {'a': [1, 2]})
+        with self.assertRaises(Exception) as raised:
+            parser.parse(io.BytesIO(b'{"a":'))
+        self.assertEqual(raised.exception.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_without_orjson(self):
+        """Both classes fall back to the stdlib when orjson is missing"""
+        with mock.patch.object(renderers, 'orjson', None):
+            body = renderers.FastJSONRenderer().render(self.data)
+            parsed = renderers.FastJSONParser().parse(io.BytesIO(body))
+        self.assertEqual(parsed['name'], 'Zoë')
+
+    def test_api_round_trip(self):
+        """API requests and responses go through the fast pair"""
+        user = User.objects.create_user(
+            username='alumni', email='a@example.com', password='testpass123', role='alumni'
+        )
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.post(reverse('post-list-create'), {
+            'name': 'Zoë', 'role': 'Engineer', 'experience': 'Journey'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsInstance(response.accepted_renderer, renderers.FastJSONRenderer)
+        self.assertEqual(response.json()['name'], 'Zoë')
+
+
+class CompressionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.list_url = reverse('post-list-create')
+        for index in range(10):
+            Post.objects.create(name=f'Alumni {index}', role='Engineer', experience='Journey ' * 50)
+
+    def test_gzip_negotiated(self):
+        response = self.client.get(self.list_url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 10)
+
+    def test_not_accepted_or_small(self):
+        """No coding without Accept-Encoding, or below the size threshold"""
+        response = self.client.get(self.list_url)
+        self.assertNotIn('Content-Encoding', response)
+        response = self.client.get(reverse('check-auth'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_choose_codec(self):
+        self.assertEqual(compression.choose_codec('gzip;q=0.5, br;q=0', ['br', 'gzip']).name, 'gzip')
+        self.assertIsNone(compression.choose_codec('gzip;q=0, identity'))
+        self.assertEqual(compression.choose_codec('*').name, next(
+            name for name in settings.COMPRESSION_ENCODINGS if name in compression.CODECS
+        ))
+
+    def test_compressed_body_cached(self):
+        """A repeated feed payload is compressed once"""
+        codec = compression.CODECS['gzip']
+        with mock.patch.object(codec, 'compress', wraps=codec.compress) as compress:
+            first = self.client.get(self.list_url, HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get(self.list_url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(first.content, second.content)
+
+    def test_streaming_response(self):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        chunks = [b'{"rows": [', b'"row",' * 100, b'"row"]}']
+        middleware = compression.CompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter(chunks), content_type='application/json')
+        )
+        response = middleware(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(chunks))
+
+
+@override_settings(STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'])
+class AssetsTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.TemporaryDirectory()
+        cls.settings_override = override_settings(STATIC_ROOT=cls.static_root.name)
+        cls.settings_override.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.static_root.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        assets._cached_page.cache_clear()
+        self.client = APIClient()
+        self.hashed = staticfiles_storage.stored_name('header.js')
+
+    def test_fingerprinted_and_precompressed(self):
+        self.assertRegex(self.hashed, r'^header\.[0-9a-f]{12}\.js$')
+        self.assertTrue(os.path.exists(os.path.join(self.static_root.name, self.hashed + '.gz')))
+
+    def test_immutable_asset(self):
+        """Fingerprinted files are cached for a year and sent precompressed"""
+        response = self.client.get(f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        with open(os.path.join(self.static_root.name, 'header.js'), 'rb') as handle:
+            self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), handle.read())
+
+    def test_unhashed_asset(self):
+        response = self.client.get('/static/header.js')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertNotIn('Content-Encoding', response)
+        response = self.client.get('/images/logo.png')
+        self.assertEqual(response['Content-Type'], 'image/png')
+
+    def test_page_points_at_fingerprinted_assets(self):
+        """Pages reference hashed URLs and revalidate by ETag"""
+        response = self.client.get(reverse('frontend-page', args=['explore.html']))
+        html = response.content.decode()
+        self.assertIn(f'src="/static/{self.hashed}"', html)
+        self.assertIn('href="/static/explore.', html)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+        cached = self.client.get(
+            reverse('frontend-page', args=['explore.html']), HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
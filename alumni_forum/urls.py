@@ -15,10 +15,16 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
+from .assets import frontend_page
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/posts/', include('posts.urls')),
     path('api/auth/', include('accounts.urls')),
+    path('api/notifications/', include('notifications.urls')),
+    path('', frontend_page, name='frontend-index'),
+    re_path(r'^(?P<page>[\w-]+\.html)$', frontend_page, name='frontend-page'),
 ]
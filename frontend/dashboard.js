@@ -249,7 +249,9 @@ class Dashboard {
         if (!this.canPostJourney()) return;
         
         try {
-            const response = await fetch(POSTS_API, {
+            // Only the fields the post cards show, without each post's comments
+            const fields = 'name,author_name,role,category,category_display,experience,likes,comments_count,created_at';
+            const response = await fetch(`${POSTS_API}?fields=${fields}`, {
                 method: 'GET',
                 headers: this.getAuthHeaders()
             });
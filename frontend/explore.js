@@ -103,9 +103,19 @@ function showDetailView(postId) {
     document.getElementById('detailView').style.display = 'block';
 
     renderDetailView(post);
+    recordView(postId);
     window.scrollTo({ top: 0, behavior: 'smooth' });
 }
 
+// Counted in batches on the server; the response carries nothing to wait for
+function recordView(postId) {
+    fetch(`${API_URL}${postId}/view/`, {
+        method: 'POST',
+        headers: getAuthHeaders(),
+        keepalive: true
+    }).catch(() => {});
+}
+
 // ============================================
 // FETCH POSTS
 // ============================================
@@ -220,6 +230,7 @@ function createCardHtml(post) {
                 <div class="card-stats">
                     <span class="card-stat">❤️ ${post.likes || 0}</span>
                     <span class="card-stat">💬 ${commentsCount}</span>
+                    <span class="card-stat">👁️ ${post.views || 0}</span>
                 </div>
                 <span class="card-read-more">Read more →</span>
             </div>
@@ -261,6 +272,7 @@ function renderDetailView(post) {
                     <span class="detail-meta-tag">📅 ${formatDate(post.created_at)}</span>
                     <span class="detail-meta-tag">❤️ ${post.likes || 0} likes</span>
                     <span class="detail-meta-tag">💬 ${comments.length} comments</span>
+                    <span class="detail-meta-tag">👁️ ${post.views || 0} views</span>
                 </div>
             </div>
 
@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from alumni_forum.paginators import EstimatedCountPaginator
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'run_at', 'locked_by', 'finished_at']
+    list_filter = ['status']
+    search_fields = ['name']
+    readonly_fields = ['created_at', 'finished_at', 'locked_at', 'locked_by', 'last_error']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
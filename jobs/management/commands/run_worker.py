@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs import queue
+
+# Seconds between sweeps of old finished jobs
+PURGE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=getattr(settings, 'JOBS_CONCURRENCY', 4),
+            help='Jobs run at the same time on a thread pool (default: JOBS_CONCURRENCY)'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=getattr(settings, 'JOBS_POLL_INTERVAL', 1),
+            help='Seconds to wait when no job is due (default: JOBS_POLL_INTERVAL)'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run every job that is due now, then exit'
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(options['concurrency'], 1)
+        worker = queue.worker_id()
+        executor = ThreadPoolExecutor(concurrency) if concurrency > 1 else None
+        total = 0
+        last_purge = 0
+        try:
+            while True:
+                ran = queue.run_pending(concurrency, worker, executor)
+                total += ran
+                if ran:
+                    continue
+                if options['once']:
+                    break
+                if time.monotonic() - last_purge > PURGE_INTERVAL:
+                    queue.purge_finished()
+                    last_purge = time.monotonic()
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+        self.stdout.write(f'Ran {total} job(s)')
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='lock_token',
+            field=models.CharField(blank=True, help_text='New for every claim; only its holder records the outcome', max_length=32),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A queued call of a registered task (see jobs.queue)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200, help_text="Registered task name")
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField(default=timezone.now, help_text="Not picked up before this time")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    lock_token = models.CharField(
+        max_length=32, blank=True, help_text="New for every claim; only its holder records the outcome"
+    )
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            # Workers poll for due jobs; only queued rows are indexed
+            models.Index(fields=['run_at'], name='job_ready_idx', condition=models.Q(status='queued')),
+            models.Index(fields=['status', 'locked_at'], name='job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,236 @@
+"""
+Database-backed job queue.
+
+Declare a task in an app's ``tasks.py`` and enqueue it from a view::
+
+    @task(max_attempts=5)
+    def send_digest(user_id):
+        ...
+
+    send_digest.delay(user_id=user.pk)              # as soon as a worker is free
+    send_digest.schedule(60, user_id=user.pk)       # not before a minute from now
+
+The job row is inserted in the caller's transaction, so it only becomes
+visible to workers once the request's writes have committed (and is never
+run for a request that rolled back). Keyword arguments must be JSON
+serializable. ``manage.py run_worker`` executes jobs; with
+``JOBS_ALWAYS_EAGER`` the task runs immediately in the caller instead.
+
+Workers claim due jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+database supports it (PostgreSQL, MySQL 8), so many workers never block on
+each other. Elsewhere (SQLite) each candidate is claimed with a
+compare-and-swap UPDATE that only succeeds while the job is still queued.
+Failed jobs are retried with exponential backoff until ``max_attempts``;
+jobs left running by a crashed worker are requeued after
+``JOBS_LOCK_TIMEOUT`` seconds. While a job runs, its worker pushes
+``locked_at`` forward every ``JOBS_HEARTBEAT_INTERVAL`` seconds, so slow
+jobs are not requeued under it. Every claim gets a new ``lock_token`` and
+only the current holder records the outcome, so a job requeued anyway
+(e.g. after a long pause) is never completed twice.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Task:
+    """A registered function that can be run later by a worker"""
+
+    def __init__(self, func, name, max_attempts, retry_delay):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.__doc__ = func.__doc__
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def delay(self, **kwargs):
+        return self.schedule(0, **kwargs)
+
+    def schedule(self, countdown, **kwargs):
+        """Enqueue the task to run no earlier than ``countdown`` seconds from now"""
+        if _setting('JOBS_ALWAYS_EAGER', False):
+            self.func(**kwargs)
+            return None
+        return Job.objects.create(
+            name=self.name,
+            kwargs=kwargs,
+            run_at=timezone.now() + timedelta(seconds=countdown),
+            max_attempts=self.max_attempts,
+        )
+
+
+def task(name=None, max_attempts=3, retry_delay=30):
+    """Register a function as a task; ``retry_delay`` doubles after every failed attempt"""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        TASKS[task_name] = Task(func, task_name, max_attempts, retry_delay)
+        return TASKS[task_name]
+    return decorator
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def requeue_stale(now=None):
+    """Put back jobs whose worker died while running them"""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=_setting('JOBS_LOCK_TIMEOUT', 300))
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='queued', locked_by='', locked_at=None, lock_token=''
+    )
+
+
+def heartbeat(job, now=None):
+    """Renew the lock of a running job; returns False once it was lost"""
+    return bool(
+        Job.objects.filter(pk=job.pk, status='running', lock_token=job.lock_token)
+        .update(locked_at=now or timezone.now())
+    )
+
+
+class Heartbeat(threading.Thread):
+    """Calls ``heartbeat()`` every ``interval`` seconds until stopped"""
+
+    def __init__(self, job, interval):
+        super().__init__(name=f'job-{job.pk}-heartbeat', daemon=True)
+        self.job = job
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                if not heartbeat(self.job):
+                    break
+        except Exception:
+            logger.exception('Could not renew the lock of job %s', self.job.pk)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def claim(limit, worker=None, now=None):
+    """Atomically take up to ``limit`` due jobs for this worker"""
+    now = now or timezone.now()
+    worker = worker or worker_id()
+    due = Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at')
+    claimed_fields = {
+        'status': 'running', 'locked_by': worker, 'locked_at': now, 'lock_token': uuid.uuid4().hex
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            jobs = list(due.select_for_update(skip_locked=True)[:limit])
+            if jobs:
+                Job.objects.filter(pk__in=[job.pk for job in jobs]).update(**claimed_fields)
+        for job in jobs:
+            for field, value in claimed_fields.items():
+                setattr(job, field, value)
+        return jobs
+
+    # No row locks to skip: read candidates, then win each one with a conditional UPDATE
+    claimed = []
+    for job in due[:limit * 2]:
+        if Job.objects.filter(pk=job.pk, status='queued').update(**claimed_fields):
+            for field, value in claimed_fields.items():
+                setattr(job, field, value)
+            claimed.append(job)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def execute(job):
+    """Run one claimed job and record the outcome, unless its lock was lost meanwhile"""
+    job.attempts += 1
+    registered = TASKS.get(job.name)
+    beat = Heartbeat(job, _setting('JOBS_HEARTBEAT_INTERVAL', 60))
+    beat.start()
+    try:
+        if registered is None:
+            raise LookupError(f'No task registered as {job.name!r}')
+        registered.func(**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        retry = registered is not None and job.attempts < job.max_attempts
+        logger.warning('Job %s (%s) failed on attempt %s', job.pk, job.name, job.attempts,
+                       exc_info=True)
+        fields = {'attempts': job.attempts, 'last_error': error}
+        if retry:
+            delay = registered.retry_delay * 2 ** (job.attempts - 1)
+            fields.update(status='queued', run_at=timezone.now() + timedelta(seconds=delay))
+        else:
+            fields.update(status='failed', finished_at=timezone.now())
+        _finish(job, **fields)
+        return False
+    finally:
+        beat.stop()
+
+    return _finish(job, status='done', attempts=job.attempts, finished_at=timezone.now())
+
+
+def _finish(job, **fields):
+    """Record a job's outcome if this worker still holds its lock"""
+    held = Job.objects.filter(pk=job.pk, status='running', lock_token=job.lock_token).update(
+        locked_by='', locked_at=None, lock_token='', **fields
+    )
+    if not held:
+        logger.warning('Job %s (%s) lost its lock while running; its outcome is not recorded',
+                       job.pk, job.name)
+    return bool(held)
+
+
+def purge_finished(now=None):
+    """Delete finished jobs older than JOBS_KEEP_DONE_DAYS (failed ones are kept)"""
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=_setting('JOBS_KEEP_DONE_DAYS', 7))
+    return Job.objects.filter(status='done', finished_at__lt=cutoff).delete()[0]
+
+
+def run_pending(concurrency=1, worker=None, executor=None):
+    """
+    Claim and run one round of due jobs; returns how many were run.
+
+    With an ``executor`` the jobs run on its threads (each closes its own
+    database connection when done), otherwise inline.
+    """
+    requeue_stale()
+    jobs = claim(max(concurrency, 1), worker)
+    if executor is None:
+        for job in jobs:
+            execute(job)
+    else:
+        list(executor.map(_execute_in_thread, jobs))
+    return len(jobs)
+
+
+def _execute_in_thread(job):
+    try:
+        return execute(job)
+    finally:
+        connection.close()
@@ -0,0 +1,126 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import queue
+from .models import Job
+
+calls = []
+
+
+@queue.task(name='tests.record', retry_delay=10)
+def record(value):
+    calls.append(value)
+
+
+@queue.task(name='tests.explode', max_attempts=2, retry_delay=10)
+def explode():
+    raise RuntimeError('boom')
+
+
+class JobQueueTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def run_worker(self):
+        call_command('run_worker', once=True, concurrency=1, stdout=StringIO())
+
+    def test_delay_and_run(self):
+        """A delayed task waits for a worker, which runs it once"""
+        job = record.delay(value=1)
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(calls, [])
+
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(calls, [1])
+        self.assertEqual((job.status, job.attempts), ('done', 1))
+
+        self.run_worker()
+        self.assertEqual(calls, [1])
+
+    def test_schedule_waits_until_due(self):
+        """Scheduled jobs are not claimed before their run_at"""
+        record.schedule(60, value=2)
+        self.run_worker()
+        self.assertEqual(calls, [])
+
+        later = timezone.now() + timedelta(seconds=61)
+        job, = queue.claim(5, now=later)
+        queue.execute(job)
+        self.assertEqual(calls, [2])
+
+    def test_failed_job_retries_with_backoff(self):
+        """A failure requeues the job with a doubling delay until max_attempts"""
+        job = explode.delay()
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+
+        job, = queue.claim(5, now=job.run_at)
+        queue.execute(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_unknown_task_fails(self):
+        job = Job.objects.create(name='tests.missing')
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('tests.missing', job.last_error)
+
+    def test_claim_is_exclusive(self):
+        """A job claimed by one worker cannot be claimed by another"""
+        record.delay(value=3)
+        first = queue.claim(5, worker='a')
+        self.assertEqual(len(first), 1)
+        self.assertEqual(queue.claim(5, worker='b'), [])
+        self.assertEqual(Job.objects.get().locked_by, 'a')
+
+    def test_stale_running_job_is_requeued(self):
+        record.delay(value=4)
+        queue.claim(5, worker='crashed')
+        later = timezone.now() + timedelta(hours=1)
+        self.assertEqual(queue.requeue_stale(now=later), 1)
+        self.run_worker()
+        self.assertEqual(calls, [4])
+
+    def test_heartbeat_keeps_slow_jobs_claimed(self):
+        record.delay(value=5)
+        job, = queue.claim(5, worker='slow')
+        later = timezone.now() + timedelta(hours=1)
+        self.assertTrue(queue.heartbeat(job, now=later))
+        self.assertEqual(queue.requeue_stale(now=later + timedelta(seconds=1)), 0)
+
+    def test_requeued_job_is_only_finished_by_its_new_holder(self):
+        """A worker that lost the lock cannot record the outcome over the new claim"""
+        record.delay(value=6)
+        stale, = queue.claim(5, worker='paused')
+        queue.requeue_stale(now=timezone.now() + timedelta(hours=1))
+        current, = queue.claim(5, worker='b')
+        self.assertFalse(queue.heartbeat(stale))
+
+        self.assertFalse(queue.execute(stale))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.locked_by), ('running', 'b'))
+        self.assertTrue(queue.execute(current))
+        self.assertEqual(Job.objects.get().status, 'done')
+
+    @override_settings(JOBS_ALWAYS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        self.assertIsNone(record.delay(value=5))
+        self.assertEqual(calls, [5])
+        self.assertFalse(Job.objects.exists())
+
+    def test_purge_keeps_recent_and_failed_jobs(self):
+        old = timezone.now() - timedelta(days=30)
+        Job.objects.create(name='tests.record', status='done', finished_at=old)
+        Job.objects.create(name='tests.record', status='failed', finished_at=old)
+        Job.objects.create(name='tests.record', status='done', finished_at=timezone.now())
+        self.assertEqual(queue.purge_finished(), 1)
+        self.assertEqual(Job.objects.count(), 2)
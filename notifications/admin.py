@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from alumni_forum.paginators import EstimatedCountPaginator
+from .models import Notification
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['recipient', 'verb', 'actor', 'post', 'is_read', 'created_at']
+    list_filter = ['verb', 'is_read']
+    list_select_related = ['recipient', 'actor', 'post']
+    raw_id_fields = ['recipient', 'actor', 'post', 'comment']
+    readonly_fields = ['created_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
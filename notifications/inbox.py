@@ -0,0 +1,55 @@
+"""
+Per-user notification inbox.
+
+Notifications are fanned out on write: one row per recipient, inserted in
+batches of ``NOTIFICATIONS_BATCH_SIZE``. Every user's unread total lives in
+``UnreadCounter`` and is changed with ``unread = unread + n`` UPDATEs in the
+same transaction as the rows it counts, so polling the unread count is a
+primary-key lookup instead of a COUNT over the inbox.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import Notification, UnreadCounter
+
+
+def notify(recipient_ids, verb, actor=None, post=None, comment=None, batch_size=None):
+    """Send a notification to every recipient (never to the actor); returns how many were sent"""
+    batch_size = batch_size or getattr(settings, 'NOTIFICATIONS_BATCH_SIZE', 500)
+    recipients = set(recipient_ids)
+    recipients.discard(None)
+    if actor is not None:
+        recipients.discard(actor.pk)
+    # Sorted so concurrent fan-outs lock counter rows in the same order
+    recipients = sorted(recipients)
+
+    for start in range(0, len(recipients), batch_size):
+        batch = recipients[start:start + batch_size]
+        with transaction.atomic():
+            Notification.objects.bulk_create([
+                Notification(recipient_id=user_id, actor=actor, verb=verb, post=post, comment=comment)
+                for user_id in batch
+            ])
+            UnreadCounter.objects.bulk_create(
+                [UnreadCounter(user_id=user_id) for user_id in batch], ignore_conflicts=True
+            )
+            UnreadCounter.objects.filter(user_id__in=batch).update(unread=F('unread') + 1)
+    return len(recipients)
+
+
+def unread_count(user):
+    return UnreadCounter.objects.filter(user=user).values_list('unread', flat=True).first() or 0
+
+
+def mark_read(user, ids=None):
+    """Mark the given notifications (all when ``ids`` is None) read; returns how many changed"""
+    with transaction.atomic():
+        unread = Notification.objects.filter(recipient=user, is_read=False)
+        if ids is not None:
+            unread = unread.filter(pk__in=ids)
+        marked = unread.update(is_read=True)
+        if marked:
+            UnreadCounter.objects.filter(user=user).update(unread=Greatest(F('unread') - marked, 0))
+    return marked
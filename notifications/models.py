@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db import models
+
+
+class Notification(models.Model):
+    """One entry in a user's inbox"""
+    VERB_CHOICES = [
+        ('comment', 'Commented on your journey'),
+        ('reply', 'Also commented on a journey you commented on'),
+    ]
+
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='notifications'
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    verb = models.CharField(max_length=20, choices=VERB_CHOICES)
+    post = models.ForeignKey(
+        'posts.Post', on_delete=models.SET_NULL, related_name='+', null=True, blank=True
+    )
+    comment = models.ForeignKey(
+        'posts.Comment', on_delete=models.SET_NULL, related_name='+', null=True, blank=True
+    )
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            # Inbox pages, newest first
+            models.Index(fields=['recipient', '-id'], name='notification_inbox_idx'),
+            # Only unread rows, for mark-all-read and the unread filter
+            models.Index(
+                fields=['recipient', 'id'], name='notification_unread_idx',
+                condition=models.Q(is_read=False)
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.verb} for {self.recipient_id} ({'read' if self.is_read else 'unread'})"
+
+
+class UnreadCounter(models.Model):
+    """
+    Number of unread notifications per user, maintained on write.
+
+    Kept out of the user row so fan-out updates don't contend with logins
+    and profile edits.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+'
+    )
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
@@ -0,0 +1,21 @@
+from rest_framework import serializers
+from .models import Notification
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    actor_name = serializers.CharField(source='actor.username', read_only=True, default=None)
+
+    class Meta:
+        model = Notification
+        fields = ['id', 'verb', 'actor', 'actor_name', 'post', 'comment', 'is_read', 'created_at']
+        read_only_fields = fields
+
+
+class MarkReadSerializer(serializers.Serializer):
+    """Notification ids to mark read; leave out ``ids`` to mark the whole inbox read"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        allow_empty=False,
+        max_length=1000
+    )
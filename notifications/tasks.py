@@ -0,0 +1,21 @@
+from jobs.queue import task
+from posts.models import Comment
+
+from . import inbox
+
+
+@task(max_attempts=5)
+def notify_comment(comment_id):
+    """Tell the post author and everyone else who commented on the post"""
+    comment = Comment.objects.select_related('post', 'user').filter(pk=comment_id).first()
+    if comment is None or comment.post.deleted_at:
+        return
+    post = comment.post
+    inbox.notify([post.user_id], 'comment', actor=comment.user, post=post, comment=comment)
+    participants = (
+        Comment.objects.visible().filter(post_id=post.pk)
+        .exclude(user_id=post.user_id)
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    inbox.notify(participants, 'reply', actor=comment.user, post=post, comment=comment)
@@ -0,0 +1,146 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from accounts.models import User
+from alumni_forum.testing import QueryBudgetMixin
+from posts.models import Post
+from . import inbox
+from . import urls as notifications_urls
+from .models import Notification, UnreadCounter
+
+
+class NotificationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='testpass123', role='alumni'
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password='testpass123', role='student'
+        )
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password='testpass123', role='student'
+        )
+        self.post = Post.objects.create(
+            user=self.author, name='Author', role='Engineer', experience='Journey'
+        )
+
+    def comment(self, user, content='Thanks!'):
+        self.client.force_authenticate(user=user)
+        response = self.client.post(
+            reverse('comment-list-create', args=[self.post.pk]),
+            {'content': content, 'author_role': user.role}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        call_command('run_worker', once=True, concurrency=1, stdout=StringIO())
+
+    def unread(self, user):
+        self.client.force_authenticate(user=user)
+        return self.client.get(reverse('notification-unread-count')).data['unread']
+
+    def test_comment_notifies_author_and_participants(self):
+        """The author hears about every comment, earlier commenters about later ones"""
+        self.comment(self.student)
+        self.assertEqual(self.unread(self.author), 1)
+        self.assertEqual(self.unread(self.student), 0)
+
+        self.comment(self.other)
+        self.assertEqual(self.unread(self.author), 2)
+        self.assertEqual(self.unread(self.student), 1)
+        self.assertEqual(self.unread(self.other), 0)
+        self.assertEqual(
+            Notification.objects.get(recipient=self.student).verb, 'reply'
+        )
+
+    def test_list_is_paginated_and_filterable(self):
+        inbox.notify([self.author.pk], 'comment', actor=self.student, post=self.post)
+        inbox.notify([self.author.pk], 'comment', actor=self.other, post=self.post)
+        first = Notification.objects.order_by('pk').first()
+        inbox.mark_read(self.author, [first.pk])
+
+        self.client.force_authenticate(user=self.author)
+        response = self.client.get(reverse('notification-list'), {'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['actor_name'], 'other')
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(reverse('notification-list'), {'unread': 'true'})
+        self.assertEqual([n['id'] for n in response.data['results']], [first.pk + 1])
+
+    def test_mark_read_keeps_counter_in_step(self):
+        inbox.notify([self.author.pk], 'comment', actor=self.student, post=self.post)
+        inbox.notify([self.author.pk], 'comment', actor=self.other, post=self.post)
+        first = Notification.objects.order_by('pk').first()
+        url = reverse('notification-mark-read')
+        self.client.force_authenticate(user=self.author)
+
+        response = self.client.post(url, {'ids': [first.pk, first.pk]}, format='json')
+        self.assertEqual(response.data, {'marked': 1, 'unread': 1})
+        # Already read: nothing changes, the counter is not decremented twice
+        response = self.client.post(url, {'ids': [first.pk]}, format='json')
+        self.assertEqual(response.data, {'marked': 0, 'unread': 1})
+        response = self.client.post(url, {}, format='json')
+        self.assertEqual(response.data, {'marked': 1, 'unread': 0})
+
+    def test_mark_read_only_touches_own_notifications(self):
+        inbox.notify([self.student.pk], 'reply', actor=self.other, post=self.post)
+        notification = Notification.objects.get()
+        self.client.force_authenticate(user=self.author)
+        response = self.client.post(
+            reverse('notification-mark-read'), {'ids': [notification.pk]}, format='json'
+        )
+        self.assertEqual(response.data['marked'], 0)
+        self.assertEqual(self.unread(self.student), 1)
+
+    def test_fan_out_is_batched(self):
+        """Each batch is one insert plus two counter statements (and its savepoint pair)"""
+        users = User.objects.bulk_create(
+            User(username=f'fan{i}', email=f'fan{i}@example.com') for i in range(5)
+        )
+        with self.assertNumQueries(3 * 5):
+            inbox.notify([u.pk for u in users], 'reply', post=self.post, batch_size=2)
+        self.assertEqual(Notification.objects.count(), 5)
+        self.assertEqual(set(UnreadCounter.objects.values_list('unread', flat=True)), {1})
+
+    def test_requires_authentication(self):
+        response = self.client.get(reverse('notification-unread-count'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    query_budgets = {
+        ('notification-list', 'GET'): 1,
+        ('notification-unread-count', 'GET'): 1,
+        ('notification-mark-read', 'POST'): 5,
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='testpass123'
+        )
+        self.actor = User.objects.create_user(
+            username='actor', email='actor@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def grow(self):
+        inbox.notify([self.user.pk], 'reply', actor=self.actor)
+
+    def test_budgets_cover_every_url(self):
+        self.assertBudgetsCover(notifications_urls)
+
+    def test_endpoints(self):
+        self.grow()
+        for name in ('notification-list', 'notification-unread-count'):
+            self.assertQueriesDoNotScale(
+                name, 'GET', lambda: self.client.get(reverse(name)), self.grow
+            )
+        self.assertQueryBudget(
+            'notification-mark-read', 'POST',
+            lambda: self.client.post(reverse('notification-mark-read'), {}, format='json')
+        )
@@ -0,0 +1,12 @@
+from django.urls import path
+from .views import (
+    NotificationListView,
+    UnreadCountView,
+    MarkReadView,
+)
+
+urlpatterns = [
+    path('', NotificationListView.as_view(), name='notification-list'),
+    path('unread-count/', UnreadCountView.as_view(), name='notification-unread-count'),
+    path('mark-read/', MarkReadView.as_view(), name='notification-mark-read'),
+]
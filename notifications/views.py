@@ -0,0 +1,48 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from . import inbox
+from .models import Notification
+from .serializers import NotificationSerializer, MarkReadSerializer
+
+
+class NotificationPagination(CursorPagination):
+    """Newest first, served from notification_inbox_idx"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
+
+
+class NotificationListView(APIView):
+    """The current user's notifications (?unread=true for unread only)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        notifications = Notification.objects.filter(recipient=request.user).select_related('actor')
+        if request.query_params.get('unread') in ('1', 'true'):
+            notifications = notifications.filter(is_read=False)
+        paginator = NotificationPagination()
+        page = paginator.paginate_queryset(notifications, request, view=self)
+        serializer = NotificationSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class UnreadCountView(APIView):
+    """Number of unread notifications, cheap enough to poll"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({'unread': inbox.unread_count(request.user)})
+
+
+class MarkReadView(APIView):
+    """Mark some or all of the current user's notifications read"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = MarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        marked = inbox.mark_read(request.user, serializer.validated_data.get('ids'))
+        return Response({'marked': marked, 'unread': inbox.unread_count(request.user)})
@@ -1,15 +1,49 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+
+from alumni_forum.paginators import EstimatedCountPaginator
+from . import dedupe, deletion, moderation, related, tasks
 from .models import Post, Comment
 
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ['name', 'role', 'category', 'company', 'is_approved', 'likes', 'created_at']
-    list_filter = ['category', 'is_approved', 'created_at']
+    list_display = ['name', 'role', 'category', 'company', 'is_approved', 'is_rejected', 'likes', 'views', 'created_at']
+    list_filter = ['category', 'is_approved', 'is_rejected', 'created_at', 'deleted_at']
     search_fields = ['name', 'role', 'experience', 'company', 'skills']
     list_editable = ['is_approved']
-    date_hierarchy = 'created_at'
-    readonly_fields = ['created_at', 'updated_at']
+    autocomplete_fields = ['user']
+    readonly_fields = ['created_at', 'updated_at', 'moderated_at', 'moderated_by', 'duplicate_of', 'deleted_at']
+    actions = ['approve_posts', 'reject_posts']
+    # No COUNT(*) over the whole table on every changelist page
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change or 'experience' in form.changed_data:
+            dedupe.index_post(obj.pk, dedupe.signature(obj.experience), created=not change)
+        if not change or set(form.changed_data) & set(related.SOURCE_FIELDS):
+            tasks.refresh_related.delay(post_id=obj.pk)
+
+    def delete_model(self, request, obj):
+        # Tombstoned now, purged in chunks by a worker (see posts.deletion)
+        deletion.delete_posts(Post.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        deletion.delete_posts(queryset)
+
+    def _set_approval(self, request, queryset, approved):
+        count = moderation.moderate(queryset, approved, request.user)
+        verb = 'approved' if approved else 'rejected'
+        self.message_user(request, f'{count} post(s) {verb}.', messages.SUCCESS)
+
+    @admin.action(description='Approve selected posts', permissions=['change'])
+    def approve_posts(self, request, queryset):
+        self._set_approval(request, queryset, True)
+
+    @admin.action(description='Reject selected posts', permissions=['change'])
+    def reject_posts(self, request, queryset):
+        self._set_approval(request, queryset, False)
 
 
 @admin.register(Comment)
@@ -17,9 +51,12 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ['user', 'post', 'author_role', 'content_preview', 'is_edited', 'created_at']
     list_filter = ['author_role', 'is_edited', 'created_at']
     search_fields = ['user__username', 'content']
-    date_hierarchy = 'created_at'
     readonly_fields = ['created_at', 'updated_at']
-    
+    list_select_related = ['user', 'post']
+    autocomplete_fields = ['user', 'post']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
     def content_preview(self, obj):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
-    content_preview.short_description = 'Content'
\ No newline at end of file
+    content_preview.short_description = 'Content'
@@ -0,0 +1,234 @@
+"""
+Repeatable API benchmark scenarios.
+
+Each scenario issues requests through the Django test client against the
+configured database (seed it first with ``manage.py seed_forum``) and
+records per-request latency and query counts. ``manage.py run_benchmarks``
+runs them and writes a JSON report so results can be compared across
+commits. Scenarios that post comments or likes write to the database, so
+run them against a disposable copy. The report also times rendering a
+large serialized feed with DRF's JSONRenderer and FastJSONRenderer.
+"""
+import json
+import random
+import subprocess
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from alumni_forum.renderers import FastJSONRenderer
+from .models import Post, Comment, Like
+from .serializers import PostSerializer
+
+SCENARIOS = {}
+
+# Every account created by seed_forum shares this password so login can be benchmarked
+SEED_PASSWORD = 'seed-forum-pass'
+
+
+def scenario(name):
+    """Register a scenario: a function (context) -> callable issuing one request"""
+    def decorator(func):
+        SCENARIOS[name] = func
+        return func
+    return decorator
+
+
+class BenchmarkContext:
+    """Users and posts picked once so every iteration hits comparable data"""
+
+    def __init__(self, seed=42):
+        self.random = random.Random(seed)
+        self.student = User.objects.filter(role='student').order_by('pk').first()
+        self.alumni = User.objects.filter(role='alumni').order_by('pk').first()
+        self.post_ids = list(
+            Post.objects.filter(is_approved=True).order_by('-created_at')
+            .values_list('pk', flat=True)[:1000]
+        )
+        self.hot_post_id = (
+            Post.objects.filter(is_approved=True).order_by('-likes')
+            .values_list('pk', flat=True).first()
+        )
+
+    def client(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user=user)
+        return client
+
+
+@scenario('feed_list')
+def feed_list(context):
+    client = context.client()
+    url = reverse('post-list-create')
+    return lambda: client.get(url)
+
+
+@scenario('feed_category')
+def feed_category(context):
+    client = context.client()
+    url = reverse('post-list-create')
+    return lambda: client.get(url, {'category': context.random.choice(['tester', 'web-developer'])})
+
+
+@scenario('feed_trending')
+def feed_trending(context):
+    client = context.client()
+    url = reverse('post-list-create')
+    return lambda: client.get(url, {'sort': 'trending'})
+
+
+@scenario('forum_stats')
+def forum_stats(context):
+    client = context.client()
+    url = reverse('forum-stats')
+    return lambda: client.get(url)
+
+
+@scenario('comment_post')
+def comment_post(context):
+    client = context.client(context.student)
+
+    def run():
+        post_id = context.random.choice(context.post_ids)
+        return client.post(
+            reverse('comment-list-create', args=[post_id]),
+            {'content': 'Benchmark comment', 'author_role': 'student'},
+            format='json'
+        )
+    return run
+
+
+@scenario('login')
+def login(context):
+    client = context.client()
+    url = reverse('login')
+    payload = {'username': context.student.username, 'password': SEED_PASSWORD}
+    return lambda: client.post(url, payload, format='json')
+
+
+@scenario('like_burst')
+def like_burst(context):
+    """Many likes on the same popular post, the worst case for row contention"""
+    client = context.client(context.student)
+    url = reverse('post-like', args=[context.hot_post_id])
+    return lambda: client.post(url)
+
+
+@scenario('recommended')
+def recommended(context):
+    client = context.client(context.student)
+    url = reverse('post-recommended')
+    return lambda: client.get(url, {'interests': context.random.choice(['python cloud', 'testing selenium'])})
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(int(round(q * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_scenario(name, context, iterations=20, warmup=2):
+    request = SCENARIOS[name](context)
+    for _ in range(warmup):
+        request()
+
+    latencies = []
+    queries = []
+    statuses = set()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            request_started = time.perf_counter()
+            response = request()
+            latencies.append((time.perf_counter() - request_started) * 1000)
+        queries.append(len(captured))
+        statuses.add(response.status_code)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'throughput_rps': round(iterations / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3),
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p95': round(percentile(latencies, 0.95), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'max': round(latencies[-1], 3),
+        },
+        'queries': {'min': min(queries), 'max': max(queries)},
+        'status_codes': sorted(statuses),
+    }
+
+
+def compare_renderers(posts=500, iterations=20):
+    """Time rendering one large serialized feed with the stock and the fast renderer"""
+    queryset = Post.objects.with_comments().filter(is_approved=True).order_by('-created_at')[:posts]
+    data = PostSerializer(queryset, many=True).data
+    results = {}
+    for name, renderer in (('drf', JSONRenderer()), ('fast', FastJSONRenderer())):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            body = renderer.render(data)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results[name] = {
+            'bytes': len(body),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'p50_ms': round(percentile(timings, 0.50), 3),
+        }
+    if results['fast']['mean_ms']:
+        results['speedup'] = round(results['drf']['mean_ms'] / results['fast']['mean_ms'], 2)
+    results['posts'] = len(data)
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_all(names=None, iterations=20, warmup=2, seed=42):
+    """Run the named scenarios (default: all) and the renderer comparison, return the JSON-able report"""
+    context = BenchmarkContext(seed)
+    if context.student is None or not context.post_ids:
+        raise ValueError('No data to benchmark; run `manage.py seed_forum` first.')
+
+    # The test client talks to the app as "testserver"
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        scenarios = {
+            name: run_scenario(name, context, iterations, warmup)
+            for name in (names or SCENARIOS)
+        }
+
+    return {
+        'revision': _git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'database': connection.vendor,
+        'rows': {
+            'users': User.objects.count(),
+            'posts': Post.objects.count(),
+            'comments': Comment.objects.count(),
+            'likes': Like.objects.count(),
+        },
+        'scenarios': scenarios,
+        'renderers': compare_renderers(iterations=iterations),
+    }
+
+
+def dumps(report):
+    return json.dumps(report, indent=2)
@@ -0,0 +1,44 @@
+"""
+Cached read responses (see alumni_forum.cache).
+
+Only anonymous feed and post detail responses are cached: signed-in users
+see per-viewer flags on comments. Changes to a post expire its detail
+response (``rendered.refresh``); re-rendered posts and moderation decisions
+expire the feeds, which otherwise trail writes by ``FEED_CACHE_TIMEOUT``
+seconds at most. Expired responses are still served while one request
+recomputes them, so rejected and deleted posts are evicted instead
+(``evict=True``): the next reads wait for fresh responses.
+"""
+from alumni_forum import cache
+from .models import Post
+
+CATEGORIES = [value for value, _ in Post.CATEGORY_CHOICES]
+SORTS = ('newest', 'trending')
+
+
+def feed_key(category, sort):
+    """Cache key of an anonymous feed, or None for a category filter that is not cached"""
+    if not category or category == 'all':
+        category = 'all'
+    elif category not in CATEGORIES:
+        return None
+    return f'posts:feed:{category}:{sort}'
+
+
+def detail_key(post_id):
+    return f'posts:detail:{post_id}'
+
+
+def _expire(keys, evict):
+    if evict:
+        cache.evict(*keys)
+    else:
+        cache.invalidate(*keys)
+
+
+def invalidate_feeds(evict=False):
+    _expire([feed_key(category, sort) for category in ['all', *CATEGORIES] for sort in SORTS], evict)
+
+
+def invalidate_posts(post_ids, evict=False):
+    _expire([detail_key(post_id) for post_id in post_ids], evict)
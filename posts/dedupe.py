@@ -0,0 +1,217 @@
+"""
+Near-duplicate detection for career journeys.
+
+The experience text of a post is cut into overlapping word 3-grams
+(shingles) and summarized by a MinHash signature of ``PERMUTATIONS``
+32-bit values: for each of a fixed set of hash functions, the smallest
+hash over all shingles. The share of equal values between two signatures
+estimates the Jaccard similarity of their shingle sets. Signatures are
+stored packed (256 bytes per post) in ``PostSignature``.
+
+Locality-sensitive hashing finds candidates without comparing against every
+post: the signature is split into ``BANDS`` bands of ``ROWS`` values and each
+band is hashed to one ``PostBand.key``. Posts sharing any key are candidates
+(near-certain above ~0.6 similarity), fetched with a single indexed
+``key IN (...)`` lookup, and then compared by signature against
+``DUPLICATE_THRESHOLD``.
+
+A submission that duplicates one of the author's own posts is merged into
+it (nothing is created); one that duplicates someone else's post is saved
+with ``duplicate_of`` set and held for moderation. ``manage.py dedupe_posts``
+indexes and checks the existing corpus in one streaming pass.
+"""
+import hashlib
+import random
+import re
+from array import array
+
+from django.conf import settings
+from django.db import transaction
+
+from . import stats
+from .models import Post, PostBand, PostSignature
+
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+SHINGLE_SIZE = 3
+
+_MERSENNE = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed: stored signatures must stay comparable across processes and releases
+_rng = random.Random(20240601)
+_PERMS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(PERMUTATIONS)]
+_word_re = re.compile(r'\w+')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def shingles(text):
+    words = _word_re.findall((text or '').lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _hash32(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=4).digest(), 'little')
+
+
+def signature(text):
+    """MinHash signature of ``text`` as a tuple of PERMUTATIONS ints (None for empty text)"""
+    hashes = [_hash32(shingle) for shingle in shingles(text)]
+    if not hashes:
+        return None
+    return tuple(
+        min((a * value + b) % _MERSENNE for value in hashes) & _MAX_HASH for a, b in _PERMS
+    )
+
+
+def pack(sig):
+    return array('I', sig).tobytes()
+
+
+def unpack(data):
+    return tuple(array('I', bytes(data)))
+
+
+def band_keys(sig):
+    """One 64-bit key per band; the band number is part of the key"""
+    keys = []
+    for band in range(BANDS):
+        chunk = array('I', sig[band * ROWS:(band + 1) * ROWS]).tobytes()
+        digest = hashlib.blake2b(bytes([band]) + chunk, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def similarity(sig, other):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(sig, other) if x == y) / PERMUTATIONS
+
+
+def find_duplicate(sig, exclude=None):
+    """
+    The most similar stored post above DUPLICATE_THRESHOLD as (post_id, user_id, similarity), or None.
+
+    Rejected posts are never returned.
+
+    One query: candidate signatures through the band index.
+    """
+    if sig is None:
+        return None
+    candidates = PostSignature.objects.filter(
+        post_id__in=PostBand.objects.filter(key__in=band_keys(sig)).values('post_id'),
+        # A rejected post is no original: resubmitting it, or copying it, starts afresh
+        post__is_rejected=False,
+    )
+    if exclude is not None:
+        candidates = candidates.exclude(post_id=exclude)
+    threshold = _setting('DUPLICATE_THRESHOLD', 0.8)
+    best = None
+    for post_id, user_id, data in candidates.values_list('post_id', 'post__user_id', 'minhash'):
+        score = similarity(sig, unpack(data))
+        if score >= threshold and (best is None or (score, -post_id) > (best[2], -best[0])):
+            best = (post_id, user_id, score)
+    return best
+
+
+def index_post(post_id, sig, created=False):
+    """Store the signature and band keys of one post"""
+    if sig is None:
+        if not created:
+            PostSignature.objects.filter(post_id=post_id).delete()
+            PostBand.objects.filter(post_id=post_id).delete()
+        return
+    if created:
+        PostSignature.objects.create(post_id=post_id, minhash=pack(sig))
+    else:
+        PostSignature.objects.update_or_create(post_id=post_id, defaults={'minhash': pack(sig)})
+        PostBand.objects.filter(post_id=post_id).delete()
+    PostBand.objects.bulk_create(PostBand(post_id=post_id, key=key) for key in band_keys(sig))
+
+
+def flag_duplicates(duplicates):
+    """
+    Hold {post_id: original_id} for moderation as duplicates of the originals.
+
+    Approved posts leave the feeds (stats are adjusted per bucket, like a
+    bulk rejection); the moderation queue shows them with ``duplicate_of``.
+    """
+    from .moderation import posts_moderated
+
+    if not duplicates:
+        return
+    with transaction.atomic():
+        posts = Post.objects.filter(pk__in=list(duplicates))
+        stats.record_bulk_approval(posts, False)
+        flagged = list(posts.only('pk'))
+        for post in flagged:
+            post.duplicate_of_id = duplicates[post.pk]
+            post.is_approved = False
+        Post.objects.bulk_update(flagged, ['duplicate_of', 'is_approved'], batch_size=500)
+        post_ids = [post.pk for post in flagged]
+        transaction.on_commit(
+            lambda: posts_moderated.send(sender=Post, post_ids=post_ids, approved=False)
+        )
+
+
+def dedupe_all(batch_size=1000, dry_run=False, progress=None):
+    """
+    Index every live post and flag near-duplicates of earlier posts in one pass.
+
+    Posts are streamed in primary-key order. The band keys and packed
+    signatures of the originals seen so far are kept in memory (roughly
+    1.5 KB per post), so each post is only compared with its LSH candidates
+    among earlier posts. Returns {duplicate_id: original_id}.
+    """
+    threshold = _setting('DUPLICATE_THRESHOLD', 0.8)
+    buckets = {}
+    signatures = {}
+    duplicates = {}
+    # Deleted posts lost their bands for good, see posts.deletion
+    posts = Post.objects.live().only('pk', 'experience', 'duplicate_of', 'is_rejected').order_by('pk')
+    last_pk = 0
+    seen = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        rows, bands, found = [], [], {}
+        for post in batch:
+            sig = signature(post.experience)
+            if sig is None:
+                continue
+            keys = band_keys(sig)
+            best, best_score = None, 0
+            candidates = {candidate for key in keys for candidate in buckets.get(key, ())}
+            for candidate in sorted(candidates):
+                score = similarity(sig, unpack(signatures[candidate]))
+                if score >= threshold and score > best_score:
+                    best, best_score = candidate, score
+            if post.duplicate_of_id is None and not post.is_rejected:
+                if best is not None:
+                    found[post.pk] = best
+                else:
+                    # Only originals are remembered, so later copies match the first post
+                    for key in keys:
+                        buckets.setdefault(key, []).append(post.pk)
+                    signatures[post.pk] = pack(sig)
+            rows.append(PostSignature(post_id=post.pk, minhash=pack(sig)))
+            bands.extend(PostBand(post_id=post.pk, key=key) for key in keys)
+
+        if not dry_run:
+            with transaction.atomic():
+                PostSignature.objects.filter(post__in=batch).delete()
+                PostBand.objects.filter(post__in=batch).delete()
+                PostSignature.objects.bulk_create(rows, batch_size=batch_size)
+                PostBand.objects.bulk_create(bands, batch_size=batch_size)
+                flag_duplicates(found)
+        duplicates.update(found)
+        last_pk = batch[-1].pk
+        seen += len(batch)
+        if progress:
+            progress(seen, len(duplicates))
+    return duplicates
@@ -0,0 +1,142 @@
+"""
+Two-phase deletion of posts.
+
+Deleting a post through the ORM cascades inside the request: the collector
+loads every comment and like, sends a signal for each and only then deletes
+them, holding locks the whole time. ``delete_posts()`` instead tombstones
+the posts with a single UPDATE: ``deleted_at`` is set and the posts leave
+the approved state, so the feeds, the detail view and the moderation queue
+stop showing them through the indexes they already use. ``is_rejected`` is
+left alone: it records moderation decisions only. The forum stats are
+adjusted per bucket, like a bulk rejection.
+
+The ``purge_post`` job then deletes the comments and likes in chunks of
+``DELETION_BATCH_SIZE`` rows, one short transaction per chunk, and finally
+the post itself. A job runs at most ``DELETION_BATCHES_PER_JOB`` chunks and
+re-enqueues itself while rows are left, so one huge thread never holds a
+worker (or the tables) for long.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from notifications.models import Notification
+from . import rendered, stats
+from .models import Comment, Like, Post, PostBand
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def delete_posts(queryset, purge=True):
+    """
+    Hide the posts in ``queryset`` at once and, with ``purge``, enqueue their removal.
+
+    Returns the ids of the posts that were tombstoned.
+    """
+    from . import tasks
+    from .moderation import posts_moderated
+
+    with transaction.atomic():
+        live = queryset.live()
+        post_ids = list(live.values_list('pk', flat=True))
+        if not post_ids:
+            return []
+        if len(post_ids) == 1:
+            # A single post moves its own contribution, without grouping by every bucket kind
+            stats.record_post_change(
+                stats.post_values(post_ids[0]), None,
+                comments_total=lambda: Comment.objects.filter(post_id=post_ids[0]).count()
+            )
+        else:
+            stats.record_bulk_approval(live, False)
+        # Deleted posts must not be matched as originals of new submissions
+        PostBand.objects.filter(post__in=live).delete()
+        live.update(deleted_at=timezone.now(), is_approved=False)
+        if purge:
+            for post_id in post_ids:
+                tasks.purge_post.delay(post_id=post_id)
+        transaction.on_commit(
+            lambda: posts_moderated.send(sender=Post, post_ids=post_ids, approved=False)
+        )
+    return post_ids
+
+
+def delete_comments(comment_ids):
+    """
+    Delete comments with one DELETE, without loading them or sending per-row signals.
+
+    Replies to them are deleted too. Their notifications lose the comment reference, and approved posts they
+    were on have their stats, trending score and rendered JSON refreshed.
+    """
+    from . import tasks
+
+    # Replies go with the comments they answer, as with a cascading delete
+    comment_ids, frontier = set(comment_ids), set(comment_ids)
+    while frontier:
+        frontier = set(
+            Comment.objects.filter(parent_id__in=frontier).values_list('pk', flat=True)
+        ) - comment_ids
+        comment_ids |= frontier
+    per_post = Counter(Comment.objects.filter(pk__in=comment_ids).values_list('post_id', flat=True))
+    with transaction.atomic():
+        Notification.objects.filter(comment_id__in=comment_ids).update(comment=None)
+        # Deliberately past the collector: delete() would load every row and send post_delete
+        # for each, whose handlers would subtract the comments from the stats a second time
+        Comment.objects.filter(pk__in=comment_ids)._raw_delete(Comment.objects.db)
+        posts = list(
+            Post.objects.filter(pk__in=list(per_post), is_approved=True).values('pk', *stats.TRACKED_FIELDS)
+        )
+        for values in posts:
+            stats.apply_deltas(stats.post_buckets(values), comments=-per_post[values['pk']])
+            tasks.refresh_hot_score.delay(post_id=values['pk'])
+        rendered.refresh([values['pk'] for values in posts])
+
+
+def delete_likes(like_ids):
+    Like.objects.filter(pk__in=like_ids).delete()
+
+
+def purge_chunks(queryset, delete, budget):
+    """
+    Delete ``queryset`` a chunk of primary keys at a time with ``delete(ids)``.
+
+    Newest rows go first, so replies are deleted before the comments they
+    answer. Stops after ``budget`` chunks; returns the budget left, or None when it
+    ran out before the queryset was empty.
+    """
+    size = _setting('DELETION_BATCH_SIZE', 500)
+    while True:
+        ids = list(queryset.order_by('-pk').values_list('pk', flat=True)[:size])
+        if not ids:
+            return budget
+        if not budget:
+            return None
+        delete(ids)
+        budget -= 1
+
+
+def purge_post(post_id, budget=None):
+    """
+    Remove a tombstoned post: its comments and likes in chunks, then the row.
+
+    Deleting the row counts as one more chunk. Returns the chunk budget
+    left, or None when it ran out first (call again to go on).
+    """
+    if budget is None:
+        budget = _setting('DELETION_BATCHES_PER_JOB', 20)
+    for queryset, delete in (
+        (Comment.objects.filter(post_id=post_id), delete_comments),
+        (Like.objects.filter(post_id=post_id), delete_likes),
+    ):
+        budget = purge_chunks(queryset, delete, budget)
+        if budget is None:
+            return None
+    if not budget:
+        return None
+    # What is left per post (skills, neighbours, signature) is small enough for the collector
+    Post.objects.filter(pk=post_id, deleted_at__isnull=False).delete()
+    return budget - 1
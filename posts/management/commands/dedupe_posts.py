@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.dedupe import dedupe_all
+
+
+class Command(BaseCommand):
+    help = 'Index duplicate-detection signatures for every post and flag near-duplicates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Posts read and written per transaction (default: 1000)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report duplicates; write nothing'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        duplicates = dedupe_all(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            progress=lambda done, found: self.stdout.write(f'  {done} posts, {found} duplicates', ending='\r'),
+        )
+        for duplicate_id, original_id in sorted(duplicates.items())[:20]:
+            self.stdout.write(f'Post {duplicate_id} duplicates post {original_id}')
+        verb = 'Found' if options['dry_run'] else 'Flagged'
+        self.stdout.write(
+            f'{verb} {len(duplicates)} near-duplicate posts in {time.monotonic() - started:.2f}s'
+        )
@@ -0,0 +1,14 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized forum statistics from the posts and comments tables'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rows = rebuild()
+        self.stdout.write(f'Rebuilt {rows} forum stat rows in {time.monotonic() - started:.2f}s')
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.related import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the related journeys of every post'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Posts processed per transaction (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = rebuild(
+            batch_size=options['batch_size'],
+            progress=lambda done: self.stdout.write(f'  {done} posts', ending='\r'),
+        )
+        self.stdout.write(f'Computed related journeys for {total} posts in {time.monotonic() - started:.2f}s')
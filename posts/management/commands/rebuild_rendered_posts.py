@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.rendered import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Re-render the stored feed JSON of every approved post'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Posts rendered per transaction (default: 200)'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = rebuild_all(
+            batch_size=options['batch_size'],
+            progress=lambda done: self.stdout.write(f'  {done} posts', ending='\r'),
+        )
+        self.stdout.write(f'Rendered {total} posts in {time.monotonic() - started:.2f}s')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchmarks import SCENARIOS, dumps, run_all
+
+
+class Command(BaseCommand):
+    help = 'Run the API benchmark scenarios and report latency, throughput and query counts as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', choices=sorted(SCENARIOS), dest='scenarios',
+            help='Scenario to run (repeatable, default: all)'
+        )
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            report = run_all(
+                options['scenarios'], options['iterations'], options['warmup'], options['seed']
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(dumps(report))
+            self.stdout.write(self.style.SUCCESS(f"Benchmark report written to {options['output']}"))
+        else:
+            self.stdout.write(dumps(report))
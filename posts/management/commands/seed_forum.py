@@ -0,0 +1,212 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from accounts.search import index_users
+from posts.benchmarks import SEED_PASSWORD
+from posts.models import Post, Comment, Like
+from posts.ranking import recompute_hot_scores
+from posts import dedupe, related, rendered, stats
+
+FIRST_NAMES = [
+    'Aarav', 'Priya', 'Rohan', 'Sneha', 'Vikram', 'Ananya', 'Karan', 'Meera',
+    'Arjun', 'Diya', 'Rahul', 'Isha', 'Siddharth', 'Neha', 'Aditya', 'Pooja',
+]
+LAST_NAMES = [
+    'Sharma', 'Patil', 'Kulkarni', 'Deshmukh', 'Iyer', 'Nair', 'Joshi', 'Mehta',
+    'Reddy', 'Gupta', 'Shinde', 'Pawar', 'Bhatt', 'Rao', 'Kapoor', 'Verma',
+]
+DEPARTMENTS = [
+    'Computer Engineering', 'Information Technology', 'Electronics',
+    'Mechanical Engineering', 'Electrical Engineering', 'Data Science',
+]
+COMPANIES = [
+    'Google', 'Microsoft', 'Amazon', 'Infosys', 'TCS', 'Wipro', 'Accenture',
+    'Flipkart', 'Zoho', 'Razorpay', 'Swiggy', 'Atlassian', 'Adobe', 'Oracle',
+]
+ROLES = {
+    'software-engineer': ['Software Engineer', 'Backend Engineer', 'SDE II'],
+    'web-developer': ['Frontend Developer', 'Full Stack Developer', 'Web Developer'],
+    'cybersecurity-analyst': ['Security Analyst', 'SOC Engineer', 'Penetration Tester'],
+    'tester': ['QA Engineer', 'Automation Tester', 'SDET'],
+    'data-scientist': ['Data Scientist', 'ML Engineer', 'Data Analyst'],
+    'devops-engineer': ['DevOps Engineer', 'Site Reliability Engineer', 'Cloud Engineer'],
+    'mobile-developer': ['Android Developer', 'iOS Developer', 'Flutter Developer'],
+    'other': ['Product Manager', 'Technical Writer', 'Consultant'],
+}
+SKILLS = [
+    'Python', 'Django', 'JavaScript', 'React', 'Java', 'Spring', 'SQL', 'AWS',
+    'Docker', 'Kubernetes', 'Linux', 'Git', 'Selenium', 'Pandas', 'TensorFlow',
+    'Kotlin', 'Swift', 'Networking', 'Go', 'Terraform',
+]
+SENTENCES = [
+    'I started with competitive programming in my second year.',
+    'Internships taught me more than any single course did.',
+    'Building side projects helped me stand out in interviews.',
+    'Focus on fundamentals like data structures and operating systems.',
+    'My first job was at a small startup where I learned to ship fast.',
+    'Contributing to open source opened many doors for me.',
+    'I switched domains after two years and never looked back.',
+    'Mock interviews with seniors made a huge difference.',
+    'Learn to communicate clearly; it matters as much as code.',
+    'Certifications helped, but hands-on labs helped more.',
+]
+COMMENTS = [
+    'Thanks for sharing this!', 'Which resources did you use for preparation?',
+    'How did you get your first internship?', 'This is really inspiring.',
+    'Did you do any certifications?', 'What would you do differently today?',
+]
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate synthetic users, posts, comments and likes for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--likes', type=int, default=50000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for repeatable data')
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Do not build duplicate signatures, related journeys and stored feed JSON (slow for large seeds)'
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+
+        with transaction.atomic():
+            user_ids, alumni_ids = self.seed_users(options['users'])
+            post_ids = self.seed_posts(options['posts'], alumni_ids or user_ids)
+            self.seed_comments(options['comments'], post_ids, user_ids)
+            self.seed_likes(options['likes'], post_ids, user_ids)
+
+        recompute_hot_scores(batch_size=self.batch_size)
+        stats.rebuild()
+        # bulk_create skips the signals that build these for every new post
+        if not options['skip_derived']:
+            dedupe.dedupe_all()
+            related.rebuild()
+            rendered.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['users']} users, {options['posts']} posts, "
+            f"{options['comments']} comments and {options['likes']} likes "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
+        if options['skip_derived']:
+            self.stdout.write(self.style.WARNING(
+                'Derived data skipped: run dedupe_posts, rebuild_related and rebuild_rendered_posts '
+                'before benchmarking, or the feed and related journeys take their fallback paths'
+            ))
+
+    def _insert(self, model, objects):
+        created = []
+        for start in range(0, len(objects), self.batch_size):
+            created += model.objects.bulk_create(objects[start:start + self.batch_size])
+        return created
+
+    def seed_users(self, count):
+        if not count:
+            return [], []
+        # Hashing is the slow part of creating users, so hash once for everyone
+        password = make_password(SEED_PASSWORD)
+        run = int(time.time())
+        current_year = timezone.now().year
+        users = []
+        for index in range(count):
+            first = self.random.choice(FIRST_NAMES)
+            last = self.random.choice(LAST_NAMES)
+            role = 'alumni' if self.random.random() < 0.4 else 'student'
+            username = f'seed{run}_{index}'
+            users.append(User(
+                username=username,
+                email=f'{username}@example.com',
+                password=password,
+                first_name=first,
+                last_name=last,
+                role=role,
+                graduation_year=self.random.randint(current_year - 15, current_year + 3),
+                department=self.random.choice(DEPARTMENTS),
+                bio=f'{first} studies {self.random.choice(SKILLS)} and {self.random.choice(SKILLS)}.',
+            ))
+        created = self._insert(User, users)
+        # bulk_create skips the post_save signal that maintains search terms
+        index_users(User.objects.filter(pk__gte=created[0].pk, pk__lte=created[-1].pk), self.batch_size)
+        return [user.pk for user in created], [user.pk for user in created if user.role == 'alumni']
+
+    def seed_posts(self, count, author_ids):
+        if not count or not author_ids:
+            return []
+        categories = list(ROLES)
+        now = timezone.now()
+        posts = []
+        for _ in range(count):
+            category = self.random.choice(categories)
+            first = self.random.choice(FIRST_NAMES)
+            role = self.random.choice(ROLES[category])
+            company = self.random.choice(COMPANIES)
+            year = now.year - self.random.randint(1, 15)
+            # A personal opening keeps journeys built from the shared sentences apart for dedupe
+            opening = f'{first} joined {company} as {role} after graduating in {year}.'
+            posts.append(Post(
+                user_id=self.random.choice(author_ids),
+                name=f'{first} {self.random.choice(LAST_NAMES)}',
+                role=role,
+                category=category,
+                company=company,
+                experience=' '.join([opening, *self.random.sample(SENTENCES, self.random.randint(3, 6))]),
+                skills=', '.join(self.random.sample(SKILLS, self.random.randint(2, 6))),
+                graduation_year=year,
+            ))
+        created = self._insert(Post, posts)
+
+        # auto_now_add overrides created_at on insert, so spread it out afterwards
+        for post in created:
+            post.created_at = now - timedelta(minutes=self.random.randint(0, 60 * 24 * 365))
+        Post.objects.bulk_update(created, ['created_at'], batch_size=self.batch_size)
+        return [post.pk for post in created]
+
+    def seed_comments(self, count, post_ids, user_ids):
+        if not count or not post_ids:
+            return
+        comments = [
+            Comment(
+                post_id=self.random.choice(post_ids),
+                user_id=self.random.choice(user_ids),
+                author_role=self.random.choice(['student', 'alumni']),
+                content=self.random.choice(COMMENTS),
+            )
+            for _ in range(count)
+        ]
+        created = self._insert(Comment, comments)
+
+        # Seeded comments are all top-level; the path is their own id
+        for comment in created:
+            comment.path = Comment.path_segment(comment.pk)
+        Comment.objects.bulk_update(created, ['path'], batch_size=self.batch_size)
+
+    def seed_likes(self, count, post_ids, user_ids):
+        if not count or not post_ids:
+            return
+        count = min(count, len(post_ids) * len(user_ids))
+        pairs = set()
+        while len(pairs) < count:
+            # Skew towards a few popular posts like real engagement
+            post_id = post_ids[int(len(post_ids) * self.random.random() ** 2)]
+            pairs.add((post_id, self.random.choice(user_ids)))
+        self._insert(Like, [Like(post_id=post_id, user_id=user_id) for post_id, user_id in pairs])
+
+        totals = {}
+        for post_id, _ in pairs:
+            totals[post_id] = totals.get(post_id, 0) + 1
+        posts = [Post(pk=post_id, likes=likes) for post_id, likes in totals.items()]
+        Post.objects.bulk_update(posts, ['likes'], batch_size=self.batch_size)
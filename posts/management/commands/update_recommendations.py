@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import recommend
+
+
+class Command(BaseCommand):
+    help = 'Add new and edited posts to the recommendation index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Rebuild the index from scratch instead of adding a segment'
+        )
+        parser.add_argument(
+            '--loop', type=int, default=0, metavar='SECONDS',
+            help='Keep running and update every SECONDS (default: run once)'
+        )
+
+    def handle(self, *args, **options):
+        if recommend.np is None:
+            raise CommandError('NumPy is required for the recommendation index (pip install numpy).')
+
+        full = options['full']
+        while True:
+            started = time.monotonic()
+            indexed = recommend.update_index(full=full)
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'Indexed {indexed} posts in {elapsed:.2f}s')
+
+            if not options['loop']:
+                break
+            full = False
+            time.sleep(max(options['loop'] - elapsed, 0))
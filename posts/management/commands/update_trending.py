@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.ranking import recompute_hot_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute time-decayed trending scores for posts in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of posts updated per bulk UPDATE (default: 500)'
+        )
+        parser.add_argument(
+            '--loop', type=int, default=0, metavar='SECONDS',
+            help='Keep running and recompute every SECONDS (default: run once)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            updated = recompute_hot_scores(batch_size=options['batch_size'])
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'Recomputed {updated} trending scores in {elapsed:.2f}s')
+
+            if not options['loop']:
+                break
+            time.sleep(max(options['loop'] - elapsed, 0))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_post_hot_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForumStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('total', 'Total'), ('category', 'Category'), ('graduation_year', 'Graduation year'), ('company', 'Company'), ('author', 'Author')], max_length=20)),
+                ('key', models.CharField(blank=True, max_length=200)),
+                ('label', models.CharField(blank=True, max_length=200)),
+                ('posts', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+                ('likes', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['kind', '-posts'],
+                'indexes': [models.Index(fields=['kind', '-posts'], name='forum_stat_top_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='forumstat',
+            constraint=models.UniqueConstraint(fields=('kind', 'key'), name='forum_stat_kind_key'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_post_moderation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('skill', models.CharField(max_length=100)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_terms', to='posts.post')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='posts.post')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['post', '-score'], name='related_post_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='relatedpost',
+            constraint=models.UniqueConstraint(fields=('post', 'related'), name='related_post_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='postskill',
+            index=models.Index(fields=['skill', 'post'], name='post_skill_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='postskill',
+            constraint=models.UniqueConstraint(fields=('post', 'skill'), name='post_skill_unique'),
+        ),
+    ]
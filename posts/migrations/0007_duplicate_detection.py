@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_related_posts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSignature',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='posts.post')),
+                ('minhash', models.BinaryField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Earlier post this one nearly duplicates (see posts.dedupe)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.post'),
+        ),
+        migrations.CreateModel(
+            name='PostBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key'], name='post_band_key_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_top_level_paths(apps, schema_editor):
+    # Every existing comment starts its own thread
+    Comment = apps.get_model('posts', 'Comment')
+    step = 8
+    batch = []
+    for comment in Comment.objects.only('pk').order_by('pk').iterator(chunk_size=2000):
+        comment.path = format(comment.pk, f'0{step}x')
+        batch.append(comment)
+        if len(batch) >= 2000:
+            Comment.objects.bulk_update(batch, ['path'])
+            batch = []
+    Comment.objects.bulk_update(batch, ['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=248),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_thread_idx'),
+        ),
+        migrations.RunPython(set_top_level_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_comment_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumstat',
+            name='views',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='unique_viewers',
+            field=models.PositiveIntegerField(default=0, help_text='Estimated distinct viewers over the last VIEWS_UNIQUE_DAYS days'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='views',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PostViewDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('viewers', models.BinaryField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_days', to='posts.post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='postviewday',
+            constraint=models.UniqueConstraint(fields=('post', 'day'), name='post_view_day_unique'),
+        ),
+    ]
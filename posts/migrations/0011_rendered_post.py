@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderedPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rendered', serialize=False, to='posts.post')),
+                ('data', models.TextField()),
+                ('rendered_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:46
+
+from django.db import migrations, models
+
+
+def unreject_deleted_posts(apps, schema_editor):
+    # Deletion used to mark posts rejected; those never moderated were not rejected by anyone
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.filter(deleted_at__isnull=False, moderated_at__isnull=True).update(is_rejected=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_rendered_post'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_pending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('is_approved', False), ('is_rejected', False)), fields=['created_at'], name='post_pending_idx'),
+        ),
+        migrations.RunPython(unreject_deleted_posts, migrations.RunPython.noop),
+    ]
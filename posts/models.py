@@ -1,8 +1,43 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Coalesce, RowNumber
 #from django.contrib.auth.models import User
 
 
+class PostQuerySet(models.QuerySet):
+    def with_comments(self, limit=None):
+        """Load authors and comments (with their authors) in two queries total"""
+        return self.select_related('user').prefetch_comments(limit)
+
+    def prefetch_comments(self, limit=None):
+        """Prefetch visible comments with their authors, only each post's first ``limit`` if given"""
+        comments = Comment.objects.visible().select_related('user')
+        if limit is not None:
+            # Still one query: each post's comments are numbered in display order
+            comments = comments.annotate(position=models.Window(
+                RowNumber(), partition_by=[models.F('post')],
+                order_by=[models.F('created_at').asc(), models.F('pk').asc()],
+            )).filter(position__lte=limit)
+        return self.prefetch_related(models.Prefetch('comments', queryset=comments))
+
+    def live(self):
+        """Posts that have not been deleted (tombstoned posts await their purge)"""
+        return self.filter(deleted_at__isnull=True)
+
+    def with_comment_counts(self):
+        """Annotate ``comments_total`` (visible comments) without loading the comments"""
+        counts = Comment.objects.visible().filter(post=models.OuterRef('pk')).order_by().values('post')
+        return self.annotate(comments_total=Coalesce(
+            models.Subquery(counts.annotate(total=models.Count('pk')).values('total')), 0
+        ))
+
+
+class CommentQuerySet(models.QuerySet):
+    def visible(self):
+        """Comments whose author has not deleted their account (see accounts.deletion)"""
+        return self.filter(user__deleted_at__isnull=True)
+
+
 class Post(models.Model):
     """Alumni career experience post"""
     CATEGORY_CHOICES = [
@@ -37,12 +72,53 @@ class Post(models.Model):
     graduation_year = models.PositiveIntegerField(blank=True, null=True)
     linkedin_url = models.URLField(blank=True, null=True)
     likes = models.PositiveIntegerField(default=0)
+    # Maintained in batches by posts.viewcounts, never per request
+    views = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(
+        default=0,
+        help_text="Estimated distinct viewers over the last VIEWS_UNIQUE_DAYS days"
+    )
     is_approved = models.BooleanField(default=True)
+    # Pending = neither approved nor rejected (see posts.moderation)
+    is_rejected = models.BooleanField(default=False)
+    moderated_at = models.DateTimeField(blank=True, null=True)
+    moderated_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        help_text="Earlier post this one nearly duplicates (see posts.dedupe)"
+    )
+    hot_score = models.FloatField(
+        default=0,
+        help_text="Time-decayed engagement score used by the trending feed"
+    )
+    # Set when the post is deleted; comments, likes and the row itself are purged later
+    deleted_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_approved', '-created_at'], name='post_feed_idx'),
+            models.Index(fields=['is_approved', '-hot_score'], name='post_trending_idx'),
+            # Only the (small) moderation queue is indexed, oldest first
+            models.Index(
+                fields=['created_at'], name='post_pending_idx',
+                condition=models.Q(is_approved=False, is_rejected=False, deleted_at__isnull=True)
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.role}"
@@ -59,12 +135,25 @@ class Comment(models.Model):
         ('student', 'Student'),
         ('alumni', 'Alumni'),
     ]
+    # Hex characters per id in ``path``, and the deepest reply allowed (see posts.threads)
+    PATH_STEP = 8
+    MAX_DEPTH = 30
     
     post = models.ForeignKey(
         Post, 
         on_delete=models.CASCADE, 
         related_name='comments'
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        related_name='replies',
+        null=True,
+        blank=True
+    )
+    # Materialized path: the ids of the ancestors and of the comment itself
+    path = models.CharField(max_length=PATH_STEP * (MAX_DEPTH + 1), blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
         on_delete=models.CASCADE,
@@ -80,12 +169,32 @@ class Comment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_edited = models.BooleanField(default=False)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ['created_at']
+        # Threads and subtrees are ranges of this index, already in display order
+        indexes = [
+            models.Index(fields=['post', 'path'], name='comment_thread_idx'),
+        ]
 
     def __str__(self):
         return f"Comment by {self.user.username} on {self.post}"
 
+    @classmethod
+    def path_segment(cls, pk):
+        return format(pk, f'0{cls.PATH_STEP}x')
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if adding and self.parent_id:
+            self.depth = self.parent.depth + 1
+        super().save(*args, **kwargs)
+        if adding and not self.path:
+            # The path ends with the comment's own id, known only after the insert
+            self.path = (self.parent.path if self.parent_id else '') + self.path_segment(self.pk)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
     @property
     def author_name(self):
         """Return the username as author_name for API compatibility"""
@@ -108,4 +217,132 @@ class Like(models.Model):
         ordering = ['created_at']
     
     def __str__(self):
-        return str(self.user.username)
\ No newline at end of file
+        return str(self.user.username)
+
+
+class ForumStat(models.Model):
+    """
+    Pre-aggregated forum counters (materialized GROUP BY over posts).
+
+    One row per (kind, key) bucket, e.g. ('category', 'web-developer') or
+    ('company', 'google'). Rows are kept up to date incrementally by the
+    signal handlers in posts.signals and can be rebuilt from scratch with
+    ``manage.py rebuild_forum_stats``.
+    """
+    KIND_CHOICES = [
+        ('total', 'Total'),
+        ('category', 'Category'),
+        ('graduation_year', 'Graduation year'),
+        ('company', 'Company'),
+        ('author', 'Author'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    key = models.CharField(max_length=200, blank=True)
+    label = models.CharField(max_length=200, blank=True)
+    posts = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    likes = models.IntegerField(default=0)
+    views = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['kind', '-posts']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='forum_stat_kind_key'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', '-posts'], name='forum_stat_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.key} ({self.posts} posts)"
+
+
+class PostSkill(models.Model):
+    """One normalized skill of a post, for finding posts that share skills (see posts.related)"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='skill_terms')
+    skill = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'skill'], name='post_skill_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['skill', 'post'], name='post_skill_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.skill} -> {self.post_id}"
+
+
+class RelatedPost(models.Model):
+    """A precomputed neighbour of a post, up to RELATED_POSTS_COUNT per post"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'related'], name='related_post_unique'),
+        ]
+        # The detail view reads one post's neighbours, best first
+        indexes = [
+            models.Index(fields=['post', '-score'], name='related_post_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} ~ {self.related_id} ({self.score:.2f})"
+
+
+class PostSignature(models.Model):
+    """MinHash signature of a post's experience text, packed 32-bit values (see posts.dedupe)"""
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, primary_key=True, related_name='signature'
+    )
+    minhash = models.BinaryField()
+
+    def __str__(self):
+        return f"Signature of {self.post_id}"
+
+
+class PostBand(models.Model):
+    """One LSH bucket of a post's signature; posts sharing a bucket are duplicate candidates"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key'], name='post_band_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} -> {self.post_id}"
+
+
+class PostViewDay(models.Model):
+    """Views of a post on one day, with a HyperLogLog sketch of its viewers (see posts.viewcounts)"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='view_days')
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    viewers = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'day'], name='post_view_day_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} on {self.day}: {self.views}"
+
+
+class RenderedPost(models.Model):
+    """A post's feed JSON as anonymous visitors see it, kept up to date by posts.rendered"""
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, primary_key=True, related_name='rendered'
+    )
+    data = models.TextField()
+    rendered_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Rendered {self.post_id}"
@@ -0,0 +1,57 @@
+"""
+Moderation queue for career journeys.
+
+With ``POSTS_REQUIRE_APPROVAL`` on, posts by non-staff users start out
+pending (neither approved nor rejected) and only appear in the feeds once
+staff approve them. The pending queue is served from the partial
+``post_pending_idx`` index, which only holds pending rows, so it stays
+small however large the posts table grows.
+
+Approving or rejecting any number of posts is a single UPDATE; the forum
+stats are adjusted per bucket and ``posts_moderated`` is sent so caches
+built from approved posts can be dropped.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import stats
+from .models import Post
+
+# Sent after a batch of posts was approved or rejected (kwargs: post_ids, approved)
+posts_moderated = Signal()
+
+
+def requires_approval(user):
+    return getattr(settings, 'POSTS_REQUIRE_APPROVAL', False) and not user.is_staff
+
+
+def pending_posts():
+    """Posts waiting for a decision, oldest first (matches post_pending_idx)"""
+    return Post.objects.filter(is_approved=False, is_rejected=False).live().order_by('created_at')
+
+
+def moderate(queryset, approved, moderator=None):
+    """
+    Approve or reject every post in ``queryset`` with one UPDATE.
+
+    Posts already in the requested state, and deleted posts, are left
+    alone. Returns the number of posts that changed.
+    """
+    with transaction.atomic():
+        changing = queryset.live().exclude(is_approved=approved, is_rejected=not approved)
+        post_ids = list(changing.values_list('pk', flat=True))
+        if not post_ids:
+            return 0
+        stats.record_bulk_approval(changing, approved)
+        updated = changing.update(
+            is_approved=approved,
+            is_rejected=not approved,
+            moderated_at=timezone.now(),
+            moderated_by=moderator,
+        )
+        transaction.on_commit(
+            lambda: posts_moderated.send(sender=Post, post_ids=post_ids, approved=approved)
+        )
+    return updated
@@ -0,0 +1,84 @@
+"""
+Trending ("hot") ranking for career journeys.
+
+A post's score is its engagement divided by a power of its age, so scores
+decay over time and have to be stored and refreshed rather than computed per
+request. Scores live in the indexed ``Post.hot_score`` column; they are
+recomputed in batches by ``manage.py update_trending`` and bumped for a
+single post by a background job whenever it is liked or commented on.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Post
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def hot_score(likes, comments, created_at, now=None):
+    """Return the time-decayed trending score for the given engagement"""
+    now = now or timezone.now()
+    age_hours = max((now - created_at).total_seconds() / 3600, 0)
+    if age_hours > _setting('TRENDING_WINDOW_DAYS', 30) * 24:
+        return 0.0
+
+    engagement = likes + _setting('TRENDING_COMMENT_WEIGHT', 2) * comments
+    # The +1 lets brand new posts without engagement still surface by recency
+    return (engagement + 1) / math.pow(age_hours + 2, _setting('TRENDING_GRAVITY', 1.5))
+
+
+def refresh_hot_score(post_id, now=None):
+    """Recompute the score of a single post (used on engagement events)"""
+    row = (
+        Post.objects.filter(pk=post_id)
+        .annotate(comments_total=Count('comments'))
+        .values('likes', 'created_at', 'comments_total')
+        .first()
+    )
+    if row is None:
+        return None
+
+    score = hot_score(row['likes'], row['comments_total'], row['created_at'], now)
+    Post.objects.filter(pk=post_id).update(hot_score=score)
+    return score
+
+
+def recompute_hot_scores(batch_size=500, now=None):
+    """
+    Recompute scores for every post inside the trending window.
+
+    Posts are walked in primary-key order in batches of ``batch_size`` so the
+    job never holds more than one batch in memory. Posts that aged out of the
+    window since the last run are zeroed in a single UPDATE.
+    Returns the number of posts whose score was recomputed.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=_setting('TRENDING_WINDOW_DAYS', 30))
+
+    Post.objects.filter(created_at__lt=cutoff, hot_score__gt=0).update(hot_score=0)
+
+    candidates = (
+        Post.objects.filter(created_at__gte=cutoff)
+        .annotate(comments_total=Count('comments'))
+        .only('id', 'likes', 'created_at', 'hot_score')
+        .order_by('pk')
+    )
+
+    updated = 0
+    last_pk = 0
+    while True:
+        batch = list(candidates.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        for post in batch:
+            post.hot_score = hot_score(post.likes, post.comments_total, post.created_at, now)
+        Post.objects.bulk_update(batch, ['hot_score'])
+        updated += len(batch)
+        last_pk = batch[-1].pk
+    return updated
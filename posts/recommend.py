@@ -0,0 +1,372 @@
+"""
+Student-to-journey recommendations.
+
+Every post is turned into a hashed-feature vector: the words of its skills,
+role, category and experience are hashed into ``FEATURES`` buckets, given a
+sublinear term frequency (skills and role count more than experience) and
+L2-normalized. The vectors are stored on disk as an inverted index, the
+post-by-feature matrix in CSC layout: for every feature, the rows of the
+posts containing it and their weights. The arrays are ``.npy`` files opened
+memory-mapped, so all worker processes share one copy in the page cache.
+
+A student's department, bio and interests are hashed the same way and
+weighted by IDF. Scoring the whole corpus is one sparse matrix-vector
+product that only reads the postings of the query's features, then
+``argpartition`` picks the top candidates; 100k posts score in a few
+milliseconds.
+
+The index grows in segments. ``update_index()`` vectorizes only the posts
+created or edited since the previous run (by ``updated_at``) into a new
+segment. It re-reads the last ``RECOMMENDER_WATERMARK_OVERLAP`` seconds
+before its watermark, so rows committed after a later-stamped one are not
+missed, and skips post versions it already indexed (the manifest remembers
+them for that window). A post in a newer segment masks its rows in older ones, which stop
+counting towards the document frequencies behind the IDF. Once there
+are ``RECOMMENDER_MAX_SEGMENTS`` segments they are merged into one, which
+also drops deleted posts. Approval is checked in the database when results
+are served, so moderation takes effect immediately.
+
+NumPy is optional: without it ``recommend()`` returns None and the view
+falls back to the trending feed.
+"""
+import json
+import os
+import re
+import uuid
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+
+from .models import Post
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+FEATURES = 2 ** 18
+MANIFEST = 'manifest.json'
+POST_FIELDS = {'skills': 3, 'role': 2, 'category': 2, 'experience': 1}
+STUDENT_FIELDS = {'interests': 3, 'department': 2, 'bio': 1}
+ARRAYS = ('indptr', 'rows', 'weights', 'post_ids')
+
+_word_re = re.compile(r'[a-z0-9+#]+')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def index_dir():
+    return Path(_setting('RECOMMENDER_INDEX_DIR', settings.BASE_DIR / 'recommender'))
+
+
+def hashed_terms(fields, weights):
+    """{feature: weighted term count} for a dict of text fields"""
+    counts = Counter()
+    for field, weight in weights.items():
+        for word in _word_re.findall((fields.get(field) or '').lower().replace('-', ' ')):
+            counts[zlib.crc32(word.encode()) & (FEATURES - 1)] += weight
+    return counts
+
+
+def post_vector(post):
+    """Sparse (features, weights) of a post: sublinear TF, unit length"""
+    counts = hashed_terms(
+        {field: getattr(post, field) for field in POST_FIELDS}, POST_FIELDS
+    )
+    if not counts:
+        return None
+    features = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    weights = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    return features, (weights / np.linalg.norm(weights)).astype(np.float32)
+
+
+# Building and storing segments
+
+def _build_segment(posts):
+    """
+    Vectorize posts into the CSC arrays of one segment.
+
+    A post with nothing to index still gets a row, without postings, so
+    that it masks the rows it had in older segments.
+    """
+    post_ids, feature_parts, row_parts, weight_parts = [], [], [], []
+    for post in posts:
+        vector = post_vector(post)
+        if vector is None:
+            features, weights = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        else:
+            features, weights = vector
+        row_parts.append(np.full(len(features), len(post_ids), dtype=np.int32))
+        post_ids.append(post.pk)
+        feature_parts.append(features)
+        weight_parts.append(weights)
+    if not post_ids:
+        return None
+    return _to_csc(
+        np.concatenate(feature_parts), np.concatenate(row_parts),
+        np.concatenate(weight_parts), np.asarray(post_ids, dtype=np.int64)
+    )
+
+
+def _to_csc(features, rows, weights, post_ids):
+    order = np.argsort(features, kind='stable')
+    indptr = np.zeros(FEATURES + 1, dtype=np.int64)
+    np.cumsum(np.bincount(features, minlength=FEATURES), out=indptr[1:])
+    return {'indptr': indptr, 'rows': rows[order], 'weights': weights[order], 'post_ids': post_ids}
+
+
+def _save_segment(directory, arrays):
+    name = uuid.uuid4().hex[:12]
+    for key in ARRAYS:
+        np.save(directory / f'{name}.{key}.npy', arrays[key])
+    return name
+
+
+def _delete_segment(directory, name):
+    for key in ARRAYS:
+        (directory / f'{name}.{key}.npy').unlink(missing_ok=True)
+
+
+def _empty_manifest():
+    # recent: {post id: updated_at} of the posts indexed within the overlap before the watermark
+    return {'segments': [], 'watermark': None, 'docs': 0, 'df': None, 'recent': {}}
+
+
+def _read_manifest(directory):
+    try:
+        with open(directory / MANIFEST) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return _empty_manifest()
+
+
+def _delete_files(directory, manifest):
+    """Remove the files of a manifest that was replaced"""
+    for segment in manifest['segments']:
+        _delete_segment(directory, segment['name'])
+    if manifest.get('df'):
+        (directory / manifest['df']).unlink(missing_ok=True)
+
+
+def _write_manifest(directory, manifest):
+    temporary = directory / f'{MANIFEST}.{os.getpid()}.tmp'
+    with open(temporary, 'w') as handle:
+        json.dump(manifest, handle)
+    # Readers see either the old or the new manifest, never half of one
+    os.replace(temporary, directory / MANIFEST)
+
+
+def update_index(full=False, batch_size=2000):
+    """
+    Add posts changed since the last run as a new segment; returns how many were indexed.
+
+    ``full`` rebuilds the index from scratch.
+    """
+    directory = index_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    current = _read_manifest(directory)
+    manifest = _empty_manifest() if full else current
+
+    overlap = timedelta(seconds=_setting('RECOMMENDER_WATERMARK_OVERLAP', 60))
+    recent = dict(manifest.get('recent', {}))
+    posts = Post.objects.only('pk', 'updated_at', *POST_FIELDS).order_by('updated_at', 'pk')
+    watermark = None
+    if manifest['watermark']:
+        watermark = datetime.fromisoformat(manifest['watermark'])
+        posts = posts.filter(updated_at__gte=watermark - overlap)
+    indexed = 0
+
+    def changed():
+        # Streamed, so a full rebuild never holds every post in memory
+        nonlocal indexed, watermark
+        for post in posts.iterator(chunk_size=batch_size):
+            stamp = post.updated_at.isoformat()
+            if recent.get(str(post.pk)) == stamp:
+                continue
+            recent[str(post.pk)] = stamp
+            indexed += 1
+            watermark = post.updated_at if watermark is None else max(watermark, post.updated_at)
+            yield post
+
+    arrays = _build_segment(changed())
+    if not indexed:
+        return 0
+    if arrays is not None:
+        df = _load_df(directory, manifest)
+        df += np.bincount(_row_features(arrays), minlength=FEATURES).astype(np.int32)
+        docs = len(np.unique(arrays['rows']))
+        # The older rows of re-indexed posts are masked from now on, so they stop counting
+        index = _open(directory, manifest)
+        for segment in index.segments if index is not None else []:
+            masked = segment.live & np.isin(segment.post_ids, arrays['post_ids'])
+            if masked.any():
+                postings = masked[segment.rows]
+                features = _row_features({'indptr': segment.indptr})[postings]
+                df -= np.bincount(features, minlength=FEATURES).astype(np.int32)
+                docs -= len(np.unique(segment.rows[postings]))
+        previous_df, manifest['df'] = manifest['df'], _save_df(directory, df)
+        manifest['docs'] += docs
+        manifest['segments'].append({
+            'name': _save_segment(directory, arrays), 'rows': len(arrays['post_ids'])
+        })
+    manifest['watermark'] = watermark.isoformat()
+    manifest['recent'] = {
+        pk: stamp for pk, stamp in recent.items() if datetime.fromisoformat(stamp) >= watermark - overlap
+    }
+    _write_manifest(directory, manifest)
+    if full:
+        _delete_files(directory, current)
+    elif arrays is not None and previous_df:
+        (directory / previous_df).unlink(missing_ok=True)
+
+    if len(manifest['segments']) >= _setting('RECOMMENDER_MAX_SEGMENTS', 8):
+        merge_segments()
+    return indexed
+
+
+def _row_features(arrays):
+    """The feature of every posting (inverse of indptr)"""
+    return np.repeat(np.arange(FEATURES, dtype=np.int32), np.diff(arrays['indptr']))
+
+
+def _load_df(directory, manifest):
+    if not manifest.get('df'):
+        return np.zeros(FEATURES, dtype=np.int32)
+    return np.load(directory / manifest['df'])
+
+
+def _save_df(directory, df):
+    name = f'df.{uuid.uuid4().hex[:12]}.npy'
+    np.save(directory / name, df)
+    return name
+
+
+def merge_segments():
+    """Fold all segments into one, dropping superseded rows and deleted posts"""
+    directory = index_dir()
+    manifest = _read_manifest(directory)
+    index = _open(directory, manifest)
+    if index is None:
+        return
+    existing = np.fromiter(Post.objects.values_list('pk', flat=True).iterator(), dtype=np.int64)
+    features, rows, weights, post_ids = [], [], [], []
+    for segment in index.segments:
+        # Rows without postings only served to mask older rows
+        has_postings = np.bincount(segment.rows, minlength=len(segment.post_ids)) > 0
+        keep_rows = segment.live & has_postings & np.isin(segment.post_ids, existing)
+        row_map = np.full(len(segment.post_ids), -1, dtype=np.int64)
+        row_map[keep_rows] = np.arange(keep_rows.sum()) + sum(len(ids) for ids in post_ids)
+        postings = row_map[segment.rows] >= 0
+        features.append(_row_features({'indptr': segment.indptr})[postings])
+        rows.append(row_map[segment.rows][postings].astype(np.int32))
+        weights.append(np.asarray(segment.weights)[postings])
+        post_ids.append(np.asarray(segment.post_ids)[keep_rows])
+    arrays = _to_csc(
+        np.concatenate(features), np.concatenate(rows),
+        np.concatenate(weights), np.concatenate(post_ids)
+    )
+    df = np.bincount(_row_features(arrays), minlength=FEATURES).astype(np.int32)
+    merged = dict(manifest, df=_save_df(directory, df), docs=len(arrays['post_ids']))
+    merged['segments'] = [{'name': _save_segment(directory, arrays), 'rows': merged['docs']}]
+    _write_manifest(directory, merged)
+    _delete_files(directory, manifest)
+
+
+# Loading and querying
+
+class Segment:
+    def __init__(self, directory, name):
+        for key in ARRAYS:
+            setattr(self, key, np.load(directory / f'{name}.{key}.npy', mmap_mode='r'))
+        self.live = np.ones(len(self.post_ids), dtype=bool)
+
+
+class Index:
+    def __init__(self, segments, idf):
+        self.segments = segments
+        self.idf = idf
+
+
+_loaded = {'key': None, 'index': None}
+
+
+def _open(directory, manifest):
+    if not manifest['segments']:
+        return None
+    segments = [Segment(directory, segment['name']) for segment in manifest['segments']]
+    # A post re-indexed in a newer segment hides its older rows
+    seen = np.empty(0, dtype=np.int64)
+    for segment in reversed(segments):
+        segment.live &= ~np.isin(segment.post_ids, seen)
+        seen = np.concatenate([seen, segment.post_ids])
+    df = _load_df(directory, manifest)
+    idf = np.log((1 + manifest['docs']) / (1 + df)).astype(np.float32) + 1
+    return Index(segments, idf)
+
+
+def load_index():
+    """The current index, reopened only when the manifest changed"""
+    directory = index_dir()
+    try:
+        key = (directory, (directory / MANIFEST).stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    if _loaded['key'] != key:
+        _loaded['index'] = _open(directory, _read_manifest(directory))
+        _loaded['key'] = key
+    return _loaded['index']
+
+
+def score(index, counts, limit):
+    """Top ``limit`` (post_id, score) pairs for a {feature: weight} query"""
+    features = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    query = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts))))
+    query *= index.idf[features]
+    best_ids, best_scores = [], []
+    for segment in index.segments:
+        starts, ends = segment.indptr[features], segment.indptr[features + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            continue
+        # Positions of every posting of the query's features, in one gather
+        positions = np.repeat(ends - lengths.cumsum(), lengths) + np.arange(lengths.sum())
+        scores = np.bincount(
+            segment.rows[positions],
+            weights=segment.weights[positions] * np.repeat(query, lengths),
+            minlength=len(segment.post_ids),
+        )
+        scores[~segment.live] = 0
+        top = np.argpartition(-scores, min(limit, len(scores) - 1))[:limit]
+        top = top[scores[top] > 0]
+        best_ids.append(segment.post_ids[top])
+        best_scores.append(scores[top])
+    if not best_ids:
+        return []
+    ids, values = np.concatenate(best_ids), np.concatenate(best_scores)
+    order = np.argsort(-values, kind='stable')[:limit]
+    return [(int(ids[i]), float(values[i])) for i in order]
+
+
+def recommend(user, interests='', limit=10):
+    """
+    Post ids best matching the user's profile, best first.
+
+    Returns None when there is nothing to match on (no NumPy, no index or
+    an empty profile), so callers can fall back to another feed.
+    """
+    if np is None:
+        return None
+    index = load_index()
+    counts = hashed_terms(
+        {'interests': interests, 'department': user.department, 'bio': user.bio}, STUDENT_FIELDS
+    )
+    if index is None or not counts:
+        return None
+    # Over-fetch: some candidates may since have been unapproved or deleted
+    overfetch = _setting('RECOMMENDER_OVERFETCH', 3)
+    return [post_id for post_id, _ in score(index, counts, limit * overfetch)]
@@ -0,0 +1,248 @@
+"""
+Precomputed "related journeys".
+
+Two posts are related by a mix of skill overlap (Jaccard similarity of
+their normalized skill sets) and text similarity (cosine of the hashed
+word counts of their role, category and experience). Each post keeps its
+best ``RELATED_POSTS_COUNT`` neighbours in ``RelatedPost``, so the detail
+view reads them with one indexed query.
+
+Candidates come from ``PostSkill``, one row per (skill, post): the posts
+sharing the most skills with a post, at most ``RELATED_CANDIDATES`` of
+them (posts without skills fall back to recent posts of the same
+category). When a post is created or edited, ``refresh()`` recomputes its
+own neighbours and, since the score is symmetric, offers the post to each
+scored candidate, which keeps it only if it beats that candidate's weakest
+neighbour. Posts that list it but are no longer its candidates get their
+edge rescored in place. Nothing outside that neighbourhood is read or
+written.
+``manage.py rebuild_related`` recomputes everything, e.g. after imports.
+"""
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Window
+from django.db.models.functions import RowNumber
+
+from .models import Post, PostSkill, RelatedPost
+from .recommend import hashed_terms
+
+TEXT_FIELDS = {'role': 2, 'category': 1, 'experience': 1}
+SOURCE_FIELDS = ('skills', 'role', 'category', 'experience')
+SKILL_LENGTH = PostSkill._meta.get_field('skill').max_length
+# Posts whose features rebuild() keeps in memory at a time
+FEATURE_CACHE_SIZE = 20000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def skills_for(post):
+    return {
+        skill.strip().lower()[:SKILL_LENGTH]
+        for skill in (post.skills or '').split(',') if skill.strip()
+    }
+
+
+def _text_vector(post):
+    counts = hashed_terms({field: getattr(post, field) for field in TEXT_FIELDS}, TEXT_FIELDS)
+    norm = math.sqrt(sum(weight * weight for weight in counts.values())) or 1
+    return {feature: weight / norm for feature, weight in counts.items()}
+
+
+def similarity(skills, vector, other_skills, other_vector):
+    """Weighted mix of skill Jaccard and text cosine, between 0 and 1"""
+    union = skills | other_skills
+    jaccard = len(skills & other_skills) / len(union) if union else 0
+    if len(vector) > len(other_vector):
+        vector, other_vector = other_vector, vector
+    cosine = sum(weight * other_vector.get(feature, 0) for feature, weight in vector.items())
+    skill_weight = _setting('RELATED_SKILL_WEIGHT', 0.6)
+    return skill_weight * jaccard + (1 - skill_weight) * cosine
+
+
+def index_skills(post):
+    """Bring the PostSkill rows of one post up to date, writing only what changed"""
+    skills = skills_for(post)
+    existing = set(post.skill_terms.values_list('skill', flat=True))
+    if skills == existing:
+        return
+    with transaction.atomic():
+        if existing - skills:
+            post.skill_terms.filter(skill__in=existing - skills).delete()
+        PostSkill.objects.bulk_create(PostSkill(post=post, skill=skill) for skill in skills - existing)
+
+
+def candidates(post):
+    """Posts worth scoring against ``post``: those sharing the most skills"""
+    limit = _setting('RELATED_CANDIDATES', 200)
+    skills = skills_for(post)
+    if skills:
+        ids = list(
+            PostSkill.objects.filter(skill__in=skills).exclude(post_id=post.pk)
+            .values('post_id').annotate(shared=Count('id'))
+            .order_by('-shared', '-post_id').values_list('post_id', flat=True)[:limit]
+        )
+        posts = Post.objects.filter(pk__in=ids)
+    else:
+        posts = Post.objects.filter(category=post.category).exclude(pk=post.pk).order_by('-created_at')[:limit]
+    return list(posts.only('pk', *SOURCE_FIELDS))
+
+
+def _features(post, cache):
+    if cache is None:
+        return skills_for(post), _text_vector(post)
+    if post.pk not in cache:
+        if len(cache) >= FEATURE_CACHE_SIZE:
+            cache.clear()
+        cache[post.pk] = skills_for(post), _text_vector(post)
+    return cache[post.pk]
+
+
+def neighbours(post, cache=None):
+    """
+    Every scored candidate as (score, post_id), best first.
+
+    ``cache`` (a dict) keeps the features of posts seen before, so a batch
+    job doesn't re-tokenize the same popular candidates for every post.
+    """
+    skills, vector = _features(post, cache)
+    scored = []
+    for other in candidates(post):
+        score = similarity(skills, vector, *_features(other, cache))
+        if score > 0:
+            scored.append((score, other.pk))
+    scored.sort(reverse=True)
+    return scored
+
+
+def refresh(post_id):
+    """Recompute one post's neighbours and update its neighbourhood"""
+    post = Post.objects.filter(pk=post_id).only('pk', *SOURCE_FIELDS).first()
+    if post is None:
+        return
+    index_skills(post)
+    scored = neighbours(post)
+    count = _setting('RELATED_POSTS_COUNT', 5)
+    scored_ids = [other_id for _, other_id in scored]
+
+    with transaction.atomic():
+        # Edges pointing at the post carry its old score; those from candidates are re-offered below
+        RelatedPost.objects.filter(related_id=post.pk, post_id__in=scored_ids).delete()
+        _rescore_incoming(post, exclude=scored_ids)
+        RelatedPost.objects.filter(post_id=post.pk).delete()
+        RelatedPost.objects.bulk_create(
+            RelatedPost(post_id=post.pk, related_id=other_id, score=score)
+            for score, other_id in scored[:count]
+        )
+        if not scored:
+            return
+        # Offer the post to every candidate; a candidate with a full list keeps it
+        # only if it beats the weakest neighbour
+        lists = {
+            row['post_id']: row for row in
+            RelatedPost.objects.filter(post_id__in=scored_ids)
+            .values('post_id').annotate(size=Count('id'), weakest=Min('score'))
+        }
+        offers = [
+            RelatedPost(post_id=other_id, related_id=post.pk, score=score)
+            for score, other_id in scored
+            if other_id not in lists
+            or lists[other_id]['size'] < count
+            or score > lists[other_id]['weakest']
+        ]
+        RelatedPost.objects.bulk_create(offers)
+        trim([offer.post_id for offer in offers if offer.post_id in lists])
+
+
+def _rescore_incoming(post, exclude):
+    """
+    Rescore the edges to ``post`` from posts that are no longer its candidates.
+
+    They are not re-offered, so deleting them would leave those posts with
+    short lists; the score is symmetric, so it is recomputed in place. An
+    edge that no longer scores anything is dropped and its post refreshed.
+    """
+    from . import tasks
+
+    edges = list(
+        RelatedPost.objects.filter(related_id=post.pk).exclude(post_id__in=exclude)
+        .select_related('post').only('pk', 'score', 'post_id', *[f'post__{field}' for field in SOURCE_FIELDS])
+    )
+    if not edges:
+        return
+    skills, vector = skills_for(post), _text_vector(post)
+    kept, dropped = [], []
+    for edge in edges:
+        edge.score = similarity(skills, vector, skills_for(edge.post), _text_vector(edge.post))
+        (kept if edge.score > 0 else dropped).append(edge)
+    RelatedPost.objects.bulk_update(kept, ['score'])
+    if dropped:
+        RelatedPost.objects.filter(pk__in=[edge.pk for edge in dropped]).delete()
+        for edge in dropped:
+            tasks.refresh_related.delay(post_id=edge.post_id)
+
+
+def trim(post_ids):
+    """Drop neighbours beyond RELATED_POSTS_COUNT for the given posts"""
+    if not post_ids:
+        return
+    ranked = RelatedPost.objects.filter(post_id__in=post_ids).annotate(
+        rank=Window(RowNumber(), partition_by=[F('post_id')], order_by=[F('score').desc(), F('pk').desc()])
+    )
+    extra = [row.pk for row in ranked.filter(rank__gt=_setting('RELATED_POSTS_COUNT', 5)).only('pk')]
+    if extra:
+        RelatedPost.objects.filter(pk__in=extra).delete()
+
+
+def rebuild(batch_size=500, progress=None):
+    """Recompute skills and neighbours for every post; returns the number of posts"""
+    posts = Post.objects.only('pk', *SOURCE_FIELDS).order_by('pk')
+    count = _setting('RELATED_POSTS_COUNT', 5)
+    cache = {}
+    last_pk = 0
+    total = 0
+    # Skills first, so every post's candidates are complete
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            PostSkill.objects.filter(post__in=batch).delete()
+            PostSkill.objects.bulk_create(
+                [PostSkill(post_id=post.pk, skill=skill) for post in batch for skill in skills_for(post)],
+                batch_size=batch_size,
+            )
+        last_pk = batch[-1].pk
+
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            RelatedPost.objects.filter(post__in=batch).delete()
+            RelatedPost.objects.bulk_create(
+                [
+                    RelatedPost(post_id=post.pk, related_id=other_id, score=score)
+                    for post in batch for score, other_id in neighbours(post, cache)[:count]
+                ],
+                batch_size=batch_size,
+            )
+        last_pk = batch[-1].pk
+        total += len(batch)
+        if progress:
+            progress(total)
+    return total
+
+
+def related_posts(post_id):
+    """Approved neighbours of a post, best first, in one query"""
+    return (
+        RelatedPost.objects.filter(post_id=post_id, related__is_approved=True)
+        .select_related('related')
+        .only('score', 'related__id', 'related__name', 'related__role', 'related__company', 'related__category')
+        .order_by('-score')
+    )
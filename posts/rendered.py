@@ -0,0 +1,137 @@
+"""
+Pre-rendered feed entries.
+
+Serializing every post of the feed, with its comments, is most of the work
+of the list endpoint, yet posts change rarely. Each approved post's JSON is
+therefore stored in ``RenderedPost`` exactly as an anonymous visitor gets
+it, and the feed joins the stored fragments into the response: one query
+and no serializer work, and unlike a cache the fragments survive restarts.
+
+Writes that change what a post renders to (edits, likes, comments,
+approvals, deleted accounts) call ``refresh()``, which enqueues a job to
+re-render those posts, so fragments trail writes by the job latency. View
+counts move on every read, so view flushes call ``refresh_counts()``
+instead: only fragments older than ``RENDERED_COUNTS_MAX_AGE`` seconds are
+re-rendered, and cached detail responses are left to expire on their own.
+Posts without a fragment yet, and posts whose output depends
+on the viewer (``is_owner`` and ``can_delete`` of the viewer's own
+comments), are serialized on the fly. ``manage.py rebuild_rendered_posts``
+renders every post, e.g. after deploying a serializer change.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Value
+from django.utils import timezone
+
+from alumni_forum.renderers import FastJSONRenderer
+from . import caching
+from .models import Comment, Post, RenderedPost
+from .serializers import PostSerializer
+
+_renderer = FastJSONRenderer()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def render(post, request=None):
+    """JSON bytes of a post loaded with ``with_comments()``"""
+    return _renderer.render(PostSerializer(post, context={'request': request}).data)
+
+
+def rebuild(post_ids):
+    """Re-render the given posts, dropping fragments of posts no longer in the feed"""
+    post_ids = list(post_ids)
+    posts = list(Post.objects.filter(pk__in=post_ids, is_approved=True).live().with_comments())
+    now = timezone.now()
+    with transaction.atomic():
+        RenderedPost.objects.filter(post_id__in=post_ids).exclude(
+            post_id__in=[post.pk for post in posts]
+        ).delete()
+        RenderedPost.objects.bulk_create(
+            [RenderedPost(post_id=post.pk, data=render(post).decode(), rendered_at=now) for post in posts],
+            update_conflicts=True, unique_fields=['post'], update_fields=['data', 'rendered_at'],
+        )
+    caching.invalidate_feeds()
+    return len(posts)
+
+
+def refresh(post_ids):
+    """
+    Enqueue re-rendering of the given posts, ``RENDERED_POSTS_PER_JOB`` per job.
+
+    Their cached detail responses are expired right away.
+    """
+    post_ids = sorted(set(post_ids))
+    caching.invalidate_posts(post_ids)
+    _enqueue(post_ids)
+
+
+def refresh_counts(post_ids):
+    """
+    Enqueue re-rendering of those of the given posts whose fragment is older than ``RENDERED_COUNTS_MAX_AGE``.
+
+    For counters that change on every read (views): each fragment is
+    re-rendered at most once per interval, and nothing is expired.
+    """
+    cutoff = timezone.now() - timedelta(seconds=_setting('RENDERED_COUNTS_MAX_AGE', 300))
+    stale = RenderedPost.objects.filter(post_id__in=list(post_ids), rendered_at__lt=cutoff)
+    _enqueue(sorted(stale.values_list('post_id', flat=True)))
+
+
+def _enqueue(post_ids):
+    from . import tasks
+
+    size = _setting('RENDERED_POSTS_PER_JOB', 100)
+    for start in range(0, len(post_ids), size):
+        tasks.rebuild_rendered.delay(post_ids=post_ids[start:start + size])
+
+
+def rebuild_all(batch_size=200, progress=None):
+    """Render every post in the feed and drop all other fragments; returns the number of posts"""
+    RenderedPost.objects.exclude(post__is_approved=True, post__deleted_at__isnull=True).delete()
+    posts = Post.objects.filter(is_approved=True).live().order_by('pk')
+    last_pk = 0
+    total = 0
+    while True:
+        post_ids = list(posts.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+        if not post_ids:
+            break
+        total += rebuild(post_ids)
+        last_pk = post_ids[-1]
+        if progress:
+            progress(total)
+    return total
+
+
+def feed_json(posts, request):
+    """
+    The JSON array of ``posts`` (a queryset in feed order) for ``request``, as bytes.
+
+    Stored fragments are used where present; any other posts are serialized
+    with one more query and a prefetch; posts purged between the two
+    queries are left out. Staff see ``can_delete`` on every
+    comment, so their feed is better served by the serializer directly.
+    """
+    user = request.user
+    if user.is_authenticated:
+        own = Exists(Comment.objects.filter(post=OuterRef('pk'), user_id=user.pk))
+    else:
+        own = Value(False)
+    rows = list(posts.annotate(own_comments=own).values_list('pk', 'rendered__data', 'own_comments'))
+
+    pending = {pk for pk, data, own_comments in rows if data is None or own_comments}
+    live = {}
+    if pending:
+        live = {
+            post.pk: render(post, request)
+            for post in Post.objects.filter(pk__in=pending).with_comments()
+        }
+    parts = [
+        live[pk] if pk in pending else data.encode()
+        for pk, data, _ in rows if pk in live or pk not in pending
+    ]
+    return b'[' + b','.join(parts) + b']'
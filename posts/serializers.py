@@ -1,9 +1,12 @@
+from django.conf import settings
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Post, Comment
+from alumni_forum.projection import ProjectedFieldsMixin
+from .models import Post, Comment, RelatedPost
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(ProjectedFieldsMixin, serializers.ModelSerializer):
+    field_columns = {'author_name': ['user__username'], 'is_owner': ['user'], 'can_delete': ['user']}
     author_name = serializers.CharField(source='user.username', read_only=True)
     is_owner = serializers.SerializerMethodField()
     can_delete = serializers.SerializerMethodField()
@@ -11,33 +14,51 @@ class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = [
-            'id', 'post', 'user', 'author_name', 'author_role', 
+            'id', 'post', 'parent', 'depth', 'user', 'author_name', 'author_role', 
             'content', 'created_at', 'updated_at', 'is_edited',
             'is_owner', 'can_delete'
         ]
-        read_only_fields = ['id', 'user', 'created_at', 'updated_at', 'is_edited']
+        read_only_fields = ['id', 'parent', 'depth', 'user', 'created_at', 'updated_at', 'is_edited']
 
     def get_is_owner(self, obj):
         """Check if current user is the comment owner"""
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.user == request.user
+            return obj.user_id == request.user.pk
         return False
 
     def get_can_delete(self, obj):
         """Check if current user can delete the comment (owner or admin)"""
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.user == request.user or request.user.is_staff
+            return obj.user_id == request.user.pk or request.user.is_staff
         return False
 
 
+class ThreadSerializer(CommentSerializer):
+    """A top-level comment with the first replies of its thread"""
+    replies = CommentSerializer(source='thread_replies', many=True, read_only=True)
+    reply_count = serializers.IntegerField(read_only=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ['replies', 'reply_count']
+
+
 class CommentCreateSerializer(serializers.ModelSerializer):
-    """Serializer for creating comments"""
+    """Serializer for creating comments (and replies, with ``parent``)"""
     
     class Meta:
         model = Comment
-        fields = ['post', 'author_role', 'content']
+        fields = ['post', 'parent', 'author_role', 'content']
+
+    def validate(self, attrs):
+        parent = attrs.get('parent')
+        if parent is not None:
+            if parent.post_id != attrs['post'].pk:
+                raise serializers.ValidationError({'parent': 'Replies must be on the same post.'})
+            if parent.depth >= Comment.MAX_DEPTH:
+                raise serializers.ValidationError({'parent': 'This thread is nested too deeply.'})
+        return attrs
 
     def create(self, validated_data):
         # User is automatically set from the request
@@ -57,7 +78,12 @@ class CommentUpdateSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(ProjectedFieldsMixin, serializers.ModelSerializer):
+    # Comments come from a prefetch and their count from it or from with_comment_counts()
+    field_columns = {
+        'author_name': ['user__username'], 'category_display': ['category'], 'skills_list': ['skills'],
+        'comments': [], 'comments_count': [],
+    }
     comments = CommentSerializer(many=True, read_only=True)
     comments_count = serializers.SerializerMethodField()
     skills_list = serializers.SerializerMethodField()
@@ -69,18 +95,41 @@ class PostSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'author_name', 'email', 'role', 'category', 'category_display',
             'company', 'experience', 'skills', 'skills_list',
-            'graduation_year', 'linkedin_url', 'likes',
-            'created_at', 'updated_at', 'comments', 'comments_count'
+            'graduation_year', 'linkedin_url', 'likes', 'views', 'unique_viewers',
+            'is_approved', 'duplicate_of', 'created_at', 'updated_at', 'comments', 'comments_count'
+        ]
+        read_only_fields = [
+            'author_name', 'created_at', 'updated_at', 'likes', 'views', 'unique_viewers',
+            'is_approved', 'duplicate_of'
         ]
-        read_only_fields = ['author_name', 'created_at', 'updated_at', 'likes']
 
     def get_comments_count(self, obj):
+        # Prefetched comments may be only the first few, so an annotated count comes first
+        if hasattr(obj, 'comments_total'):
+            return obj.comments_total
+        # Reuse prefetched comments instead of issuing a COUNT per post
+        if 'comments' in getattr(obj, '_prefetched_objects_cache', {}):
+            return len(obj.comments.all())
         return obj.comments.count()
 
     def get_skills_list(self, obj):
         return obj.get_skills_list()
 
 
+class RelatedPostSerializer(serializers.ModelSerializer):
+    """Compact summary of a related journey"""
+    id = serializers.IntegerField(source='related.id')
+    name = serializers.CharField(source='related.name')
+    role = serializers.CharField(source='related.role')
+    company = serializers.CharField(source='related.company')
+    category = serializers.CharField(source='related.category')
+
+    class Meta:
+        model = RelatedPost
+        fields = ['id', 'name', 'role', 'company', 'category', 'score']
+        read_only_fields = fields
+
+
 class PostCreateSerializer(serializers.ModelSerializer):
     """Simplified serializer for creating posts"""
     
@@ -89,4 +138,13 @@ class PostCreateSerializer(serializers.ModelSerializer):
         fields = [
             'name', 'email', 'role', 'category', 'company',
             'experience', 'skills', 'graduation_year', 'linkedin_url'
-        ]
\ No newline at end of file
+        ]
+
+
+class ModerationSerializer(serializers.Serializer):
+    """Batch of post ids to approve or reject"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.MODERATION_MAX_BATCH
+    )
@@ -0,0 +1,122 @@
+from django.core.signals import request_finished
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from . import caching, rendered, stats, tasks, viewcounts
+from .moderation import posts_moderated
+from .models import Post, Comment, RelatedPost
+from .ranking import hot_score
+
+
+# Sent by PostLikeView after a like has been recorded (kwargs: post, user)
+post_liked = Signal()
+
+
+@receiver(pre_save, sender=Post)
+def clear_rejection_on_approval(sender, instance, **kwargs):
+    """Approving a post in the admin (or anywhere else) takes it out of the rejected state"""
+    if instance.is_approved:
+        instance.is_rejected = False
+
+
+@receiver(pre_save, sender=Post)
+def set_initial_hot_score(sender, instance, **kwargs):
+    """Give new posts a score so they show up in the trending feed right away"""
+    if instance._state.adding and not instance.hot_score:
+        instance.hot_score = hot_score(instance.likes, 0, timezone.now())
+
+
+@receiver(post_liked)
+def bump_hot_score_on_like(sender, post, **kwargs):
+    # Scores are recomputed by a worker, off the request path
+    tasks.refresh_hot_score.delay(post_id=post.pk)
+
+
+@receiver(post_save, sender=Comment)
+def bump_hot_score_on_comment(sender, instance, created, **kwargs):
+    if created:
+        tasks.refresh_hot_score.delay(post_id=instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def drop_hot_score_on_comment_delete(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Post):
+        # The post itself is being deleted, no score to maintain
+        return
+    tasks.refresh_hot_score.delay(post_id=instance.post_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_stats_values(sender, instance, **kwargs):
+    """Read the stored row before an update so its stats contribution can be moved"""
+    if not instance._state.adding:
+        instance._stats_previous = stats.post_values(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def update_stats_on_post_save(sender, instance, created, **kwargs):
+    old = None if created else getattr(instance, '_stats_previous', None)
+    new = stats.snapshot(instance) or stats.post_values(instance.pk)
+    stats.record_post_change(
+        old, new,
+        comments_total=0 if created else (lambda: instance.comments.count())
+    )
+
+
+@receiver(post_delete, sender=Post)
+def update_stats_on_post_delete(sender, instance, **kwargs):
+    # Cascaded comments are subtracted by their own post_delete handler
+    old = stats.snapshot(instance)
+    if old is not None:
+        stats.record_post_change(old, None, comments_total=0)
+
+
+@receiver(post_save, sender=Comment)
+def update_stats_on_comment(sender, instance, created, **kwargs):
+    if created:
+        values = stats.post_values(instance.post_id)
+        if values:
+            stats.apply_deltas(stats.post_buckets(values), comments=1)
+
+
+@receiver(post_delete, sender=Comment)
+def update_stats_on_comment_delete(sender, instance, **kwargs):
+    values = stats.post_values(instance.post_id)
+    if values:
+        stats.apply_deltas(stats.post_buckets(values), comments=-1)
+
+
+@receiver(post_save, sender=Post)
+def refresh_rendered_post(sender, instance, created, **kwargs):
+    # Pending submissions are not in the feed yet; approval refreshes them
+    if instance.is_approved or not created:
+        rendered.refresh([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def refresh_rendered_on_comment(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Post):
+        return
+    rendered.refresh([instance.post_id])
+
+
+@receiver(posts_moderated)
+def refresh_rendered_on_moderation(sender, post_ids, approved, **kwargs):
+    # Approved posts join the feeds and rejected or deleted ones leave them now, not after the re-render;
+    # the latter are evicted, as even a stale read must not show them again
+    caching.invalidate_feeds(evict=not approved)
+    neighbours = list(RelatedPost.objects.filter(related_id__in=post_ids).values_list('post_id', flat=True))
+    if approved:
+        # ...and the related journeys of their neighbours
+        caching.invalidate_posts(neighbours)
+    else:
+        caching.invalidate_posts([*post_ids, *neighbours], evict=True)
+    rendered.refresh(post_ids)
+
+
+@receiver(request_finished)
+def flush_view_counts(sender, **kwargs):
+    # After the response has gone out; only does work once the buffer is due
+    viewcounts.flush_quietly()
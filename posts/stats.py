@@ -0,0 +1,331 @@
+"""
+Materialized forum statistics.
+
+Every approved post contributes to a handful of ForumStat buckets (overall
+total, its category, graduation year, company and author). The signal
+handlers in posts.signals apply +/- deltas to those buckets as posts,
+comments and likes change, so serving the stats endpoint never has to run
+a GROUP BY over the posts, comments or likes tables.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Lower, Trim
+from django.utils import timezone
+
+from alumni_forum.cache import cached, invalidate
+from .models import Post, Comment, ForumStat
+
+
+STATS_CACHE_KEY = 'posts:forum-stats'
+
+# Post attributes a bucket depends on; a change to any of them moves the post
+TRACKED_FIELDS = ('is_approved', 'category', 'graduation_year', 'company', 'user_id', 'likes', 'views')
+
+CATEGORY_LABELS = dict(Post.CATEGORY_CHOICES)
+
+
+def normalize_company(company):
+    return (company or '').strip().lower()[:200]
+
+
+def post_buckets(values):
+    """Return the (kind, key, label) buckets a post contributes to"""
+    if not values['is_approved']:
+        return []
+
+    buckets = [
+        ('total', '', ''),
+        ('category', values['category'], CATEGORY_LABELS.get(values['category'], values['category'])),
+    ]
+    if values['graduation_year']:
+        year = str(values['graduation_year'])
+        buckets.append(('graduation_year', year, year))
+    company_key = normalize_company(values['company'])
+    if company_key:
+        buckets.append(('company', company_key, values['company'].strip()[:200]))
+    if values['user_id']:
+        # The username label is looked up lazily, only when the row is created
+        buckets.append(('author', str(values['user_id']), None))
+    return buckets
+
+
+def snapshot(post):
+    """
+    Capture the tracked values of a loaded post without touching the database.
+
+    Returns None when one of the fields is deferred; callers then fall back
+    to ``post_values``.
+    """
+    try:
+        return {name: post.__dict__[name] for name in TRACKED_FIELDS}
+    except KeyError:
+        return None
+
+
+def post_values(post_id):
+    """Load the tracked values of a post straight from the database"""
+    return Post.objects.filter(pk=post_id).values(*TRACKED_FIELDS).first()
+
+
+COUNTERS = ('posts', 'comments', 'likes', 'views')
+
+
+def _resolve_labels(rows):
+    """Fill in the labels of author buckets that only know the user id (one query)"""
+    authors = [row for row in rows if row.label is None]
+    if not authors:
+        return
+    usernames = dict(
+        get_user_model().objects.filter(pk__in=[row.key for row in authors]).values_list('pk', 'username')
+    )
+    for row in authors:
+        row.label = usernames.get(int(row.key), '')
+
+
+def _increment(rows, now):
+    """Add the counters of ``rows`` to the matching stored buckets in one UPDATE"""
+    condition = Q()
+    for row in rows:
+        condition |= Q(kind=row.kind, key=row.key)
+    expressions = {}
+    for name in COUNTERS:
+        whens = [
+            When(kind=row.kind, key=row.key, then=Value(getattr(row, name)))
+            for row in rows if getattr(row, name)
+        ]
+        if whens:
+            expressions[name] = F(name) + Case(*whens, default=Value(0), output_field=IntegerField())
+    return ForumStat.objects.filter(condition).update(updated_at=now, **expressions)
+
+
+def add_to_buckets(rows):
+    """
+    Add the counters of unsaved ForumStat ``rows`` (deltas, one row per bucket) to the stored buckets.
+
+    However many buckets are involved this is one UPDATE; buckets that do
+    not exist yet cost one read, one INSERT and a second UPDATE.
+    """
+    rows = [row for row in rows if any(getattr(row, name) for name in COUNTERS)]
+    if not rows:
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        if _increment(rows, now) == len(rows):
+            return
+        condition = Q()
+        for row in rows:
+            condition |= Q(kind=row.kind, key=row.key)
+        existing = set(ForumStat.objects.filter(condition).values_list('kind', 'key'))
+        missing = [row for row in rows if (row.kind, row.key) not in existing]
+        _resolve_labels(missing)
+        # Created empty, so a row another request created first just gets the deltas too
+        ForumStat.objects.bulk_create(
+            [ForumStat(kind=row.kind, key=row.key, label=row.label) for row in missing], ignore_conflicts=True
+        )
+        _increment(missing, now)
+
+
+def apply_deltas(buckets, posts=0, comments=0, likes=0, views=0):
+    """Add the given deltas to every bucket, creating missing rows"""
+    add_to_buckets([
+        ForumStat(kind=kind, key=key, label=label, posts=posts, comments=comments, likes=likes, views=views)
+        for kind, key, label in buckets
+    ])
+
+
+def record_post_change(old, new, comments_total=None):
+    """
+    Move a post's contribution from its ``old`` snapshot to its ``new`` one.
+
+    ``old`` is None for newly created posts, ``new`` is None for deleted
+    posts. Comment counts only need to move when the buckets themselves
+    change, in which case ``comments_total`` is looked up lazily.
+    """
+    old_buckets = post_buckets(old) if old else []
+    new_buckets = post_buckets(new) if new else []
+
+    if old_buckets == new_buckets:
+        if old and new:
+            apply_deltas(
+                new_buckets, likes=new['likes'] - old['likes'], views=new['views'] - old['views']
+            )
+        return
+
+    if callable(comments_total):
+        comments_total = comments_total()
+    comments_total = comments_total or 0
+    if old_buckets:
+        apply_deltas(
+            old_buckets, posts=-1, comments=-comments_total, likes=-old['likes'], views=-old['views']
+        )
+    if new_buckets:
+        apply_deltas(
+            new_buckets, posts=1, comments=comments_total, likes=new['likes'], views=new['views']
+        )
+
+
+GROUPINGS = [
+    ('total', None, None),
+    ('category', 'category', 'post__category'),
+    ('graduation_year', 'graduation_year', 'post__graduation_year'),
+    ('company', Lower(Trim('company')), Lower(Trim('post__company'))),
+    ('author', 'user_id', 'post__user_id'),
+]
+
+
+def group_counts(posts):
+    """
+    Bucket totals for a queryset of posts, regardless of their approval.
+
+    Returns ``{(kind, key): ForumStat}`` with posts, likes, views, comments and
+    label filled in, one GROUP BY per bucket kind.
+    """
+    # An explicit ordering (e.g. from the admin changelist) would split the groups
+    posts = posts.order_by()
+    comments = Comment.objects.filter(post__in=posts)
+    usernames = dict(
+        get_user_model().objects.filter(posts__in=posts).distinct().values_list('pk', 'username')
+    )
+    company_labels = {}
+    for company in posts.exclude(company='').values_list('company', flat=True).distinct():
+        company_labels.setdefault(normalize_company(company), company.strip()[:200])
+
+    rows = {}
+    for kind, post_expr, comment_expr in GROUPINGS:
+        if isinstance(post_expr, str):
+            post_expr, comment_expr = F(post_expr), F(comment_expr)
+        if post_expr is None:
+            post_groups = [
+                ('', posts.aggregate(posts=Count('id'), likes=Sum('likes'), views=Sum('views')))
+            ]
+            comment_groups = [('', {'comments': comments.count()})]
+        else:
+            post_groups = (
+                (row['bucket'], row) for row in
+                posts.values(bucket=post_expr)
+                .annotate(posts=Count('id'), likes=Sum('likes'), views=Sum('views'))
+            )
+            comment_groups = (
+                (row['bucket'], row) for row in
+                comments.values(bucket=comment_expr).annotate(comments=Count('id'))
+            )
+
+        for bucket, row in post_groups:
+            if bucket in (None, '') and kind != 'total':
+                continue
+            key = str(bucket)[:200]
+            rows[(kind, key)] = ForumStat(
+                kind=kind, key=key, posts=row['posts'] or 0, likes=row['likes'] or 0,
+                views=row['views'] or 0, label=_rebuild_label(kind, key, usernames, company_labels),
+            )
+        for bucket, row in comment_groups:
+            stat = rows.get((kind, str(bucket)[:200] if bucket is not None else ''))
+            if stat is not None:
+                stat.comments = row['comments']
+    return rows
+
+
+def rebuild():
+    """Recompute every bucket from the posts and comments tables"""
+    rows = group_counts(Post.objects.filter(is_approved=True))
+    with transaction.atomic():
+        ForumStat.objects.all().delete()
+        ForumStat.objects.bulk_create(rows.values(), batch_size=1000)
+    invalidate(STATS_CACHE_KEY)
+    return len(rows)
+
+
+def record_bulk_approval(posts, approved):
+    """
+    Account for flipping the approval of every post in ``posts`` at once.
+
+    Call before the bulk UPDATE, inside the same transaction. Only posts
+    whose approval actually changes are counted, summed per bucket and
+    written with one UPDATE, so the cost does not depend on how many posts,
+    authors or companies the batch holds.
+    """
+    changing = posts.filter(is_approved=not approved)
+    sign = 1 if approved else -1
+    rows = [stat for stat in group_counts(changing).values() if stat.posts]
+    for stat in rows:
+        for name in COUNTERS:
+            setattr(stat, name, sign * getattr(stat, name))
+    add_to_buckets(rows)
+    invalidate(STATS_CACHE_KEY)
+
+
+def record_views(views):
+    """
+    Add ``{post_id: views}`` to the buckets of the approved posts among them.
+
+    Views are summed per bucket first, so a batch of any size costs one
+    read of the posts and one UPDATE of the buckets.
+    """
+    per_bucket = {}
+    posts = Post.objects.filter(pk__in=list(views), is_approved=True)
+    for values in posts.values('pk', *TRACKED_FIELDS):
+        for kind, key, _ in post_buckets(values):
+            per_bucket[(kind, key)] = per_bucket.get((kind, key), 0) + views[values['pk']]
+    rows = [ForumStat(kind=kind, key=key, views=count) for (kind, key), count in per_bucket.items() if count]
+    if rows:
+        # Buckets exist for every approved post, so rows are never missing here
+        _increment(rows, timezone.now())
+
+
+def _rebuild_label(kind, key, usernames, company_labels):
+    if kind == 'category':
+        return CATEGORY_LABELS.get(key, key)
+    if kind == 'company':
+        return company_labels.get(key, key)
+    if kind == 'author':
+        return usernames.get(int(key), '')
+    return key
+
+
+def _rows(queryset, key_name, cast=str):
+    return [
+        {
+            key_name: cast(row.key), 'label': row.label, 'posts': row.posts,
+            'comments': row.comments, 'likes': row.likes, 'views': row.views,
+        }
+        for row in queryset
+    ]
+
+
+def build_payload():
+    """Read the summary tables into the stats response (three queries)"""
+    limit = getattr(settings, 'STATS_TOP_LIMIT', 10)
+    small = list(ForumStat.objects.filter(kind__in=['total', 'category', 'graduation_year']))
+
+    total = next((row for row in small if row.kind == 'total'), None)
+    years = sorted(
+        (row for row in small if row.kind == 'graduation_year'),
+        key=lambda row: int(row.key), reverse=True
+    )
+    return {
+        'totals': {
+            'posts': total.posts if total else 0,
+            'comments': total.comments if total else 0,
+            'likes': total.likes if total else 0,
+            'views': total.views if total else 0,
+        },
+        'categories': _rows([row for row in small if row.kind == 'category' and row.posts], 'category'),
+        'graduation_years': _rows([row for row in years if row.posts], 'graduation_year', int),
+        'top_companies': _rows(
+            ForumStat.objects.filter(kind='company', posts__gt=0).order_by('-posts', 'key')[:limit],
+            'company'
+        ),
+        'active_alumni': _rows(
+            ForumStat.objects.filter(kind='author', posts__gt=0).order_by('-posts', 'key')[:limit],
+            'user_id', int
+        ),
+    }
+
+
+def get_stats():
+    """Return the stats payload, served from the cache when warm"""
+    return cached(
+        STATS_CACHE_KEY, build_payload, getattr(settings, 'STATS_CACHE_TIMEOUT', 60), name='forum-stats'
+    )
@@ -0,0 +1,29 @@
+from jobs.queue import task
+
+from . import deletion, ranking, related, rendered
+
+
+@task(max_attempts=5, retry_delay=10)
+def refresh_hot_score(post_id):
+    """Recompute one post's trending score after a like or comment"""
+    ranking.refresh_hot_score(post_id)
+
+
+@task(max_attempts=3, retry_delay=60)
+def refresh_related(post_id):
+    """Recompute a post's related journeys and offer it to its neighbours"""
+    related.refresh(post_id)
+
+
+@task(max_attempts=5, retry_delay=60)
+def purge_post(post_id):
+    """Delete a tombstoned post's comments, likes and row, a chunk at a time"""
+    if deletion.purge_post(post_id) is None:
+        # Chunk budget used up; continue in a fresh job so others get a turn
+        purge_post.delay(post_id=post_id)
+
+
+@task(max_attempts=3, retry_delay=30)
+def rebuild_rendered(post_ids):
+    """Re-render the stored feed JSON of a batch of posts"""
+    rendered.rebuild(post_ids)
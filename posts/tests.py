@@ -1,3 +1,1241 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.signals import post_delete
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from accounts.models import User
+from alumni_forum.hyperloglog import hash_value
+from alumni_forum.paginators import EstimatedCountPaginator
+from alumni_forum.renderers import FastJSONRenderer
+from alumni_forum.testing import QueryBudgetMixin
+from . import urls as posts_urls
+from jobs.models import Job
+from .models import (
+    Post, PostQuerySet, Comment, ForumStat, Like, PostSignature, PostViewDay, RelatedPost, RenderedPost,
+)
+from .serializers import PostSerializer
+from . import caching, dedupe, deletion, moderation, recommend, related, rendered, stats, threads, viewcounts
+from .ranking import hot_score, refresh_hot_score
+
+
+class TrendingFeedTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.list_url = reverse('post-list-create')
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com',
+            password='testpass123', role='alumni'
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com',
+            password='testpass123', role='student'
+        )
+        self.old_post = Post.objects.create(
+            user=self.alumni, name='Old', role='Engineer', experience='Old journey'
+        )
+        self.new_post = Post.objects.create(
+            user=self.alumni, name='New', role='Engineer', experience='New journey'
+        )
+        Post.objects.filter(pk=self.old_post.pk).update(
+            created_at=timezone.now() - timedelta(hours=12)
+        )
+        refresh_hot_score(self.old_post.pk)
+
+    def test_hot_score_decays_with_age(self):
+        """Same engagement scores lower the older the post is"""
+        now = timezone.now()
+        fresh = hot_score(10, 2, now - timedelta(hours=1), now)
+        stale = hot_score(10, 2, now - timedelta(hours=48), now)
+        self.assertGreater(fresh, stale)
+        self.assertEqual(hot_score(10, 2, now - timedelta(days=365), now), 0)
+
+    def test_trending_feed_orders_by_score(self):
+        """Engagement on an older post can lift it above a newer one"""
+        self.client.force_authenticate(user=self.student)
+        for _ in range(50):
+            self.client.post(reverse('post-like', args=[self.old_post.pk]))
+        call_command('run_worker', once=True, concurrency=1, stdout=StringIO())
+
+        response = self.client.get(self.list_url, {'sort': 'trending'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.json()], [self.old_post.pk, self.new_post.pk])
+
+        response = self.client.get(self.list_url)
+        self.assertEqual([p['id'] for p in response.json()], [self.new_post.pk, self.old_post.pk])
+
+    def test_comment_bumps_hot_score(self):
+        """Commenting refreshes the stored score of the post"""
+        before = Post.objects.get(pk=self.old_post.pk).hot_score
+        Comment.objects.create(post=self.old_post, user=self.student, content='Thanks!')
+        self.assertEqual(Post.objects.get(pk=self.old_post.pk).hot_score, before)
+        call_command('run_worker', once=True, concurrency=1, stdout=StringIO())
+        self.assertGreater(Post.objects.get(pk=self.old_post.pk).hot_score, before)
+
+    def test_update_trending_command(self):
+        """Batch recompute refreshes every post in the window"""
+        Post.objects.update(hot_score=0)
+        call_command('update_trending', batch_size=1, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(hot_score=0).exists())
+
+
+class ForumStatsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.stats_url = reverse('forum-stats')
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com',
+            password='testpass123', role='alumni'
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com',
+            password='testpass123', role='student'
+        )
+        self.post = Post.objects.create(
+            user=self.alumni, name='A', role='Engineer', category='web-developer',
+            company='Google ', graduation_year=2020, experience='Journey'
+        )
+        Post.objects.create(
+            user=self.alumni, name='B', role='Engineer', category='tester',
+            company='google', graduation_year=2021, experience='Journey'
+        )
+        Comment.objects.create(post=self.post, user=self.student, content='Nice')
+        self.client.force_authenticate(user=self.student)
+        self.client.post(reverse('post-like', args=[self.post.pk]))
+
+    def _snapshot(self):
+        return sorted(ForumStat.objects.values_list('kind', 'key', 'posts', 'comments', 'likes'))
+
+    def test_incremental_stats_match_rebuild(self):
+        """Signal-maintained rows equal a full GROUP BY rebuild"""
+        incremental = self._snapshot()
+        stats.rebuild()
+        self.assertEqual(incremental, self._snapshot())
+        self.assertIn(('company', 'google', 2, 1, 1), incremental)
+
+    def test_stats_endpoint(self):
+        """Endpoint reads only the summary table and is cached"""
+        with self.assertNumQueries(3):
+            response = self.client.get(self.stats_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['totals'], {'posts': 2, 'comments': 1, 'likes': 1, 'views': 0})
+        self.assertEqual(response.data['top_companies'][0]['posts'], 2)
+        self.assertEqual(response.data['active_alumni'][0]['label'], 'alumni')
+
+        with self.assertNumQueries(0):
+            self.client.get(self.stats_url)
+
+    def test_stats_follow_edits_and_deletes(self):
+        """Moving or deleting a post moves its counters"""
+        self.post.refresh_from_db()
+        self.post.category = 'tester'
+        self.post.save()
+        tester = ForumStat.objects.get(kind='category', key='tester')
+        self.assertEqual((tester.posts, tester.comments, tester.likes), (2, 1, 1))
+
+        self.post.delete()
+        total = ForumStat.objects.get(kind='total')
+        self.assertEqual((total.posts, total.comments, total.likes), (1, 0, 0))
+
+
+class SeedAndBenchmarkTestCase(TestCase):
+    def test_seed_forum_and_benchmark_report(self):
+        """Seeded data can be benchmarked into a JSON report"""
+        call_command(
+            'seed_forum', users=20, posts=30, comments=60, likes=40, batch_size=7,
+            stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 60)
+        self.assertEqual(sum(Post.objects.values_list('likes', flat=True)), 40)
+        self.assertEqual(ForumStat.objects.get(kind='total').comments, 60)
+        # What the signals skipped by bulk_create would have built
+        self.assertEqual(PostSignature.objects.count(), 30)
+        self.assertTrue(RelatedPost.objects.exists())
+        self.assertEqual(
+            RenderedPost.objects.count(), Post.objects.filter(is_approved=True, deleted_at__isnull=True).count()
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command(
+                'run_benchmarks', iterations=2, warmup=0, output=output,
+                scenarios=['feed_category', 'comment_post', 'login', 'like_burst'],
+                stdout=StringIO()
+            )
+            with open(output) as handle:
+                report = json.load(handle)
+
+        self.assertEqual(report['rows']['posts'], 30)
+        self.assertEqual(report['scenarios']['login']['status_codes'], [200])
+        self.assertEqual(report['scenarios']['comment_post']['status_codes'], [201])
+        self.assertIn('p95', report['scenarios']['feed_category']['latency_ms'])
+        self.assertEqual(report['renderers']['drf']['bytes'], report['renderers']['fast']['bytes'])
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    query_budgets = {
+        ('post-list-create', 'GET'): 3,
+        ('post-list-create', 'POST'): 11,
+        ('post-detail', 'GET'): 3,
+        ('post-detail', 'PATCH'): 17,
+        ('post-detail', 'DELETE'): 13,
+        ('post-like', 'GET'): 1,
+        ('post-like', 'POST'): 8,
+        ('post-view', 'POST'): 0,
+        ('forum-stats', 'GET'): 3,
+        ('comment-list-create', 'GET'): 2,
+        ('comment-list-create', 'POST'): 12,
+        ('comment-threads', 'GET'): 2,
+        ('comment-replies', 'GET'): 2,
+        ('comment-detail', 'GET'): 1,
+        ('comment-detail', 'PATCH'): 3,
+        ('comment-detail', 'DELETE'): 10,
+        ('user-comments', 'GET'): 1,
+        ('post-recommended', 'GET'): 2,
+        ('post-batch', 'GET'): 2,
+        ('moderation-queue', 'GET'): 2,
+        ('moderation-approve', 'POST'): 22,
+        ('moderation-reject', 'POST'): 19,
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com', password='testpass123', role='alumni'
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password='testpass123'
+        )
+        self.post = self.make_post()
+        self.comment = Comment.objects.create(post=self.post, user=self.student, content='Hi')
+        self.client.force_authenticate(user=self.student)
+        index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(index_dir.cleanup)
+        self.enterContext(override_settings(RECOMMENDER_INDEX_DIR=index_dir.name))
+
+    def make_post(self):
+        return Post.objects.create(
+            user=self.alumni, name='Alumni', role='Engineer', category='tester',
+            company='Acme', graduation_year=2020, experience='Journey', skills='Python, SQL'
+        )
+
+    def grow(self, posts=3, comments=3):
+        """Add posts, each with comments from several users"""
+        for index in range(posts):
+            post = self.make_post()
+            for number in range(comments):
+                author = User.objects.create_user(
+                    username=f'user-{post.pk}-{number}', email=f'{post.pk}-{number}@example.com',
+                    password='testpass123'
+                )
+                Comment.objects.create(post=post, user=author, content='Question')
+                Comment.objects.create(post=self.post, user=author, content='Question')
+                Comment.objects.create(post=self.post, user=author, parent=self.comment, content='Reply')
+                Comment.objects.create(post=post, user=self.student, content='Mine')
+
+    def batch_url(self, **params):
+        # Every post grow() may add, without a query of its own
+        ids = ','.join(str(pk) for pk in range(self.post.pk, self.post.pk + 50))
+        return reverse('post-batch') + '?' + urlencode({'ids': ids, **params})
+
+    def test_every_url_has_a_budget(self):
+        self.assertBudgetsCover(posts_urls)
+
+    def test_read_endpoints_do_not_scale_with_data(self):
+        """List and detail endpoints run a fixed number of queries"""
+        reads = [
+            ('post-list-create', lambda: reverse('post-list-create')),
+            ('post-detail', lambda: reverse('post-detail', args=[self.post.pk])),
+            ('comment-list-create', lambda: reverse('comment-list-create', args=[self.post.pk])),
+            ('comment-threads', lambda: reverse('comment-threads', args=[self.post.pk])),
+            ('comment-replies', lambda: reverse('comment-replies', args=[self.post.pk, self.comment.pk])),
+            ('user-comments', lambda: reverse('user-comments')),
+            ('post-recommended', lambda: reverse('post-recommended')),
+            ('post-batch', lambda: self.batch_url(comments=2)),
+        ]
+        for url_name, url in reads:
+            with self.subTest(url_name):
+                self.assertQueriesDoNotScale(
+                    url_name, 'GET', lambda: self.client.get(url()), self.grow
+                )
+
+    def test_single_object_endpoints(self):
+        post_url = reverse('post-detail', args=[self.post.pk])
+        comment_url = reverse('comment-detail', args=[self.post.pk, self.comment.pk])
+        like_url = reverse('post-like', args=[self.post.pk])
+
+        self.assertQueryBudget('forum-stats', 'GET', lambda: self.client.get(reverse('forum-stats')))
+        self.assertQueryBudget('post-like', 'GET', lambda: self.client.get(like_url))
+        self.assertQueryBudget('post-like', 'POST', lambda: self.client.post(like_url))
+        self.assertQueryBudget(
+            'post-view', 'POST', lambda: self.client.post(reverse('post-view', args=[self.post.pk]))
+        )
+        self.assertQueryBudget('comment-detail', 'GET', lambda: self.client.get(comment_url))
+        self.assertQueryBudget(
+            'comment-detail', 'PATCH',
+            lambda: self.client.patch(comment_url, {'content': 'Edited'}, format='json')
+        )
+        self.assertQueryBudget(
+            'comment-list-create', 'POST',
+            lambda: self.client.post(
+                reverse('comment-list-create', args=[self.post.pk]), {'content': 'New'}, format='json'
+            )
+        )
+        self.assertQueryBudget('comment-detail', 'DELETE', lambda: self.client.delete(comment_url))
+
+        self.client.force_authenticate(user=self.alumni)
+        self.assertQueryBudget(
+            'post-list-create', 'POST',
+            lambda: self.client.post(reverse('post-list-create'), {
+                'name': 'Alumni', 'role': 'Engineer', 'category': 'tester', 'experience': 'Journey'
+            }, format='json')
+        )
+        self.assertQueryBudget(
+            'post-detail', 'PATCH',
+            lambda: self.client.patch(post_url, {'company': 'Initech'}, format='json')
+        )
+        self.assertQueryBudget('post-detail', 'DELETE', lambda: self.client.delete(post_url))
+
+
+class RecommendationTestCase(TestCase):
+    def setUp(self):
+        index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(index_dir.cleanup)
+        self.enterContext(override_settings(RECOMMENDER_INDEX_DIR=index_dir.name))
+        self.client = APIClient()
+        self.url = reverse('post-recommended')
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com', password='testpass123', role='alumni'
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password='testpass123',
+            department='Computer Science', bio='I enjoy testing and automation with Selenium'
+        )
+        self.backend = self.make_post('Backend Engineer', 'software-engineer', 'Python, Django, SQL')
+        self.qa = self.make_post('QA Tester', 'tester', 'Selenium, Test automation')
+        self.mobile = self.make_post('iOS Developer', 'mobile-developer', 'Swift, Xcode')
+        self.client.force_authenticate(user=self.student)
+
+    def make_post(self, role, category, skills):
+        return Post.objects.create(
+            user=self.alumni, name='Alumni', role=role, category=category,
+            skills=skills, experience=f'My path to becoming a {role}'
+        )
+
+    def recommended(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.data]
+
+    @skipUnless(recommend.np, 'NumPy is not installed')
+    def test_matches_profile_and_interests(self):
+        call_command('update_recommendations', stdout=StringIO())
+        self.assertEqual(self.recommended()[0], self.qa.pk)
+        self.assertEqual(self.recommended(interests='python django')[0], self.backend.pk)
+        self.assertEqual(self.recommended(interests='swift', limit=1), [self.mobile.pk])
+
+    @skipUnless(recommend.np, 'NumPy is not installed')
+    def test_incremental_segments_and_merge(self):
+        """Edited posts go into a new segment that hides their old rows"""
+        self.assertEqual(recommend.update_index(), 3)
+        self.assertEqual(recommend.update_index(), 0)
+        self.mobile.skills = 'Selenium, Appium'
+        self.mobile.save()
+        self.assertEqual(recommend.update_index(), 1)
+        self.assertEqual(len(recommend._read_manifest(recommend.index_dir())['segments']), 2)
+
+        ranked = self.recommended()
+        self.assertEqual(len(ranked), len(set(ranked)))
+        self.assertIn(self.mobile.pk, ranked[:2])
+
+        self.backend.delete()
+        recommend.merge_segments()
+        index = recommend.load_index()
+        self.assertEqual(len(index.segments), 1)
+        self.assertEqual(sorted(index.segments[0].post_ids), [self.qa.pk, self.mobile.pk])
+        self.assertEqual(self.recommended(), [pk for pk in ranked if pk != self.backend.pk])
+
+    @skipUnless(recommend.np, 'NumPy is not installed')
+    def test_late_commits_are_indexed_once(self):
+        """Posts stamped at or shortly before the watermark are still picked up, and only once"""
+        self.assertEqual(recommend.update_index(), 3)
+        watermark = Post.objects.order_by('-updated_at').values_list('updated_at', flat=True)[0]
+        tie = self.make_post('Test Lead', 'tester', 'Selenium')
+        late = self.make_post('SDET', 'tester', 'Pytest')
+        Post.objects.filter(pk=tie.pk).update(updated_at=watermark)
+        Post.objects.filter(pk=late.pk).update(updated_at=watermark - timedelta(seconds=30))
+        self.assertEqual(recommend.update_index(), 2)
+        self.assertEqual(sorted(recommend.load_index().segments[-1].post_ids), [tie.pk, late.pk])
+        self.assertEqual(recommend.update_index(), 0)
+        self.assertEqual(len(recommend._read_manifest(recommend.index_dir())['segments']), 2)
+
+    @skipUnless(recommend.np, 'NumPy is not installed')
+    def test_reindexing_keeps_document_frequencies(self):
+        """Edits replace a post's contribution to the IDF rather than adding to it"""
+        recommend.update_index()
+        for skills in ('Selenium, Appium', 'Selenium, Appium, Espresso'):
+            self.mobile.skills = skills
+            self.mobile.save()
+            recommend.update_index()
+        directory = recommend.index_dir()
+        manifest = recommend._read_manifest(directory)
+        incremental = (manifest['docs'], recommend._load_df(directory, manifest).tolist())
+        recommend.merge_segments()
+        manifest = recommend._read_manifest(directory)
+        self.assertEqual(incremental, (3, recommend._load_df(directory, manifest).tolist()))
+
+    @skipUnless(recommend.np, 'NumPy is not installed')
+    def test_emptied_post_is_no_longer_recommended(self):
+        recommend.update_index()
+        self.assertIn(self.qa.pk, self.recommended())
+        Post.objects.filter(pk=self.qa.pk).update(
+            role='', category='', skills='', experience='', updated_at=timezone.now()
+        )
+        self.assertEqual(recommend.update_index(), 1)
+        self.assertNotIn(self.qa.pk, self.recommended(interests='selenium testing'))
+        self.assertEqual(recommend._read_manifest(recommend.index_dir())['docs'], 2)
+        recommend.merge_segments()
+        self.assertNotIn(self.qa.pk, recommend.load_index().segments[0].post_ids)
+
+    @skipUnless(recommend.np, 'NumPy is not installed')
+    def test_unapproved_posts_are_not_recommended(self):
+        recommend.update_index()
+        Post.objects.filter(pk=self.qa.pk).update(is_approved=False)
+        self.assertNotIn(self.qa.pk, self.recommended())
+
+    def test_falls_back_to_trending(self):
+        """Without an index (or NumPy) the trending feed is served"""
+        Post.objects.filter(pk=self.mobile.pk).update(hot_score=100)
+        self.assertEqual(self.recommended()[0], self.mobile.pk)
+        with mock.patch.object(recommend, 'np', None):
+            self.assertEqual(self.recommended(limit=1), [self.mobile.pk])
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(RELATED_POSTS_COUNT=2)
+class RelatedPostsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com', password='testpass123', role='alumni'
+        )
+        self.backend = self.make_post('Backend Engineer', 'Python, Django, SQL')
+        self.api = self.make_post('API Developer', 'Python, Django, REST')
+        self.data = self.make_post('Data Engineer', 'Python, Spark, Hadoop')
+        self.mobile = self.make_post('iOS Developer', 'Swift, Xcode')
+
+    def make_post(self, role, skills, **fields):
+        return Post.objects.create(
+            user=self.alumni, name='Alumni', role=role, category='software-engineer',
+            skills=skills, experience=f'Working as a {role}', **fields
+        )
+
+    def related_ids(self, post):
+        response = self.client.get(reverse('post-detail', args=[post.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['related']]
+
+    def test_rebuild_and_detail(self):
+        """Posts sharing more skills rank first; unapproved neighbours are hidden"""
+        call_command('rebuild_related', stdout=StringIO())
+        self.assertEqual(self.related_ids(self.backend), [self.api.pk, self.data.pk])
+        self.assertNotIn(self.backend.pk, self.related_ids(self.mobile))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            moderation.moderate(Post.objects.filter(pk=self.api.pk), False)
+        self.assertEqual(self.related_ids(self.backend), [self.data.pk])
+
+    def test_new_post_updates_only_its_neighbourhood(self):
+        related.rebuild()
+        self.client.force_authenticate(user=self.alumni)
+        response = self.client.post(reverse('post-list-create'), {
+            'name': 'Alumni', 'role': 'Backend Engineer', 'category': 'software-engineer',
+            'skills': 'Python, Django, SQL', 'experience': 'Working as a Backend Engineer',
+        }, format='json')
+        twin = Post.objects.get(pk=response.data['id'])
+        self.assertEqual(self.related_ids(twin), [])
+
+        call_command('run_worker', once=True, concurrency=1, stdout=StringIO())
+        self.assertEqual(self.related_ids(twin)[0], self.backend.pk)
+        # Its closest neighbour adopts it, still keeping only RELATED_POSTS_COUNT
+        self.assertEqual(self.related_ids(self.backend), [twin.pk, self.api.pk])
+        self.assertNotIn(twin.pk, self.related_ids(self.mobile))
+
+    def test_edit_keeps_lists_of_former_candidates(self):
+        """Posts listing an edited post keep it, rescored, when it stops sharing their skills"""
+        related.rebuild()
+        self.assertIn(self.backend.pk, self.related_ids(self.data))
+        self.backend.skills = 'Go'
+        self.backend.save()
+        related.refresh(self.backend.pk)
+        cache.clear()
+        # Still alike by role, category and experience, and the list stays full
+        self.assertCountEqual(self.related_ids(self.data), [self.api.pk, self.backend.pk])
+        self.assertFalse(Job.objects.filter(name='posts.tasks.refresh_related').exists())
+
+    def test_unrelated_edit_does_not_enqueue(self):
+        self.client.force_authenticate(user=self.alumni)
+        url = reverse('post-detail', args=[self.backend.pk])
+        self.client.patch(url, {'company': 'Initech'}, format='json')
+        self.assertFalse(Job.objects.filter(name='posts.tasks.refresh_related').exists())
+        self.client.patch(url, {'skills': 'Go'}, format='json')
+        self.assertEqual(Job.objects.filter(name='posts.tasks.refresh_related').count(), 1)
+
+
+JOURNEY = (
+    'I started as a support engineer, learned Python on the side, automated our '
+    'ticket triage and moved into the platform team after two years of night classes.'
+)
+
+
+class DuplicateDetectionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com', password='testpass123', role='alumni'
+        )
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password='testpass123', role='alumni'
+        )
+
+    def submit(self, user, experience):
+        self.client.force_authenticate(user=user)
+        return self.client.post(reverse('post-list-create'), {
+            'name': user.username, 'role': 'Engineer', 'category': 'other', 'experience': experience
+        }, format='json')
+
+    def test_signature_similarity(self):
+        sig = dedupe.signature(JOURNEY)
+        self.assertEqual(len(dedupe.pack(sig)), dedupe.PERMUTATIONS * 4)
+        self.assertEqual(dedupe.unpack(dedupe.pack(sig)), sig)
+        self.assertGreater(dedupe.similarity(sig, dedupe.signature(JOURNEY + ' Thanks!')), 0.8)
+        self.assertLess(dedupe.similarity(sig, dedupe.signature('A completely different story')), 0.2)
+        self.assertIsNone(dedupe.signature('  '))
+
+    def test_own_resubmission_is_merged(self):
+        first = self.submit(self.alumni, JOURNEY)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        again = self.submit(self.alumni, JOURNEY + ' Good luck!')
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data['id'], first.data['id'])
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_copy_of_another_post_is_held(self):
+        original = self.submit(self.alumni, JOURNEY)
+        copy = self.submit(self.other, JOURNEY)
+        self.assertEqual(copy.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(copy.data['duplicate_of'], original.data['id'])
+        self.assertFalse(copy.data['is_approved'])
+        self.assertEqual(list(moderation.pending_posts().values_list('pk', flat=True)), [copy.data['id']])
+
+    def test_resubmission_after_rejection_is_new(self):
+        """A rejected post is neither merged into nor held as an original"""
+        first = self.submit(self.alumni, JOURNEY)
+        moderation.moderate(Post.objects.filter(pk=first.data['id']), False)
+        again = self.submit(self.alumni, JOURNEY + ' Good luck!')
+        self.assertEqual(again.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(again.data['id'], first.data['id'])
+        self.assertTrue(again.data['is_approved'])
+
+        moderation.moderate(Post.objects.filter(pk=again.data['id']), False)
+        copy = self.submit(self.other, JOURNEY)
+        self.assertEqual(copy.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(copy.data['duplicate_of'])
+
+    def test_edit_reindexes_signature(self):
+        post = self.submit(self.alumni, 'Short unrelated text about design work').data
+        self.client.patch(reverse('post-detail', args=[post['id']]), {'experience': JOURNEY}, format='json')
+        self.assertEqual(self.submit(self.other, JOURNEY).data['duplicate_of'], post['id'])
+
+    def test_dedupe_command_flags_existing_corpus(self):
+        posts = [
+            Post.objects.create(user=self.alumni, name='A', role='Engineer', experience=JOURNEY),
+            Post.objects.create(user=self.other, name='B', role='Engineer', experience='Something else entirely'),
+            Post.objects.create(user=self.other, name='C', role='Engineer', experience=JOURNEY + ' Cheers'),
+        ]
+        call_command('dedupe_posts', dry_run=True, batch_size=2, stdout=StringIO())
+        self.assertFalse(PostSignature.objects.exists())
+
+        call_command('dedupe_posts', batch_size=2, stdout=StringIO())
+        self.assertEqual(PostSignature.objects.count(), 3)
+        flagged = Post.objects.get(pk=posts[2].pk)
+        self.assertEqual((flagged.duplicate_of_id, flagged.is_approved), (posts[0].pk, False))
+        self.assertEqual(stats.get_stats()['totals']['posts'], 2)
+        # Running again finds nothing new
+        self.assertEqual(dedupe.dedupe_all(dry_run=True), {})
+
+
+class PostDeletionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com', password='testpass123', role='alumni'
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password='testpass123'
+        )
+        self.post = Post.objects.create(
+            user=self.alumni, name='Alumni', role='Engineer', experience='Journey'
+        )
+        for number in range(5):
+            comment = Comment.objects.create(post=self.post, user=self.student, content=f'Question {number}')
+        Comment.objects.create(post=self.post, user=self.alumni, parent=comment, content='Answer')
+        Like.objects.create(post=self.post, user=self.student)
+        self.client.force_authenticate(user=self.alumni)
+
+    def run_worker(self):
+        call_command('run_worker', once=True, concurrency=1, stdout=StringIO())
+
+    def test_delete_hides_post_at_once(self):
+        """The post vanishes from every read path before anything is purged"""
+        response = self.client.delete(reverse('post-detail', args=[self.post.pk]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 6)
+        self.assertEqual(self.client.get(reverse('post-list-create')).json(), [])
+        for url in (
+            reverse('post-detail', args=[self.post.pk]),
+            reverse('comment-list-create', args=[self.post.pk]),
+            reverse('post-like', args=[self.post.pk]),
+        ):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(user=self.student)
+        self.assertEqual(self.client.get(reverse('user-comments')).data, [])
+        self.assertEqual(stats.get_stats()['totals']['posts'], 0)
+        self.assertFalse(moderation.pending_posts().exists())
+        self.assertEqual(moderation.moderate(Post.objects.filter(pk=self.post.pk), True), 0)
+        # Deleting is not a moderation decision
+        self.assertFalse(Post.objects.get(pk=self.post.pk).is_rejected)
+
+    def test_comment_deletes_skip_the_collector(self):
+        """delete_comments() sends no per-row signals, so the stats move exactly once"""
+        deleted = []
+
+        def receiver(sender, instance, **kwargs):
+            deleted.append(instance.pk)
+
+        post_delete.connect(receiver, sender=Comment)
+        self.addCleanup(post_delete.disconnect, receiver, sender=Comment)
+        deletion.delete_comments(Comment.objects.order_by('pk').values_list('pk', flat=True)[:2])
+        self.assertEqual(deleted, [])
+        self.assertEqual(Comment.objects.count(), 4)
+        self.assertEqual(ForumStat.objects.get(kind='total').comments, 4)
+
+    @override_settings(DELETION_BATCH_SIZE=2, DELETION_BATCHES_PER_JOB=2)
+    def test_purge_runs_in_bounded_chunks(self):
+        """Comments and likes go a chunk at a time, spread over several jobs"""
+        self.client.delete(reverse('post-detail', args=[self.post.pk]))
+        self.run_worker()
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Like.objects.exists())
+        # 3 comment chunks (replies first) + 1 like chunk + the row = 5 chunks, 2 per job
+        self.assertEqual(Job.objects.filter(name='posts.tasks.purge_post', status='done').count(), 3)
+        self.assertEqual(stats.get_stats()['totals']['comments'], 0)
+
+
+class ViewCountTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Views left in the process-wide buffer by other tests
+        viewcounts.BUFFER.take()
+        self.client = APIClient()
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com', password='testpass123', role='alumni'
+        )
+        self.post = Post.objects.create(
+            user=self.alumni, name='Alumni', role='Engineer', company='Acme', experience='Journey'
+        )
+        self.other = Post.objects.create(user=self.alumni, name='Alumni', role='Analyst', experience='Journey')
+
+    def test_views_are_buffered_then_written_in_one_batch(self):
+        view_url = reverse('post-view', args=[self.post.pk])
+        with self.assertNumQueries(0):
+            for address in ('10.0.0.1', '10.0.0.2', '10.0.0.1'):
+                self.client.post(view_url, REMOTE_ADDR=address)
+        self.client.force_authenticate(user=self.alumni)
+        self.client.get(reverse('post-detail', args=[self.post.pk]))
+        self.client.post(reverse('post-view', args=[self.other.pk]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+
+        # Live posts, day rows, their insert, the sketch union, posts, stats and stale fragments
+        with self.assertNumQueries(10):
+            self.assertEqual(viewcounts.BUFFER.flush(force=True), 2)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.views, self.post.unique_viewers), (4, 3))
+        self.assertEqual(PostViewDay.objects.get(post=self.post).views, 4)
+        self.assertEqual(stats.get_stats()['totals']['views'], 5)
+        self.assertEqual(ForumStat.objects.get(kind='company', key='acme').views, 4)
+
+        detail = self.client.get(reverse('post-detail', args=[self.post.pk])).data
+        self.assertEqual((detail['views'], detail['unique_viewers']), (4, 3))
+
+    def test_later_flushes_merge_into_the_day(self):
+        viewcounts.write({self.post.pk: [2, {hash_value('user:1')}]})
+        viewcounts.write({self.post.pk: [1, {hash_value('user:1'), hash_value('user:2')}]})
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.views, self.post.unique_viewers), (3, 2))
+        self.assertEqual(PostViewDay.objects.count(), 1)
+
+        # Older days count towards unique viewers while they are inside the window
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        viewcounts.write({self.post.pk: [1, {hash_value('user:3')}]}, day=tomorrow)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.unique_viewers, 3)
+        with override_settings(VIEWS_UNIQUE_DAYS=1):
+            viewcounts.write({self.post.pk: [1, {hash_value('user:3')}]}, day=tomorrow)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.views, self.post.unique_viewers), (5, 1))
+
+    def test_not_flushed_until_due(self):
+        self.client.post(reverse('post-view', args=[self.post.pk]))
+        self.assertEqual(viewcounts.BUFFER.flush(), 0)
+        with override_settings(VIEWS_BUFFER_MAX_POSTS=1):
+            self.assertTrue(viewcounts.BUFFER.due())
+
+    def test_deleted_posts_are_skipped(self):
+        deletion.delete_posts(Post.objects.filter(pk=self.post.pk), purge=False)
+        viewcounts.write({self.post.pk: [3, {hash_value('user:1')}]})
+        self.assertEqual(Post.objects.get(pk=self.post.pk).views, 0)
+        self.assertFalse(PostViewDay.objects.exists())
+
+
+class RenderedPostTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com', password='testpass123', role='alumni'
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password='testpass123'
+        )
+        self.post = Post.objects.create(user=self.alumni, name='Alumni', role='Engineer', experience='Journey')
+        self.other = Post.objects.create(user=self.alumni, name='Alumni', role='Analyst', experience='Journey')
+        Comment.objects.create(post=self.post, user=self.alumni, content='Ask me anything')
+        self.run_worker()
+
+    def run_worker(self):
+        call_command('run_worker', once=True, concurrency=1, stdout=StringIO())
+
+    def expected_feed(self):
+        posts = Post.objects.filter(is_approved=True).with_comments()
+        return json.loads(FastJSONRenderer().render(PostSerializer(posts, many=True).data))
+
+    def test_feed_joins_stored_fragments(self):
+        self.assertEqual(RenderedPost.objects.count(), 2)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('post-list-create'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json(), self.expected_feed())
+
+    def test_viewer_specific_posts_are_serialized(self):
+        Comment.objects.create(post=self.other, user=self.student, content='Mine')
+        self.run_worker()
+        self.client.force_authenticate(user=self.student)
+        feed = {post['id']: post for post in self.client.get(reverse('post-list-create')).json()}
+        self.assertEqual(
+            [(c['is_owner'], c['can_delete']) for c in feed[self.other.pk]['comments']], [(True, True)]
+        )
+        self.assertEqual(feed[self.post.pk]['comments'][0]['is_owner'], False)
+
+        staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', is_staff=True
+        )
+        self.client.force_authenticate(user=staff)
+        feed = self.client.get(reverse('post-list-create')).data
+        self.assertTrue(all(c['can_delete'] for post in feed for c in post['comments']))
+
+    def test_writes_refresh_fragments(self):
+        self.client.force_authenticate(user=self.student)
+        self.client.post(reverse('post-like', args=[self.post.pk]))
+        comment = self.client.post(
+            reverse('comment-list-create', args=[self.other.pk]), {'content': 'Thanks'}, format='json'
+        ).data
+        self.client.delete(reverse('comment-detail', args=[self.other.pk, comment['id']]))
+        self.client.force_authenticate(user=self.alumni)
+        self.client.patch(reverse('post-detail', args=[self.post.pk]), {'company': 'Initech'}, format='json')
+        self.run_worker()
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(reverse('post-list-create')).json(), self.expected_feed())
+        stored = json.loads(RenderedPost.objects.get(post=self.post).data)
+        self.assertEqual((stored['likes'], stored['company']), (1, 'Initech'))
+
+        moderation.moderate(Post.objects.filter(pk=self.other.pk), False)
+        rendered.rebuild([self.other.pk])
+        self.assertFalse(RenderedPost.objects.filter(post=self.other).exists())
+
+    def test_posts_purged_mid_feed_are_left_out(self):
+        """A post without a fragment that is gone by the second query is skipped"""
+        RenderedPost.objects.filter(post=self.other).delete()
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        with mock.patch.object(PostQuerySet, 'with_comments', lambda posts: posts.none()):
+            feed = json.loads(rendered.feed_json(Post.objects.order_by('pk'), request))
+        self.assertEqual([post['id'] for post in feed], [self.post.pk])
+
+    def test_view_flushes_rerender_only_old_fragments(self):
+        """Views reach fragments at most RENDERED_COUNTS_MAX_AGE late and never expire the detail"""
+        detail_url = reverse('post-detail', args=[self.post.pk])
+        self.client.get(detail_url)
+        viewcounts.write({self.post.pk: [1, {hash_value('user:1')}]})
+        self.assertFalse(Job.objects.filter(status='queued').exists())
+        with self.assertNumQueries(0):
+            self.client.get(detail_url)
+
+        RenderedPost.objects.filter(post=self.post).update(rendered_at=timezone.now() - timedelta(minutes=10))
+        viewcounts.write({post.pk: [1, {hash_value('user:2')}] for post in (self.post, self.other)})
+        self.assertEqual(Job.objects.get(status='queued').kwargs, {'post_ids': [self.post.pk]})
+        with self.assertNumQueries(0):
+            self.client.get(detail_url)
+        self.run_worker()
+        self.assertEqual(json.loads(RenderedPost.objects.get(post=self.post).data)['views'], 2)
+
+    def test_rebuild_command(self):
+        RenderedPost.objects.all().delete()
+        Post.objects.create(
+            user=self.alumni, name='Alumni', role='Intern', experience='Journey', is_approved=False
+        )
+        out = StringIO()
+        call_command('rebuild_rendered_posts', stdout=out)
+        self.assertIn('Rendered 2 posts', out.getvalue())
+        self.assertEqual(
+            set(RenderedPost.objects.values_list('post_id', flat=True)), {self.post.pk, self.other.pk}
+        )
+
+
+class CachedReadsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com', password='testpass123', role='alumni'
+        )
+        self.post = Post.objects.create(user=self.alumni, name='Alumni', role='Engineer', experience='Journey')
+
+    def test_anonymous_reads_are_cached(self):
+        detail_url = reverse('post-detail', args=[self.post.pk])
+        for url in (reverse('post-list-create'), detail_url, reverse('forum-stats')):
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                self.client.get(url)
+        # Signed-in users see per-viewer comment flags, so they are served uncached
+        self.client.force_authenticate(user=self.alumni)
+        with self.assertNumQueries(3):
+            self.client.get(detail_url)
+
+    def test_writes_expire_cached_reads(self):
+        detail_url = reverse('post-detail', args=[self.post.pk])
+        self.assertEqual(len(self.client.get(reverse('post-list-create')).json()), 1)
+        self.client.get(detail_url)
+
+        Comment.objects.create(post=self.post, user=self.alumni, content='Hello')
+        self.assertEqual(len(self.client.get(detail_url).data['comments']), 1)
+
+        other = Post.objects.create(
+            user=self.alumni, name='Alumni', role='Analyst', experience='Journey', is_approved=False
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            moderation.moderate(Post.objects.filter(pk=other.pk), True)
+        self.assertEqual(len(self.client.get(reverse('post-list-create')).json()), 2)
+
+    def test_rejected_posts_are_evicted(self):
+        """Stale copies of a rejected or deleted post are never served, not even while recomputing"""
+        other = Post.objects.create(user=self.alumni, name='Alumni', role='Analyst', experience='Journey')
+        feed_key = caching.feed_key(None, 'newest')
+        for post in (self.post, other):
+            self.client.get(reverse('post-detail', args=[post.pk]))
+        self.client.get(reverse('post-list-create'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            moderation.moderate(Post.objects.filter(pk=self.post.pk), False)
+        self.assertIsNone(cache.get(feed_key))
+        self.assertIsNone(cache.get(caching.detail_key(self.post.pk)))
+        # Ordinary edits only expire the cached response, which is served while it is recomputed
+        other.save()
+        self.assertEqual(cache.get(caching.detail_key(other.pk))[1], 0)
+
+        self.client.get(reverse('post-list-create'))
+        with self.captureOnCommitCallbacks(execute=True):
+            deletion.delete_posts(Post.objects.filter(pk=other.pk))
+        self.assertIsNone(cache.get(feed_key))
+        self.assertIsNone(cache.get(caching.detail_key(other.pk)))
+        self.assertEqual(self.client.get(reverse('post-list-create')).json(), [])
+
+
+class ProjectionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com', password='testpass123', role='alumni'
+        )
+        self.post = Post.objects.create(
+            user=self.alumni, name='Alumni', role='Engineer', experience='Journey', skills='Python, SQL'
+        )
+        Comment.objects.create(post=self.post, user=self.alumni, content='Hello')
+
+    def test_feed_fields(self):
+        """Only the requested fields are rendered, and their columns read"""
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('post-list-create'), {'fields': 'likes,comments_count,author_name'})
+        self.assertEqual(response.json(), [
+            {'id': self.post.pk, 'author_name': 'alumni', 'likes': 0, 'comments_count': 1}
+        ])
+        self.assertEqual(len(captured), 1)
+        self.assertNotIn('experience', captured[0]['sql'])
+
+    def test_feed_exclude(self):
+        response = self.client.get(reverse('post-list-create'), {'exclude': 'comments,experience,nonsense'})
+        data = response.json()[0]
+        self.assertNotIn('comments', data)
+        self.assertNotIn('experience', data)
+        self.assertEqual(data['skills_list'], ['Python', 'SQL'])
+        self.assertEqual(data['comments_count'], 1)
+
+    def test_detail_skips_related(self):
+        """Neighbours are only looked up when 'related' is requested"""
+        url = reverse('post-detail', args=[self.post.pk])
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'fields': 'role'})
+        self.assertEqual(response.data, {'id': self.post.pk, 'role': 'Engineer'})
+        self.assertEqual(self.client.get(url, {'fields': 'role,related'}).data['related'], [])
+
+    def test_comment_fields(self):
+        response = self.client.get(reverse('comment-list-create', args=[self.post.pk]), {'fields': 'content'})
+        self.assertEqual(response.data, [{'id': self.post.comments.get().pk, 'content': 'Hello'}])
+
+
+class PostBatchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('post-batch')
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com', password='testpass123', role='alumni'
+        )
+        self.first = Post.objects.create(user=self.alumni, name='Alumni', role='Engineer', experience='One')
+        self.second = Post.objects.create(user=self.alumni, name='Alumni', role='Analyst', experience='Two')
+        for number in range(3):
+            Comment.objects.create(post=self.first, user=self.alumni, content=f'Comment {number}')
+
+    def test_posts_in_requested_order(self):
+        """Unknown, pending and deleted posts are left out, duplicates collapse"""
+        pending = Post.objects.create(
+            user=self.alumni, name='Alumni', role='Tester', experience='Three', is_approved=False
+        )
+        ids = [self.second.pk, self.first.pk, pending.pk, self.second.pk, 999]
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['id'] for post in response.data], [self.second.pk, self.first.pk])
+        self.assertEqual(len(response.data[1]['comments']), 3)
+
+    def test_comment_limit(self):
+        """Each post brings its first comments and the full count"""
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'ids': f'{self.first.pk},{self.second.pk}', 'comments': 2})
+        first, second = response.data
+        self.assertEqual([comment['content'] for comment in first['comments']], ['Comment 0', 'Comment 1'])
+        self.assertEqual(first['comments_count'], 3)
+        self.assertEqual((second['comments'], second['comments_count']), ([], 0))
+
+        response = self.client.get(self.url, {'ids': self.first.pk, 'comments': 1, 'fields': 'comments'})
+        self.assertEqual(list(response.data[0]), ['id', 'comments'])
+        self.assertEqual(len(response.data[0]['comments']), 1)
+
+    def test_invalid_requests(self):
+        for params in ({}, {'ids': 'one'}, {'ids': self.first.pk, 'comments': 'all'}):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(POSTS_BATCH_MAX_IDS=1):
+            response = self.client.get(self.url, {'ids': f'{self.first.pk},{self.second.pk}'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ThreadedCommentsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com', password='testpass123', role='alumni'
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password='testpass123'
+        )
+        self.post = Post.objects.create(user=self.alumni, name='Alumni', role='Engineer', experience='Journey')
+        self.client.force_authenticate(user=self.student)
+
+    def comment(self, content, parent=None, post=None):
+        response = self.client.post(
+            reverse('comment-list-create', args=[(post or self.post).pk]),
+            {'content': content, 'parent': parent}, format='json'
+        )
+        return response
+
+    def test_replies_build_paths(self):
+        root = self.comment('Root').data
+        reply = self.comment('Reply', parent=root['id']).data
+        nested = Comment.objects.get(pk=self.comment('Nested', parent=reply['id']).data['id'])
+        self.assertEqual((reply['parent'], reply['depth']), (root['id'], 1))
+        self.assertEqual(nested.depth, 2)
+        self.assertEqual(
+            nested.path,
+            ''.join(Comment.path_segment(pk) for pk in (root['id'], reply['id'], nested.pk))
+        )
+
+    def test_reply_must_stay_on_the_post(self):
+        other = Post.objects.create(user=self.alumni, name='Other', role='Engineer', experience='Other')
+        root = self.comment('Root', post=other).data
+        response = self.comment('Reply', parent=root['id'])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('parent', response.data)
+
+    def test_threads_page_with_first_replies(self):
+        """Threads come oldest first, each with its first replies depth first"""
+        first = self.comment('First').data['id']
+        second = self.comment('Second').data['id']
+        third = self.comment('Third').data['id']
+        a = self.comment('A', parent=first).data['id']
+        b = self.comment('B', parent=first).data['id']
+        a1 = self.comment('A1', parent=a).data['id']
+        self.comment('C', parent=second)
+
+        with self.assertNumQueries(1):
+            page, next_key = threads.top_threads(self.post.pk, threads=2, replies=2)
+        self.assertEqual([comment.pk for comment in page], [first, second])
+        self.assertEqual([reply.pk for reply in page[0].thread_replies], [a, a1])
+        self.assertEqual(page[0].reply_count, 3)
+        self.assertEqual(next_key, Comment.path_segment(second))
+
+        url = reverse('comment-threads', args=[self.post.pk])
+        response = self.client.get(url, {'page_size': 2, 'replies': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([reply['id'] for reply in response.data['results'][0]['replies']], [a, a1])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([thread['id'] for thread in response.data['results']], [third])
+        self.assertIsNone(response.data['next'])
+        self.assertNotIn(b, [reply['id'] for reply in response.data['results'][0]['replies']])
+
+        response = self.client.get(url, {'after': 'nope'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_subtree_is_one_ordered_range(self):
+        root = self.comment('Root').data['id']
+        a = self.comment('A', parent=root).data['id']
+        self.comment('Other thread')
+        b = self.comment('B', parent=root).data['id']
+        a1 = self.comment('A1', parent=a).data['id']
+
+        comment = Comment.objects.get(pk=root)
+        with self.assertNumQueries(1):
+            self.assertEqual([c.pk for c in threads.subtree(comment)], [root, a, a1, b])
+
+        response = self.client.get(reverse('comment-replies', args=[self.post.pk, a]))
+        self.assertEqual([c['id'] for c in response.data['results']], [a, a1])
+
+    def test_deleting_a_comment_removes_its_replies(self):
+        root = self.comment('Root').data['id']
+        self.comment('Reply', parent=root)
+        self.client.delete(reverse('comment-detail', args=[self.post.pk, root]))
+        self.assertFalse(Comment.objects.exists())
+
+
+# Admin templates need static URLs, which the manifest storage only has after collectstatic
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class AdminTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='testpass123'
+        )
+        self.client.force_login(self.admin)
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com', password='testpass123', role='alumni'
+        )
+
+    def make_posts(self, count, **fields):
+        posts = [
+            Post.objects.create(
+                user=self.alumni, name=f'Alumni {index}', role='Engineer', category='tester',
+                company='Acme', experience='Journey', **fields
+            )
+            for index in range(count)
+        ]
+        for post in posts:
+            Comment.objects.create(post=post, user=self.alumni, content='Reply')
+        return posts
+
+    def changelist_queries(self, model):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse(f'admin:posts_{model}_changelist'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(captured)
+
+    def test_changelists_do_not_scale(self):
+        self.make_posts(2)
+        before = {model: self.changelist_queries(model) for model in ('post', 'comment')}
+        self.make_posts(5)
+        after = {model: self.changelist_queries(model) for model in ('post', 'comment')}
+        self.assertEqual(before, after)
+
+    def test_bulk_moderation(self):
+        """Approve and reject run one UPDATE and keep the stats in step"""
+        posts = self.make_posts(4, is_approved=False)
+        url = reverse('admin:posts_post_changelist')
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post(url, {
+                'action': 'approve_posts', '_selected_action': [post.pk for post in posts[:3]],
+            })
+        self.assertEqual(response.status_code, 302)
+        updates = [query for query in captured if query['sql'].startswith('UPDATE "posts_post"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Post.objects.filter(is_approved=True).count(), 3)
+
+        total = ForumStat.objects.get(kind='total')
+        self.assertEqual((total.posts, total.comments), (3, 3))
+
+        self.client.post(url, {'action': 'reject_posts', '_selected_action': [posts[0].pk, posts[3].pk]})
+        expected = {(row.kind, row.key, row.posts, row.comments, row.likes) for row in ForumStat.objects.all()}
+        stats.rebuild()
+        rebuilt = {(row.kind, row.key, row.posts, row.comments, row.likes) for row in ForumStat.objects.all()}
+        # Emptied buckets stay behind as zero rows until the next rebuild
+        self.assertEqual({row for row in expected if row[2]}, rebuilt)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=3)
+    def test_estimated_count(self):
+        self.make_posts(5)
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.count, Post.objects.order_by('-pk').first().pk)
+        paginator = EstimatedCountPaginator(Post.objects.filter(category='tester'), 2)
+        self.assertEqual(paginator.count, 3)
+        paginator = EstimatedCountPaginator(Post.objects.filter(pk__lte=Post.objects.order_by('pk').first().pk), 2)
+        self.assertLess(paginator.count, 3)
+
+
+@override_settings(POSTS_REQUIRE_APPROVAL=True)
+class ModerationTestCase(QueryBudgetMixin, TestCase):
+    query_budgets = QueryBudgetTestCase.query_budgets
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', is_staff=True
+        )
+        self.alumni = User.objects.create_user(
+            username='alumni', email='alumni@example.com', password='testpass123', role='alumni'
+        )
+
+    def submit(self, count):
+        """Submit ``count`` posts, each by its own author with its own company and graduation year"""
+        ids = []
+        for _ in range(count):
+            number = self.submitted = getattr(self, 'submitted', 0) + 1
+            author = User.objects.create_user(
+                username=f'alumni{number}', email=f'alumni{number}@example.com', role='alumni'
+            )
+            self.client.force_authenticate(user=author)
+            response = self.client.post(reverse('post-list-create'), {
+                'name': f'Alumni {number}', 'role': 'Engineer', 'category': 'tester',
+                'company': f'Company {number}', 'graduation_year': 2000 + number,
+                'experience': f'Journey number {number}'
+            }, format='json')
+            self.assertFalse(response.data['is_approved'])
+            ids.append(response.data['id'])
+        self.client.force_authenticate(user=self.staff)
+        return ids
+
+    def test_pending_posts_stay_out_of_the_feed(self):
+        ids = self.submit(2)
+        self.assertEqual(self.client.get(reverse('post-list-create')).json(), [])
+        self.assertEqual(stats.get_stats()['totals']['posts'], 0)
+
+        response = self.client.get(reverse('moderation-queue'))
+        self.assertEqual([post['id'] for post in response.data['results']], ids)
+        self.assertIn('post_pending_idx', moderation.pending_posts().explain())
+
+    def test_queue_is_staff_only(self):
+        self.client.force_authenticate(user=self.alumni)
+        response = self.client.get(reverse('moderation-queue'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(reverse('moderation-approve'), {'ids': [1]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_batch_approve_and_reject(self):
+        """Decisions update the feed, the queue and the (cached) stats"""
+        ids = self.submit(4)
+        self.assertEqual(stats.get_stats()['totals']['posts'], 0)
+
+        response = self.client.post(reverse('moderation-approve'), {'ids': ids[:3]}, format='json')
+        self.assertEqual(response.data, {'updated': 3})
+        self.assertEqual(len(self.client.get(reverse('post-list-create')).json()), 3)
+        self.assertEqual(stats.get_stats()['totals']['posts'], 3)
+
+        response = self.client.post(reverse('moderation-reject'), {'ids': [ids[0], ids[3]]}, format='json')
+        self.assertEqual(response.data, {'updated': 2})
+        self.assertEqual(stats.get_stats()['totals']['posts'], 2)
+        self.assertEqual(self.client.get(reverse('moderation-queue')).data['results'], [])
+        rejected = Post.objects.get(pk=ids[3])
+        self.assertTrue(rejected.is_rejected)
+        self.assertEqual(rejected.moderated_by, self.staff)
+
+    def test_batch_size_does_not_add_queries(self):
+        """Batches with more posts, authors, companies and years cost the same"""
+        batch = self.submit(2)
+
+        def grow():
+            batch[:] = self.submit(8)
+        # Every batch creates new stats buckets for its authors, companies and years
+        self.assertQueriesDoNotScale('moderation-approve', 'POST', lambda: self.client.post(
+            reverse('moderation-approve'), {'ids': batch}, format='json'
+        ), grow)
+        self.assertQueryBudget('moderation-queue', 'GET', lambda: self.client.get(reverse('moderation-queue')))
+
+        few = list(Post.objects.filter(is_approved=True).exclude(pk__in=batch).values_list('pk', flat=True))
+        _, small = self.assertQueryBudget('moderation-reject', 'POST', lambda: self.client.post(
+            reverse('moderation-reject'), {'ids': few}, format='json'
+        ))
+        _, large = self.assertQueryBudget('moderation-reject', 'POST', lambda: self.client.post(
+            reverse('moderation-reject'), {'ids': batch}, format='json'
+        ))
+        self.assertEqual(small, large)
+
+    def test_bulk_decisions_match_rebuild(self):
+        """Per-bucket sums of a varied batch equal a full GROUP BY rebuild"""
+        ids = self.submit(5)
+        moderation.moderate(Post.objects.filter(pk__in=ids[:3]), True)
+        moderation.moderate(Post.objects.filter(pk__in=ids), True)
+        moderation.moderate(Post.objects.filter(pk__in=ids[1:4]), False)
+        incremental = sorted(ForumStat.objects.values_list('kind', 'key', 'label', 'posts', 'comments', 'likes'))
+        stats.rebuild()
+        rebuilt = sorted(ForumStat.objects.values_list('kind', 'key', 'label', 'posts', 'comments', 'likes'))
+        # Buckets emptied by the rejection stay behind at zero
+        self.assertEqual([row for row in incremental if row[3]], rebuilt)
+        self.assertIn(('author', str(User.objects.get(username='alumni1').pk), 'alumni1', 1, 0, 0), rebuilt)
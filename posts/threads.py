@@ -0,0 +1,80 @@
+"""
+Threaded comments.
+
+A reply points at its ``parent`` and every comment stores a materialized
+``path``: the ids of its ancestors and its own id, each as a fixed-width
+``Comment.PATH_STEP``-character hex segment. Sorting by path therefore
+lists a post's comments thread by thread, depth first, with siblings in the
+order they were posted, and the first segment of a path names its thread.
+
+Everything under a comment is the path range ``[path, path + '~')`` ('~'
+sorts after every hex digit), so a subtree is one range scan of
+``comment_thread_idx`` (post, path) that comes back already ordered. A page
+of threads is one range as well: from the thread after the cursor up to the
+root of the first thread of the next page, with window functions keeping
+each thread's root and first replies and counting the rest.
+"""
+from django.db.models import Count, F, Subquery, Value, Window
+from django.db.models.functions import Coalesce, RowNumber, Substr
+
+from .models import Comment
+
+# Sorts after every character of a path
+PATH_END = '~'
+
+
+def thread_key(path):
+    return path[:Comment.PATH_STEP]
+
+
+def is_thread_key(value):
+    return len(value) == Comment.PATH_STEP and all(char in '0123456789abcdef' for char in value)
+
+
+def subtree(comment):
+    """The comment and all its replies, in display order (one range query)"""
+    return Comment.objects.visible().filter(
+        post_id=comment.post_id, path__gte=comment.path, path__lt=comment.path + PATH_END
+    ).select_related('user').order_by('path')
+
+
+def top_threads(post_id, after='', threads=10, replies=3):
+    """
+    The ``threads`` threads after the thread key ``after``, oldest first.
+
+    Returns (threads, next_key): each thread is its root comment with
+    ``replies`` (its first replies in display order) and ``reply_count``
+    set; ``next_key`` is the cursor of the following page, or None. Runs
+    a single query.
+    """
+    lower = after + PATH_END if after else ''
+    comments = Comment.objects.visible().filter(post_id=post_id, path__gt=lower)
+    # Root of the first thread on the next page, if there is one
+    next_root = Subquery(
+        Comment.objects.filter(post_id=post_id, depth=0, path__gt=lower)
+        .order_by('path').values('path')[threads:threads + 1]
+    )
+    thread = Substr('path', 1, Comment.PATH_STEP)
+    rows = (
+        comments.annotate(next_root=next_root)
+        .filter(path__lt=Coalesce(F('next_root'), Value(PATH_END)))
+        .annotate(
+            position=Window(RowNumber(), partition_by=[thread], order_by=F('path').asc()),
+            thread_size=Window(Count('id'), partition_by=[thread]),
+        )
+        .filter(position__lte=replies + 1)
+        .select_related('user')
+        .order_by('path')
+    )
+
+    result, last_key, has_next = [], None, False
+    for comment in rows:
+        last_key, has_next = thread_key(comment.path), comment.next_root is not None
+        if comment.depth == 0:
+            comment.thread_replies = []
+            comment.reply_count = comment.thread_size - 1
+            result.append(comment)
+        elif result and last_key == thread_key(result[-1].path):
+            result[-1].thread_replies.append(comment)
+        # Replies whose root is hidden (its author left) are skipped with it
+    return result, last_key if has_next else None
@@ -1,9 +1,17 @@
 from django.urls import path
 from .views import (
     PostListCreateView,
+    RecommendedPostsView,
+    PostBatchView,
     PostDetailView,
     PostLikeView,
+    PostViewView,
+    ForumStatsView,
+    ModerationQueueView,
+    ModerationActionView,
     CommentListCreateView,
+    CommentThreadsView,
+    CommentRepliesView,
     CommentDetailView,
     UserCommentsView,
 )
@@ -13,10 +21,21 @@ urlpatterns = [
     path('', PostListCreateView.as_view(), name='post-list-create'),
     path('<int:pk>/', PostDetailView.as_view(), name='post-detail'),
     path('<int:pk>/like/', PostLikeView.as_view(), name='post-like'),
+    path('<int:pk>/view/', PostViewView.as_view(), name='post-view'),
+    path('stats/', ForumStatsView.as_view(), name='forum-stats'),
+    path('recommended/', RecommendedPostsView.as_view(), name='post-recommended'),
+    path('batch/', PostBatchView.as_view(), name='post-batch'),
+
+    # Moderation (staff)
+    path('moderation/pending/', ModerationQueueView.as_view(), name='moderation-queue'),
+    path('moderation/approve/', ModerationActionView.as_view(approve=True), name='moderation-approve'),
+    path('moderation/reject/', ModerationActionView.as_view(approve=False), name='moderation-reject'),
     
     # Comments
     path('<int:post_id>/comments/', CommentListCreateView.as_view(), name='comment-list-create'),
+    path('<int:post_id>/comments/threads/', CommentThreadsView.as_view(), name='comment-threads'),
     path('<int:post_id>/comments/<int:comment_id>/', CommentDetailView.as_view(), name='comment-detail'),
+    path('<int:post_id>/comments/<int:comment_id>/replies/', CommentRepliesView.as_view(), name='comment-replies'),
     
     # User's comments
     path('my-comments/', UserCommentsView.as_view(), name='user-comments'),
@@ -0,0 +1,170 @@
+"""
+Buffered post view counting.
+
+Recording a view never touches the database: ``record()`` adds it to a
+per-process buffer of ``{post_id: [views, viewer hashes]}``. The buffer is
+written out in one batch after a response has been sent, once
+``VIEWS_FLUSH_INTERVAL`` seconds have passed since the previous flush or it
+holds ``VIEWS_BUFFER_MAX_POSTS`` posts, so any number of views costs a
+handful of statements per interval and process.
+
+A flush adds to ``PostViewDay`` (per post and day: the view count and a
+HyperLogLog sketch of the viewers, about 1 KB), bumps ``Post.views`` and
+the ``views`` of the forum stats buckets, re-estimates
+``Post.unique_viewers`` from the union of the post's daily sketches over
+the last ``VIEWS_UNIQUE_DAYS`` days and queues stored feed JSON
+(posts.rendered) rendered more than ``RENDERED_COUNTS_MAX_AGE`` seconds ago
+for re-rendering; cached detail responses are not expired, so the most
+viewed posts stay cached. Counts are approximate by design:
+views still buffered in a process that dies are lost.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from alumni_forum.hyperloglog import HyperLogLog, hash_value
+from . import rendered, stats
+from .models import Post, PostViewDay
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def viewer_key(request):
+    """The signed-in user, or else the client address and user agent"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    meta = request.META
+    return f"anon:{meta.get('REMOTE_ADDR', '')}:{meta.get('HTTP_USER_AGENT', '')}"
+
+
+class ViewBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def record(self, post_id, viewer):
+        hashed = hash_value(viewer)
+        with self._lock:
+            entry = self._pending.get(post_id)
+            if entry is None:
+                entry = self._pending[post_id] = [0, set()]
+            entry[0] += 1
+            entry[1].add(hashed)
+
+    def due(self):
+        if not self._pending:
+            return False
+        return (
+            len(self._pending) >= _setting('VIEWS_BUFFER_MAX_POSTS', 1000)
+            or time.monotonic() - self._last_flush >= _setting('VIEWS_FLUSH_INTERVAL', 10)
+        )
+
+    def take(self):
+        """Empty the buffer and return what it held"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        return pending
+
+    def flush(self, force=False):
+        """Write the buffer out if it is due (or ``force``); returns the number of posts written"""
+        if not force:
+            # Never inside someone else's transaction: the counts would share its fate
+            if connection.in_atomic_block or not self.due():
+                return 0
+        pending = self.take()
+        if pending:
+            write(pending)
+        return len(pending)
+
+
+BUFFER = ViewBuffer()
+
+
+def record(post_id, request):
+    BUFFER.record(post_id, viewer_key(request))
+
+
+def write(pending, day=None):
+    """Persist ``{post_id: [views, viewer hashes]}`` in one batch"""
+    day = day or timezone.localdate()
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                return _write(pending, day)
+        except IntegrityError:
+            # Another process created one of the day rows first; its row is used on retry
+            if attempt:
+                raise
+
+
+def _write(pending, day):
+    post_ids = list(
+        Post.objects.filter(pk__in=list(pending), deleted_at__isnull=True).values_list('pk', flat=True)
+    )
+    if not post_ids:
+        return
+    rows = {
+        row.post_id: row for row in
+        PostViewDay.objects.select_for_update().filter(day=day, post_id__in=post_ids)
+    }
+    created = []
+    for post_id in post_ids:
+        views, viewers = pending[post_id]
+        row = rows.get(post_id)
+        if row is None:
+            row = PostViewDay(post_id=post_id, day=day, views=0)
+            sketch = HyperLogLog()
+            created.append(row)
+        else:
+            sketch = HyperLogLog.from_bytes(row.viewers)
+        for hashed in viewers:
+            sketch.add_hash(hashed)
+        row.views += views
+        row.viewers = sketch.to_bytes()
+    PostViewDay.objects.bulk_update(list(rows.values()), ['views', 'viewers'], batch_size=500)
+    PostViewDay.objects.bulk_create(created, batch_size=500)
+
+    # Distinct viewers over the window: the union of the daily sketches
+    since = day - timedelta(days=_setting('VIEWS_UNIQUE_DAYS', 30) - 1)
+    unions = {}
+    days = PostViewDay.objects.filter(post_id__in=post_ids, day__gte=since)
+    for post_id, data in days.values_list('post_id', 'viewers'):
+        sketch = HyperLogLog.from_bytes(data)
+        if post_id in unions:
+            unions[post_id].merge(sketch)
+        else:
+            unions[post_id] = sketch
+
+    counter = models.PositiveIntegerField()
+    Post.objects.filter(pk__in=post_ids).update(
+        views=F('views') + Case(
+            *[When(pk=post_id, then=Value(pending[post_id][0])) for post_id in post_ids],
+            default=Value(0), output_field=counter,
+        ),
+        unique_viewers=Case(
+            *[When(pk=post_id, then=Value(sketch.count())) for post_id, sketch in unions.items()],
+            default=F('unique_viewers'), output_field=counter,
+        ),
+    )
+    stats.record_views({post_id: pending[post_id][0] for post_id in post_ids})
+    rendered.refresh_counts(post_ids)
+
+
+def flush_quietly():
+    """Flush if due; a failed flush is logged rather than raised into request teardown"""
+    try:
+        BUFFER.flush()
+    except Exception:
+        logger.exception('Could not write buffered post views')
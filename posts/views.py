@@ -1,21 +1,53 @@
 from rest_framework import generics, status
+from rest_framework.pagination import CursorPagination
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from alumni_forum.cache import cached
+from alumni_forum.projection import requested_fields
+from notifications import tasks as notification_tasks
+from . import caching, dedupe, deletion, moderation, recommend, related, rendered, stats, tasks, threads, viewcounts
 from .models import Post, Comment
+from .signals import post_liked
 from .serializers import (
     PostSerializer, 
     PostCreateSerializer,
+    RelatedPostSerializer,
+    ThreadSerializer,
     CommentSerializer, 
     CommentCreateSerializer,
-    CommentUpdateSerializer
+    CommentUpdateSerializer,
+    ModerationSerializer
 )
 
 
+def project_posts(posts, projection, comment_limit=None):
+    """
+    Load what the ``projection`` of PostSerializer reads (everything when None).
+
+    With ``comment_limit`` only the first comments of each post are loaded
+    and the total is counted separately.
+    """
+    if projection is None:
+        posts = posts.with_comments(comment_limit)
+        return posts if comment_limit is None else posts.with_comment_counts()
+    posts = PostSerializer.load_only(posts, projection)
+    if 'comments' in projection:
+        posts = posts.prefetch_comments(comment_limit)
+        if comment_limit is None:
+            return posts
+    if 'comments_count' in projection:
+        return posts.with_comment_counts()
+    return posts
+
+
 class PostListCreateView(APIView):
     """
-    GET: List all posts
+    GET: List all posts (newest first, or ?sort=trending for the hot feed)
     POST: Create a new post (alumni and admin only)
     """
     permission_classes = []
@@ -32,8 +64,26 @@ class PostListCreateView(APIView):
         category = request.query_params.get('category')
         if category and category != 'all':
             posts = posts.filter(category=category)
-        
-        serializer = PostSerializer(posts, many=True, context={'request': request})
+
+        if request.query_params.get('sort') == 'trending':
+            posts = posts.order_by('-hot_score', '-created_at')
+
+        projection = requested_fields(request, PostSerializer)
+        if projection is None and request.accepted_renderer.format == 'json' and not request.user.is_staff:
+            # Stored JSON fragments joined together (see posts.rendered)
+            key = None if request.user.is_authenticated else caching.feed_key(
+                category, 'trending' if request.query_params.get('sort') == 'trending' else 'newest'
+            )
+            if key is None:
+                body = rendered.feed_json(posts, request)
+            else:
+                body = cached(
+                    key, lambda: rendered.feed_json(posts, request), settings.FEED_CACHE_TIMEOUT, name='feed'
+                )
+            return HttpResponse(body, content_type='application/json')
+        serializer = PostSerializer(
+            project_posts(posts, projection), many=True, context={'request': request}, projection=projection
+        )
         return Response(serializer.data)
 
     def post(self, request):
@@ -49,8 +99,23 @@ class PostListCreateView(APIView):
         
         serializer = PostCreateSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(user=request.user)
-            post = Post.objects.get(id=serializer.instance.id)
+            signature = dedupe.signature(serializer.validated_data.get('experience'))
+            duplicate = dedupe.find_duplicate(signature)
+            if duplicate and duplicate[1] == user.pk:
+                # Resubmission of the author's own journey: merge into the existing post
+                post = Post.objects.with_comments().get(id=duplicate[0])
+                return Response(PostSerializer(post, context={'request': request}).data)
+
+            # Held for review when moderation is on or when it copies another journey;
+            # staff posts go live directly
+            serializer.save(
+                user=request.user,
+                is_approved=not moderation.requires_approval(user) and not duplicate,
+                duplicate_of_id=duplicate[0] if duplicate else None,
+            )
+            dedupe.index_post(serializer.instance.pk, signature, created=True)
+            tasks.refresh_related.delay(post_id=serializer.instance.pk)
+            post = Post.objects.with_comments().get(id=serializer.instance.id)
             return Response(
                 PostSerializer(post, context={'request': request}).data,
                 status=status.HTTP_201_CREATED
@@ -58,9 +123,63 @@ class PostListCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class RecommendedPostsView(APIView):
+    """Journeys matching the current user's department, bio and ?interests="""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            return Response({'limit': 'Must be a number.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        projection = requested_fields(request, PostSerializer)
+        posts = project_posts(Post.objects.filter(is_approved=True).exclude(user=request.user), projection)
+        ranked = recommend.recommend(request.user, request.query_params.get('interests', ''), limit)
+        if ranked is None:
+            # Nothing to match on yet: show what is trending instead
+            posts = list(posts.order_by('-hot_score', '-created_at')[:limit])
+        else:
+            by_id = posts.in_bulk(ranked)
+            posts = [by_id[post_id] for post_id in ranked if post_id in by_id][:limit]
+
+        serializer = PostSerializer(posts, many=True, context={'request': request}, projection=projection)
+        return Response(serializer.data)
+
+
+class PostBatchView(APIView):
+    """Several posts with their comments in one request: ?ids=3,1,2&comments=5 (public)"""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()]
+            comment_limit = request.query_params.get('comments')
+            comment_limit = max(int(comment_limit), 0) if comment_limit else None
+        except ValueError:
+            return Response({'error': 'ids and comments must be numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return Response({'ids': 'Give at least one post id.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.POSTS_BATCH_MAX_IDS:
+            return Response(
+                {'ids': f'At most {settings.POSTS_BATCH_MAX_IDS} posts per request.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # One IN query for the posts (and their comment counts), one for the comments
+        projection = requested_fields(request, PostSerializer)
+        posts = project_posts(Post.objects.filter(is_approved=True).live(), projection, comment_limit)
+        by_id = posts.in_bulk(ids)
+        # Requested order; unknown, pending and deleted posts are left out
+        posts = [by_id[post_id] for post_id in ids if post_id in by_id]
+        serializer = PostSerializer(posts, many=True, context={'request': request}, projection=projection)
+        return Response(serializer.data)
+
+
 class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Get, update, or delete a single post"""
-    queryset = Post.objects.filter(is_approved=True)
+    queryset = Post.objects.filter(is_approved=True).with_comments()
     serializer_class = PostSerializer
     lookup_field = 'pk'
 
@@ -69,19 +188,124 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
         context['request'] = self.request
         return context
 
+    def retrieve(self, request, *args, **kwargs):
+        projection = requested_fields(request, PostSerializer, extra=['related'])
+        if projection is not None:
+            data = self.detail_data(projection)
+        elif request.user.is_authenticated:
+            data = self.detail_data()
+        else:
+            data = cached(
+                caching.detail_key(kwargs['pk']), self.detail_data, settings.DETAIL_CACHE_TIMEOUT,
+                name='post-detail'
+            )
+        # Buffered in memory and written in batches (see posts.viewcounts)
+        viewcounts.record(data['id'], request)
+        return Response(data)
+
+    def detail_data(self, projection=None):
+        if projection is None:
+            post = self.get_object()
+        else:
+            post = get_object_or_404(
+                project_posts(Post.objects.filter(is_approved=True), projection), pk=self.kwargs['pk']
+            )
+            self.check_object_permissions(self.request, post)
+        data = self.get_serializer(post, projection=projection).data
+        if projection is None or 'related' in projection:
+            # One indexed query over the precomputed neighbours (see posts.related)
+            data['related'] = RelatedPostSerializer(
+                related.related_posts(post.pk)[:settings.RELATED_POSTS_COUNT], many=True
+            ).data
+        return data
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        if 'experience' in serializer.validated_data:
+            dedupe.index_post(serializer.instance.pk, dedupe.signature(serializer.instance.experience))
+        if set(serializer.validated_data) & set(related.SOURCE_FIELDS):
+            tasks.refresh_related.delay(post_id=serializer.instance.pk)
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        # Reload with comments prefetched; DRF would otherwise fetch each comment's author
+        post = self.get_queryset().get(pk=instance.pk)
+        return Response(self.get_serializer(post).data)
+
+    def perform_destroy(self, instance):
+        # Hidden right away; comments, likes and the row are purged in the background
+        deletion.delete_posts(Post.objects.filter(pk=instance.pk))
+
+
+class PostViewView(APIView):
+    """Count a view of a post opened from the feed (no database writes per request)"""
+    permission_classes = [AllowAny]
+
+    def post(self, request, pk):
+        viewcounts.record(pk, request)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ForumStatsView(APIView):
+    """Aggregated forum statistics for the landing page and dashboard"""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response(stats.get_stats())
+
+
+class ModerationQueuePagination(CursorPagination):
+    """Oldest pending posts first, so the queue is worked through in order"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = 'created_at'
+
+
+class ModerationQueueView(APIView):
+    """Pending posts awaiting approval (staff only)"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        paginator = ModerationQueuePagination()
+        page = paginator.paginate_queryset(
+            moderation.pending_posts().with_comments(), request, view=self
+        )
+        serializer = PostSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+
+class ModerationActionView(APIView):
+    """Approve or reject a batch of posts in one request (staff only)"""
+    permission_classes = [IsAdminUser]
+    approve = True
+
+    def post(self, request):
+        serializer = ModerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = moderation.moderate(
+            Post.objects.filter(pk__in=serializer.validated_data['ids']), self.approve, request.user
+        )
+        return Response({'updated': updated})
+
 
 class PostLikeView(APIView):
     """Like a post"""
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):
-        post = get_object(Post, pk=pk)
+        post = get_object_or_404(Post.objects.live(), pk=pk)
         return Response({'likes': post.likes, 'has_liked': False})
 
     def post(self, request, pk):
-        post = get_object_or_404(Post, pk=pk)
+        post = get_object_or_404(Post.objects.live(), pk=pk)
         post.likes += 1
         post.save()
+        post_liked.send(sender=Post, post=post, user=request.user)
         return Response({'likes': post.likes})
 
 
@@ -98,18 +322,23 @@ class CommentListCreateView(APIView):
 
     def get(self, request, post_id):
         """Get all comments for a post"""
-        post = get_object_or_404(Post, pk=post_id)
-        comments = post.comments.all()
+        post = get_object_or_404(Post.objects.live(), pk=post_id)
+        projection = requested_fields(request, CommentSerializer)
+        if projection is None:
+            comments = post.comments.visible().select_related('user')
+        else:
+            comments = CommentSerializer.load_only(post.comments.visible(), projection)
         serializer = CommentSerializer(
             comments, 
             many=True, 
-            context={'request': request}
+            context={'request': request},
+            projection=projection
         )
         return Response(serializer.data)
 
     def post(self, request, post_id):
         """Create a new comment (requires login)"""
-        post = get_object_or_404(Post, pk=post_id)
+        post = get_object_or_404(Post.objects.live(), pk=post_id)
         
         data = request.data.copy()
         data['post'] = post_id
@@ -121,8 +350,9 @@ class CommentListCreateView(APIView):
         
         if serializer.is_valid():
             serializer.save()
+            notification_tasks.notify_comment.delay(comment_id=serializer.instance.pk)
             # Return the full comment data
-            comment = Comment.objects.get(pk=serializer.instance.pk)
+            comment = Comment.objects.select_related('user').get(pk=serializer.instance.pk)
             return Response(
                 CommentSerializer(comment, context={'request': request}).data,
                 status=status.HTTP_201_CREATED
@@ -130,6 +360,54 @@ class CommentListCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class CommentThreadsView(APIView):
+    """Comments of a post as threads: top-level comments with their first replies (public)"""
+    permission_classes = [AllowAny]
+    max_page_size = 50
+    max_replies = 20
+
+    def get(self, request, post_id):
+        try:
+            page_size = min(max(int(request.query_params.get('page_size', 10)), 1), self.max_page_size)
+            replies = min(max(int(request.query_params.get('replies', 3)), 0), self.max_replies)
+        except ValueError:
+            return Response({'error': 'page_size and replies must be numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        after = request.query_params.get('after', '')
+        if after and not threads.is_thread_key(after):
+            return Response({'after': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        post = get_object_or_404(Post.objects.live(), pk=post_id)
+        page, next_key = threads.top_threads(post.pk, after, page_size, replies)
+        serializer = ThreadSerializer(page, many=True, context={'request': request})
+        next_url = None
+        if next_key:
+            next_url = replace_query_param(request.build_absolute_uri(), 'after', next_key)
+        return Response({'next': next_url, 'results': serializer.data})
+
+
+class CommentRepliesPagination(CursorPagination):
+    """A subtree in display order (by materialized path)"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = 'path'
+
+
+class CommentRepliesView(APIView):
+    """A comment and every reply below it, depth first (public)"""
+    permission_classes = [AllowAny]
+
+    def get(self, request, post_id, comment_id):
+        comment = get_object_or_404(
+            Comment.objects.only('pk', 'post_id', 'path'),
+            pk=comment_id, post_id=post_id, post__deleted_at__isnull=True
+        )
+        paginator = CommentRepliesPagination()
+        page = paginator.paginate_queryset(threads.subtree(comment), request, view=self)
+        serializer = CommentSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+
 class CommentDetailView(APIView):
     """
     GET: Get a single comment
@@ -139,7 +417,10 @@ class CommentDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self, post_id, comment_id):
-        return get_object_or_404(Comment, pk=comment_id, post_id=post_id)
+        return get_object_or_404(
+            Comment.objects.visible().select_related('user'),
+            pk=comment_id, post_id=post_id, post__deleted_at__isnull=True
+        )
 
     def get(self, request, post_id, comment_id):
         comment = self.get_object(post_id, comment_id)
@@ -151,7 +432,7 @@ class CommentDetailView(APIView):
         comment = self.get_object(post_id, comment_id)
         
         # Check ownership
-        if comment.user != request.user:
+        if comment.user_id != request.user.pk:
             return Response(
                 {'error': 'You can only edit your own comments.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -181,7 +462,7 @@ class CommentDetailView(APIView):
         comment = self.get_object(post_id, comment_id)
         
         # Check ownership or admin status
-        if comment.user != request.user and not request.user.is_staff:
+        if comment.user_id != request.user.pk and not request.user.is_staff:
             return Response(
                 {'error': 'You can only delete your own comments.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -199,7 +480,9 @@ class UserCommentsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        comments = Comment.objects.filter(user=request.user).select_related('post')
+        comments = Comment.objects.filter(
+            user=request.user, post__deleted_at__isnull=True
+        ).select_related('post', 'user')
         
         comments_data = []
         for comment in comments: